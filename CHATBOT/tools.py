@@ -1,12 +1,12 @@
 import math
+from decimal import Decimal
 from LOTES.models import Lot, Stage
+from LOTES.search import facet_options, search_lots as run_lot_search
 from django.db.models import Q
 from django.urls import reverse
 
 def search_lots(price_min=None, price_max=None, status='AVAILABLE', stage_name=None):
-    """Filtra lotes por precio, estado y etapa."""
-    lots = Lot.objects.all()
-    
+    """Filtra lotes por precio, estado y etapa, con conteos por etapa, estado y rango."""
     # Manejar valores de tipo "inf" o NaN que el LLM pueda enviar
     def clean_price(price):
         if price is None:
@@ -17,24 +17,23 @@ def search_lots(price_min=None, price_max=None, status='AVAILABLE', stage_name=N
                 return None
             if isinstance(price, str) and price.lower() in ['inf', 'infinity', 'nan']:
                 return None
-            return float(price)
+            return Decimal(str(float(price)))
         except (ValueError, TypeError):
             return None
 
-    price_min = clean_price(price_min)
-    price_max = clean_price(price_max)
-
-    if price_min is not None:
-        lots = lots.filter(price__gte=price_min)
-    if price_max is not None:
-        lots = lots.filter(price__lte=price_max)
-    if status:
-        lots = lots.filter(status=status)
+    filters = {
+        "price_min": clean_price(price_min),
+        "price_max": clean_price(price_max),
+        "status": [status] if status else [],
+        "stage": [],
+    }
     if stage_name:
-        lots = lots.filter(stage__name__icontains=stage_name)
-    
+        stages = Stage.objects.filter(name__icontains=stage_name)
+        filters["stage"] = list(stages.values_list("id", flat=True)) or [0]
+
+    search = run_lot_search(filters)
     results = []
-    for lot in lots[:10]: # Limitar a 10 resultados para el bot
+    for lot in search["lots"][:10]: # Limitar a 10 resultados para el bot
         results.append({
             "id": lot.id,
             "code": lot.code,
@@ -45,7 +44,16 @@ def search_lots(price_min=None, price_max=None, status='AVAILABLE', stage_name=N
             "buy_url": f"/lotes/buy/{lot.id}/",
             "map_url": f"/lotes/mapa/?lot_id={lot.id}"
         })
-    return results
+
+    facets = facet_options(search["facets"], filters)
+    return {
+        "total": search["total"],
+        "results": results,
+        "facets": {
+            facet["title"]: {o["label"]: o["count"] for o in facet["options"] if o["count"]}
+            for facet in facets
+        },
+    }
 
 def get_lot_details(lot_id):
     """Obtiene detalles específicos de un lote incluyendo ubicación."""
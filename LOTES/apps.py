@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LotesConfig(AppConfig):
     name = 'LOTES'
+
+    def ready(self):
+        import LOTES.signals
@@ -0,0 +1,121 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.storage import default_storage
+
+from .facets import BUCKETS, bucket_q
+from .models import Lot
+
+# Campos públicos del catálogo: nombre -> (columna en .values(), conversión)
+CATALOG_FIELDS = {
+    "id": ("id", None),
+    "code": ("code", None),
+    "area_m2": ("area_m2", float),
+    "price": ("price", float),
+    "status": ("status", None),
+    "stage": ("stage__name", lambda v: v or ""),
+    "stage_id": ("stage_id", None),
+    "latitude": ("latitude", lambda v: float(v) if v else None),
+    "longitude": ("longitude", lambda v: float(v) if v else None),
+    "image_url": ("image", lambda v: default_storage.url(v) if v else None),
+    "image_variants": ("image_variants", lambda v: {
+        key: default_storage.url(path) for key, path in (v or {}).items() if key != "source" and path
+    }),
+}
+DEFAULT_FIELDS = ("id", "code", "area_m2", "price", "status", "stage", "latitude", "longitude")
+
+STATUSES = {code for code, _ in Lot.STATUS_CHOICES}
+# Parámetros que lee parse_lot_filters (el resto no cambia el resultado)
+FILTER_PARAMS = ("stage", "status", "price_min", "price_max", "area_min", "area_max", "price_bucket", "area_bucket")
+
+
+def _multi(params, name):
+    values = []
+    for raw in params.getlist(name):
+        values.extend(v.strip() for v in raw.split(",") if v.strip())
+    return values
+
+
+def _decimal(params, name):
+    raw = (params.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido para '{name}'.")
+    if not value.is_finite():
+        raise ValueError(f"Valor inválido para '{name}'.")
+    return value
+
+
+def _indexes(params, name, size):
+    try:
+        values = [int(v) for v in _multi(params, name)]
+    except ValueError:
+        raise ValueError(f"Valor inválido para '{name}'.")
+    if any(v < 0 or v >= size for v in values):
+        raise ValueError(f"Valor inválido para '{name}'.")
+    return values
+
+
+def parse_lot_filters(params):
+    """Lee stage, status, rangos de precio/área y sus facetas desde un QueryDict."""
+    try:
+        stages = [int(v) for v in _multi(params, "stage")]
+    except ValueError:
+        raise ValueError("Valor inválido para 'stage'.")
+    statuses = [v.upper() for v in _multi(params, "status")]
+    unknown = set(statuses) - STATUSES
+    if unknown:
+        raise ValueError(f"Estado desconocido: {', '.join(sorted(unknown))}.")
+    return {
+        "stage": stages,
+        "status": statuses,
+        "price_min": _decimal(params, "price_min"),
+        "price_max": _decimal(params, "price_max"),
+        "area_min": _decimal(params, "area_min"),
+        "area_max": _decimal(params, "area_max"),
+        "price_bucket": _indexes(params, "price_bucket", len(BUCKETS["price_bucket"][1])),
+        "area_bucket": _indexes(params, "area_bucket", len(BUCKETS["area_bucket"][1])),
+    }
+
+
+def filter_lots(queryset, filters):
+    if filters.get("stage"):
+        queryset = queryset.filter(stage_id__in=filters["stage"])
+    if filters.get("status"):
+        queryset = queryset.filter(status__in=filters["status"])
+    if filters.get("price_min") is not None:
+        queryset = queryset.filter(price__gte=filters["price_min"])
+    if filters.get("price_max") is not None:
+        queryset = queryset.filter(price__lte=filters["price_max"])
+    if filters.get("area_min") is not None:
+        queryset = queryset.filter(area_m2__gte=filters["area_min"])
+    if filters.get("area_max") is not None:
+        queryset = queryset.filter(area_m2__lte=filters["area_max"])
+    for name, (field, buckets) in BUCKETS.items():
+        if filters.get(name):
+            queryset = queryset.filter(bucket_q(field, buckets, filters[name]))
+    return queryset
+
+
+def parse_fields(params):
+    requested = _multi(params, "fields")
+    if not requested:
+        return list(DEFAULT_FIELDS)
+    unknown = [f for f in requested if f not in CATALOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}.")
+    return list(dict.fromkeys(requested))
+
+
+def serialize_rows(rows, fields):
+    out = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            column, convert = CATALOG_FIELDS[name]
+            value = row[column]
+            item[name] = convert(value) if convert else value
+        out.append(item)
+    return out
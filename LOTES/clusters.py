@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from django.db.models import F, Q
+
+from .geo import count_cells, cover_bbox, prefix_q
+
+# Longitudes de geohash para las que se mantiene un nivel de clusters.
+CLUSTER_PRECISIONS = (2, 3, 4, 5, 6, 7)
+# A partir de este zoom el mapa pide lotes individuales.
+CLUSTER_MAX_ZOOM = 16
+CLUSTER_MAX_FEATURES = 300
+
+# Zoom (Leaflet) -> precisión geohash cuyo tamaño de celda se acerca a un
+# marcador en pantalla.
+_ZOOM_PRECISION = ((3, 2), (5, 3), (8, 4), (10, 5), (13, 6), (CLUSTER_MAX_ZOOM, 7))
+
+_STATUS_COLUMNS = {"AVAILABLE": "available", "RESERVED": "reserved", "SOLD": "sold"}
+
+
+def lot_state(lot):
+    """Estado de un lote relevante para los clusters (o None si no existe)."""
+    if lot is None:
+        return None
+    if isinstance(lot, dict):
+        return (lot["geohash"], lot["status"], float(lot["latitude"] or 0), float(lot["longitude"] or 0))
+    return (lot.geohash, lot.status, float(lot.latitude or 0), float(lot.longitude or 0))
+
+
+def _empty_delta():
+    return {"total": 0, "available": 0, "reserved": 0, "sold": 0, "lat_sum": 0.0, "lon_sum": 0.0}
+
+
+def _collect(deltas, state, sign):
+    geohash, status, lat, lon = state
+    column = _STATUS_COLUMNS.get(status)
+    for precision in CLUSTER_PRECISIONS:
+        delta = deltas[(precision, geohash[:precision])]
+        delta["total"] += sign
+        if column:
+            delta[column] += sign
+        delta["lat_sum"] += sign * lat
+        delta["lon_sum"] += sign * lon
+
+
+def apply_cluster_changes(changes, cluster_model=None):
+    """
+    Aplica cambios de lotes a los clusters. `changes` es un iterable de
+    (estado_anterior, estado_nuevo) tal como los devuelve `lot_state`; None
+    en cualquiera de los lados representa alta o baja del lote.
+    Solo se tocan las celdas afectadas, una actualización por celda.
+    """
+    if cluster_model is None:
+        from .models import LotCluster as cluster_model
+
+    deltas = defaultdict(_empty_delta)
+    for old, new in changes:
+        if old == new:
+            continue
+        if old:
+            _collect(deltas, old, -1)
+        if new:
+            _collect(deltas, new, 1)
+
+    emptied = []
+    for (precision, cell), delta in deltas.items():
+        if not any(delta.values()):
+            continue
+        updates = {field: F(field) + value for field, value in delta.items() if value}
+        rows = cluster_model.objects.filter(precision=precision, cell=cell)
+        if not rows.update(**updates) and delta["total"] >= 0:
+            _, created = cluster_model.objects.get_or_create(precision=precision, cell=cell, defaults=delta)
+            if not created:
+                rows.update(**updates)
+        if delta["total"] < 0:
+            emptied.append((precision, cell))
+
+    for precision, cell in emptied:
+        cluster_model.objects.filter(precision=precision, cell=cell, total__lte=0).delete()
+
+
+def rebuild_clusters(chunk_size=2000):
+    """Reconstruye todos los niveles desde cero (importaciones grandes y reparaciones)."""
+    from .models import Lot, LotCluster
+
+    deltas = defaultdict(_empty_delta)
+    rows = Lot.objects.values("geohash", "status", "latitude", "longitude").order_by()
+    for row in rows.iterator(chunk_size=chunk_size):
+        _collect(deltas, lot_state(row), 1)
+
+    LotCluster.objects.all().delete()
+    LotCluster.objects.bulk_create(
+        [LotCluster(precision=p, cell=c, **delta) for (p, c), delta in deltas.items()],
+        batch_size=chunk_size,
+    )
+    return len(deltas)
+
+
+def precision_for_view(zoom, south, west, north, east):
+    """Precisión para el zoom, reducida si el viewport excedería el tope de features."""
+    precision = CLUSTER_PRECISIONS[-1]
+    for max_zoom, level in _ZOOM_PRECISION:
+        if zoom < max_zoom:
+            precision = level
+            break
+    while precision > CLUSTER_PRECISIONS[0] and count_cells(south, west, north, east, precision) > CLUSTER_MAX_FEATURES:
+        precision -= 1
+    return precision
+
+
+def clusters_in_bbox(south, west, north, east, precision):
+    from .models import LotCluster
+
+    condition = Q()
+    for prefix in cover_bbox(south, west, north, east, max_precision=precision):
+        if not prefix:
+            condition = Q()
+            break
+        condition |= prefix_q("cell", prefix)
+    return LotCluster.objects.filter(condition, precision=precision, total__gt=0)
+
+
+def serialize_cluster(cluster):
+    return {
+        "cell": cluster.cell,
+        "count": cluster.total,
+        "latitude": cluster.lat_sum / cluster.total,
+        "longitude": cluster.lon_sum / cluster.total,
+        "statuses": {
+            "AVAILABLE": cluster.available,
+            "RESERVED": cluster.reserved,
+            "SOLD": cluster.sold,
+        },
+    }
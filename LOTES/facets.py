@@ -0,0 +1,177 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+# Rangos fijos para las facetas de precio y área: (etiqueta, desde, hasta).
+# `hasta` es exclusivo; None significa sin límite superior.
+PRICE_BUCKETS = (
+    ("Hasta $50M", Decimal("0"), Decimal("50000000")),
+    ("$50M - $100M", Decimal("50000000"), Decimal("100000000")),
+    ("$100M - $150M", Decimal("100000000"), Decimal("150000000")),
+    ("$150M - $200M", Decimal("150000000"), Decimal("200000000")),
+    ("$200M - $300M", Decimal("200000000"), Decimal("300000000")),
+    ("Más de $300M", Decimal("300000000"), None),
+)
+AREA_BUCKETS = (
+    ("Hasta 100 m²", Decimal("0"), Decimal("100")),
+    ("100 - 150 m²", Decimal("100"), Decimal("150")),
+    ("150 - 200 m²", Decimal("150"), Decimal("200")),
+    ("200 - 300 m²", Decimal("200"), Decimal("300")),
+    ("Más de 300 m²", Decimal("300"), None),
+)
+BUCKETS = {"price_bucket": ("price", PRICE_BUCKETS), "area_bucket": ("area_m2", AREA_BUCKETS)}
+
+# Dimensiones del cubo, en el orden de la clave de cada celda.
+# Cada dimensión se filtra con el parámetro del mismo nombre.
+DIMENSIONS = ("stage", "status", "price_bucket", "area_bucket")
+FREE_RANGE_FILTERS = ("price_min", "price_max", "area_min", "area_max")
+
+
+def bucket_index(value, buckets):
+    value = Decimal(value or 0)
+    for index, (_, lo, hi) in enumerate(buckets):
+        if value >= lo and (hi is None or value < hi):
+            return index
+    return 0
+
+
+def bucket_q(field, buckets, indexes):
+    condition = Q()
+    for index in indexes:
+        _, lo, hi = buckets[index]
+        bounds = Q(**{f"{field}__gte": lo})
+        if hi is not None:
+            bounds &= Q(**{f"{field}__lt": hi})
+        condition |= bounds
+    return condition
+
+
+def bucket_case(field, buckets):
+    """Índice del rango calculado en la base de datos (mismo criterio que bucket_index)."""
+    return Case(
+        *(When(bucket_q(field, buckets, [index]), then=Value(index)) for index in range(len(buckets))),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def facet_key(row):
+    """Celda del cubo a la que pertenece un lote (dict o instancia), o None."""
+    if row is None:
+        return None
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    return (
+        get("stage_id"),
+        get("status"),
+        bucket_index(get("price"), PRICE_BUCKETS),
+        bucket_index(get("area_m2"), AREA_BUCKETS),
+    )
+
+
+def apply_facet_changes(changes, cell_model=None):
+    """Ajusta los conteos del cubo para cambios (fila_anterior, fila_nueva)."""
+    if cell_model is None:
+        from .models import LotFacetCell as cell_model
+
+    deltas = Counter()
+    for old, new in changes:
+        old_key, new_key = facet_key(old), facet_key(new)
+        if old_key == new_key:
+            continue
+        if old_key:
+            deltas[old_key] -= 1
+        if new_key:
+            deltas[new_key] += 1
+
+    for (stage_id, status, price_bucket, area_bucket), delta in deltas.items():
+        if not delta:
+            continue
+        cell = dict(stage_id=stage_id, status=status, price_bucket=price_bucket, area_bucket=area_bucket)
+        rows = cell_model.objects.filter(**cell)
+        if not rows.update(count=F("count") + delta) and delta > 0:
+            _, created = cell_model.objects.get_or_create(**cell, defaults={"count": delta})
+            if not created:
+                rows.update(count=F("count") + delta)
+
+
+def rebuild_facets(chunk_size=2000):
+    from .models import Lot, LotFacetCell
+
+    counts = Counter()
+    rows = Lot.objects.values("stage_id", "status", "price", "area_m2").order_by()
+    for row in rows.iterator(chunk_size=chunk_size):
+        counts[facet_key(row)] += 1
+
+    LotFacetCell.objects.all().delete()
+    LotFacetCell.objects.bulk_create(
+        [
+            LotFacetCell(stage_id=s, status=st, price_bucket=p, area_bucket=a, count=n)
+            for (s, st, p, a), n in counts.items()
+        ],
+        batch_size=chunk_size,
+    )
+    return len(counts)
+
+
+def _cube_from_table():
+    from .models import LotFacetCell
+
+    return list(
+        LotFacetCell.objects.filter(count__gt=0).values_list(
+            "stage_id", "status", "price_bucket", "area_bucket", "count"
+        )
+    )
+
+
+def _cube_from_lots(queryset):
+    """
+    Solo para filtros que el cubo no puede resolver (rangos libres de
+    precio/área): un único GROUP BY sobre los lotes ya filtrados, por los
+    índices de rango calculados en la base de datos, así que devuelve como
+    mucho una fila por celda del cubo.
+    """
+    rows = (
+        queryset.annotate(
+            price_bucket=bucket_case("price", PRICE_BUCKETS),
+            area_bucket=bucket_case("area_m2", AREA_BUCKETS),
+        )
+        .values_list("stage_id", "status", "price_bucket", "area_bucket")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    return [tuple(row) for row in rows]
+
+
+def count_facets(filters, range_queryset=None):
+    """
+    Conteos por faceta con semántica disyuntiva: cada faceta se cuenta
+    aplicando todos los filtros salvo el suyo, para que el usuario vea
+    cuántos resultados obtendría al cambiar esa selección.
+    `range_queryset` son los lotes filtrados solo por rangos libres; se usa
+    únicamente cuando hay alguno.
+    Devuelve (total, {dimensión: {valor: conteo}}).
+    """
+    free_range = any(filters.get(name) is not None for name in FREE_RANGE_FILTERS)
+    if free_range and range_queryset is not None:
+        cells = _cube_from_lots(range_queryset)
+    else:
+        cells = _cube_from_table()
+
+    selected = {dim: set(filters.get(dim) or ()) for dim in DIMENSIONS}
+
+    def matches(cell, skip=None):
+        for position, dim in enumerate(DIMENSIONS):
+            if dim != skip and selected[dim] and cell[position] not in selected[dim]:
+                return False
+        return True
+
+    total = sum(cell[-1] for cell in cells if matches(cell))
+    facets = {}
+    for position, dim in enumerate(DIMENSIONS):
+        counts = defaultdict(int)
+        for cell in cells:
+            if matches(cell, skip=dim):
+                counts[cell[position]] += cell[-1]
+        facets[dim] = dict(counts)
+    return total, facets
@@ -0,0 +1,147 @@
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 9
+# Máximo de celdas geohash con las que se cubre un viewport. Más celdas
+# ajustan mejor el bbox pero generan más rangos en la consulta.
+MAX_COVER_CELLS = 24
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """(alto en grados de latitud, ancho en grados de longitud) de una celda."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def _cells_along(lo, hi, step, origin):
+    first = math.floor((lo - origin) / step)
+    last = math.floor((hi - origin) / step)
+    return first, last
+
+
+def count_cells(south, west, north, east, precision):
+    height, width = cell_size(precision)
+    row_first, row_last = _cells_along(south, north, height, -90.0)
+    col_first, col_last = _cells_along(west, east, width, -180.0)
+    return (row_last - row_first + 1) * (col_last - col_first + 1)
+
+
+def cover_bbox(south, west, north, east, max_cells=MAX_COVER_CELLS, max_precision=GEOHASH_PRECISION):
+    """
+    Devuelve los prefijos geohash (todos de la misma longitud) que cubren
+    el bbox, usando la mayor precisión que quepa en `max_cells` celdas.
+    """
+    for precision in range(max_precision, 0, -1):
+        if count_cells(south, west, north, east, precision) > max_cells:
+            continue
+        height, width = cell_size(precision)
+        row_first, row_last = _cells_along(south, north, height, -90.0)
+        col_first, col_last = _cells_along(west, east, width, -180.0)
+        prefixes = set()
+        for row in range(row_first, row_last + 1):
+            lat = min(-90.0 + (row + 0.5) * height, 90.0)
+            for col in range(col_first, col_last + 1):
+                lon = min(-180.0 + (col + 0.5) * width, 180.0)
+                prefixes.add(encode_geohash(lat, lon, precision))
+        return sorted(prefixes)
+    return [""]
+
+
+def prefix_range(prefix):
+    """
+    Rango [lo, hi) que captura todos los geohash con ese prefijo. `hi` es
+    el prefijo siguiente en base32 (d2g4 -> d2g5, d2gz -> d2h): los límites
+    solo tienen letras minúsculas y dígitos, que ordenan igual en cualquier
+    collation. `hi` es None si no hay siguiente (zzz...).
+    """
+    stem = prefix
+    while stem:
+        position = _BASE32.index(stem[-1])
+        if position < len(_BASE32) - 1:
+            return prefix, stem[:-1] + _BASE32[position + 1]
+        stem = stem[:-1]
+    return prefix, None
+
+
+def prefix_q(field, prefix):
+    """Condición de rango sobre `field` para los geohash con ese prefijo."""
+    from django.db.models import Q
+
+    lo, hi = prefix_range(prefix)
+    condition = Q(**{f"{field}__gte": lo})
+    if hi is not None:
+        condition &= Q(**{f"{field}__lt": hi})
+    return condition
+
+
+def bbox_filter(queryset, south, west, north, east):
+    """
+    Filtra por bbox usando el índice sobre `geohash` (rangos por prefijo)
+    y luego recorta con las coordenadas exactas.
+    """
+    from django.db.models import Q
+
+    condition = Q()
+    for prefix in cover_bbox(south, west, north, east):
+        if not prefix:
+            condition = Q()
+            break
+        condition |= prefix_q("geohash", prefix)
+    return queryset.filter(
+        condition,
+        latitude__gte=south,
+        latitude__lte=north,
+        longitude__gte=west,
+        longitude__lte=east,
+    )
+
+
+def parse_bbox(raw):
+    """'west,south,east,north' -> (south, west, north, east)."""
+    try:
+        west, south, east, north = (float(v) for v in (raw or "").split(","))
+    except ValueError:
+        raise ValueError("El parámetro 'bbox' debe ser 'oeste,sur,este,norte'.")
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError("El parámetro 'bbox' debe ser 'oeste,sur,este,norte'.")
+    south, north = max(south, -90.0), min(north, 90.0)
+    west, east = max(west, -180.0), min(east, 180.0)
+    if south > north or west > east:
+        raise ValueError("El bbox está vacío o cruza el antimeridiano.")
+    return south, west, north, east
@@ -0,0 +1,144 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from PROJECT_INFO.versions import INVENTORY, bump_version
+
+logger = logging.getLogger(__name__)
+
+# Variantes derivadas de cada imagen: nombre -> caja máxima (ancho, alto).
+# Se genera un JPEG y un WebP por variante; nunca se agranda el original.
+VARIANTS = {
+    "thumb": (400, 300),
+    "card": (800, 600),
+    "full": (1920, 1920),
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+VARIANTS_DIR = "lot_images/variants"
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "IMAGE_PIPELINE_WORKERS", 2)
+        _executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="lot-images")
+    return _executor
+
+
+def render_variants(name, storage=default_storage):
+    """Genera y guarda todas las variantes de `name`. Devuelve {clave: ruta}."""
+    from PIL import Image, ImageOps
+
+    with storage.open(name, "rb") as fh:
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    variants = {"source": name}
+    for key, box in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        for suffix, fmt, options in (
+            ("", "JPEG", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}),
+            ("_webp", "WEBP", {"quality": WEBP_QUALITY, "method": 4}),
+        ):
+            buffer = BytesIO()
+            resized.save(buffer, format=fmt, **options)
+            extension = "webp" if fmt == "WEBP" else "jpg"
+            path = f"{VARIANTS_DIR}/{stem}_{key}.{extension}"
+            variants[key + suffix] = storage.save(path, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variant_files(variants, storage=default_storage):
+    for key, path in (variants or {}).items():
+        if key == "source" or not path:
+            continue
+        try:
+            storage.delete(path)
+        except Exception:
+            logger.warning("No se pudo borrar la variante %s", path, exc_info=True)
+
+
+def process_image(model, pk):
+    """
+    Genera las variantes de la imagen de `model` (Lot o LotImage) si cambió
+    desde la última vez. Solo escribe si la imagen sigue siendo la misma al
+    terminar, por lo que una nueva subida en medio no queda pisada.
+    """
+    row = model.objects.filter(pk=pk).values("image", "image_variants").first()
+    if row is None:
+        return
+    name = row["image"] or ""
+    previous = row["image_variants"] or {}
+    if previous.get("source", "") == name:
+        return
+
+    variants = {}
+    if name:
+        try:
+            variants = render_variants(name)
+        except Exception:
+            logger.exception("No se pudieron generar variantes para %s", name)
+            variants = {"source": name}
+
+    updated = model.objects.filter(pk=pk, image=row["image"]).update(image_variants=variants)
+    if updated:
+        delete_variant_files(previous)
+        bump_version(INVENTORY)
+    else:
+        delete_variant_files(variants)
+
+
+def _run(model, pk):
+    close_old_connections()
+    try:
+        process_image(model, pk)
+    except Exception:
+        logger.exception("Error procesando imagen de %s #%s", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def needs_variants(instance):
+    name = instance.image.name if instance.image else ""
+    return (instance.image_variants or {}).get("source", "") != name
+
+
+def schedule_variants(instance):
+    """Encola el procesamiento cuando la transacción actual se confirme."""
+    model, pk = type(instance), instance.pk
+    if getattr(settings, "IMAGE_PIPELINE_WORKERS", 2) <= 0:
+        transaction.on_commit(lambda: process_image(model, pk))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, model, pk))
+
+
+def variant_url(instance, key):
+    """URL de la variante pedida o, si aún no existe, la del original."""
+    if not instance or not instance.image:
+        return ""
+    variants = instance.image_variants or {}
+    path = variants.get(key) if variants.get("source") == instance.image.name else None
+    if path:
+        return default_storage.url(path)
+    if key.endswith("_webp"):
+        return ""
+    return instance.image.url
@@ -0,0 +1,253 @@
+import csv
+import io
+import math
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from PROJECT_INFO.versions import INVENTORY, bump_version
+from .clusters import rebuild_clusters
+from .facets import rebuild_facets
+from .geo import encode_geohash
+from .inventory import apply_lot_changes, lot_snapshot, record_status_changes
+from .models import Lot, Stage
+
+CHUNK_SIZE = 1000
+# Por encima de esta cantidad de lotes tocados es más barato reconstruir los
+# agregados del inventario que aplicar diferencias celda por celda.
+REBUILD_THRESHOLD = 5000
+MAX_REPORTED_ERRORS = 500
+
+# Encabezados aceptados (sin tildes, en minúscula) -> campo de Lot
+COLUMNS = {
+    "code": "code", "codigo": "code",
+    "stage": "stage", "etapa": "stage",
+    "area_m2": "area_m2", "area": "area_m2",
+    "price": "price", "precio": "price",
+    "status": "status", "estado": "status",
+    "latitude": "latitude", "latitud": "latitude", "lat": "latitude",
+    "longitude": "longitude", "longitud": "longitude", "lon": "longitude", "lng": "longitude",
+    "description": "description", "descripcion": "description",
+}
+REQUIRED = ("code", "stage", "area_m2", "price", "latitude", "longitude")
+UPDATE_FIELDS = ["stage", "area_m2", "price", "status", "latitude", "longitude", "description", "geohash"]
+
+_STATUS = {}
+for _code, _label in Lot.STATUS_CHOICES:
+    _STATUS[_code.lower()] = _code
+    _STATUS[_label.lower()] = _code
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return text.strip().lower().replace(" ", "_")
+
+
+def _read_csv(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    try:
+        yield next(reader)
+    except StopIteration:
+        return
+    yield from reader
+
+
+def _read_xlsx(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    """Recorre el archivo fila a fila: (número de línea, {campo: valor})."""
+    rows = _read_xlsx(fileobj) if filename.lower().endswith(".xlsx") else _read_csv(fileobj)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("El archivo está vacío.")
+    fields = [COLUMNS.get(_normalize(name)) for name in header]
+    missing = [name for name in REQUIRED if name not in fields]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}.")
+    for line, values in enumerate(rows, start=2):
+        if not values or all(v in (None, "") for v in values):
+            continue
+        yield line, {field: value for field, value in zip(fields, values) if field}
+
+
+def _decimal(value, name):
+    try:
+        number = Decimal(str(value).strip().replace(",", ""))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"{name} inválido: {value!r}")
+    if not number.is_finite() or number < 0:
+        raise ValueError(f"{name} inválido: {value!r}")
+    return number
+
+
+def _coordinate(value, name, limit):
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{name} inválida: {value!r}")
+    if not math.isfinite(number) or abs(number) > limit:
+        raise ValueError(f"{name} inválida: {value!r}")
+    return number
+
+
+class LotImporter:
+    """
+    Importación masiva de lotes por bloques: valida cada bloque, resuelve
+    etapas con una caché por nombre e inserta/actualiza con bulk_create y
+    bulk_update. La memoria no depende del tamaño del archivo.
+    """
+
+    def __init__(self, create_stages=False, chunk_size=CHUNK_SIZE):
+        self.create_stages = create_stages
+        self.chunk_size = chunk_size
+        self.stages = {s.name.strip().lower(): s for s in Stage.objects.all()}
+        self.seen_codes = set()
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.pending_changes = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def stage_for(self, name):
+        key = str(name or "").strip().lower()
+        if not key:
+            raise ValueError("La etapa es obligatoria.")
+        stage = self.stages.get(key)
+        if stage is None:
+            if not self.create_stages:
+                raise ValueError(f"Etapa desconocida: {name}")
+            stage = Stage.objects.create(name=str(name).strip(), description="")
+            self.stages[key] = stage
+        return stage
+
+    def clean(self, data):
+        code = str(data.get("code") or "").strip()
+        if not code:
+            raise ValueError("El código es obligatorio.")
+        if len(code) > 20:
+            raise ValueError(f"Código demasiado largo: {code}")
+        if code in self.seen_codes:
+            raise ValueError(f"Código repetido en el archivo: {code}")
+        # Sin estado (columna o celda vacía) se conserva el del lote; los
+        # lotes nuevos quedan disponibles (ver flush).
+        raw_status = str(data.get("status") or "").strip()
+        status = _STATUS.get(raw_status.lower()) if raw_status else None
+        if raw_status and status is None:
+            raise ValueError(f"Estado desconocido: {data.get('status')}")
+        area = _decimal(data.get("area_m2"), "Área")
+        if area >= Decimal("10000"):
+            raise ValueError(f"Área fuera de rango: {area}")
+        price = _decimal(data.get("price"), "Precio")
+        if price >= Decimal("1e10"):
+            raise ValueError(f"Precio fuera de rango: {price}")
+        latitude = _coordinate(data.get("latitude"), "Latitud", 90)
+        longitude = _coordinate(data.get("longitude"), "Longitud", 180)
+        cleaned = {
+            "code": code,
+            "stage": self.stage_for(data.get("stage")),
+            "area_m2": area.quantize(Decimal("0.01")),
+            "price": price.quantize(Decimal("0.01")),
+            "latitude": latitude,
+            "longitude": longitude,
+            "description": str(data.get("description") or "").strip(),
+            "geohash": encode_geohash(latitude, longitude),
+        }
+        if status is not None:
+            cleaned["status"] = status
+        return cleaned
+
+    def run(self, rows):
+        chunk = []
+        for line, data in rows:
+            chunk.append((line, data))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        self.finish()
+        return self
+
+    def flush(self, chunk):
+        valid = []
+        for line, data in chunk:
+            try:
+                cleaned = self.clean(data)
+            except ValueError as e:
+                self.error(line, str(e))
+                continue
+            self.seen_codes.add(cleaned["code"])
+            valid.append(cleaned)
+        if not valid:
+            return
+
+        with transaction.atomic():
+            existing = {
+                lot.code: lot
+                for lot in Lot.objects.filter(code__in=[row["code"] for row in valid]).only("code", *UPDATE_FIELDS)
+            }
+            to_create, to_update, to_update_keep_status, changes = [], [], [], []
+            for row in valid:
+                lot = existing.get(row["code"])
+                if lot is None:
+                    to_create.append(Lot(**{"status": "AVAILABLE", **row}))
+                    continue
+                before = lot_snapshot(lot)
+                for field, value in row.items():
+                    setattr(lot, field, value)
+                (to_update if "status" in row else to_update_keep_status).append(lot)
+                changes.append((before, lot_snapshot(lot)))
+
+            Lot.objects.bulk_create(to_create, batch_size=self.chunk_size)
+            Lot.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.chunk_size)
+            Lot.objects.bulk_update(
+                to_update_keep_status, [f for f in UPDATE_FIELDS if f != "status"], batch_size=self.chunk_size
+            )
+            changes.extend((None, lot_snapshot(lot)) for lot in to_create)
+            self.created += len(to_create)
+            self.updated += len(to_update) + len(to_update_keep_status)
+
+            if self.created + self.updated <= REBUILD_THRESHOLD:
+                self.pending_changes.extend(changes)
+            else:
+                # Los agregados se reconstruyen al final; el historial de
+                # estados no se puede reconstruir, se guarda ya.
+                record_status_changes((self.pending_changes or []) + changes)
+                self.pending_changes = None
+
+    def finish(self):
+        if not self.created and not self.updated:
+            return
+        with transaction.atomic():
+            if self.pending_changes is None:
+                rebuild_clusters()
+                rebuild_facets()
+            else:
+                apply_lot_changes(self.pending_changes)
+            self.pending_changes = []
+            bump_version(INVENTORY)
+
+
+def import_lots(fileobj, filename, create_stages=False):
+    return LotImporter(create_stages=create_stages).run(iter_rows(fileobj, filename))
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.utils import timezone
+
+from PROJECT_INFO.versions import INVENTORY, bump_version
+from .clusters import apply_cluster_changes, lot_state
+from .facets import apply_facet_changes
+from .models import Lot, LotStatusChange
+
+# Columnas de Lot de las que dependen los agregados mantenidos (clusters y
+# facetas). Se guardan antes de cada cambio para poder aplicar diferencias.
+SNAPSHOT_FIELDS = ("id", "geohash", "status", "latitude", "longitude", "stage_id", "price", "area_m2")
+
+
+def lot_snapshot(lot):
+    if lot is None:
+        return None
+    if isinstance(lot, dict):
+        return {name: lot[name] for name in SNAPSHOT_FIELDS}
+    return {name: getattr(lot, name) for name in SNAPSHOT_FIELDS}
+
+
+def load_snapshots(lot_ids):
+    return {
+        row["id"]: row
+        for row in Lot.objects.filter(id__in=lot_ids).values(*SNAPSHOT_FIELDS)
+    }
+
+
+def record_status_changes(changes):
+    """Guarda en el historial los cambios de estado (incluidas las altas) de la lista."""
+    now = timezone.now()
+    LotStatusChange.objects.bulk_create([
+        LotStatusChange(
+            lot_id=new["id"], previous_status=old["status"] if old else "", status=new["status"], changed_at=now
+        )
+        for old, new in changes
+        if new is not None and new["id"] is not None and (old is None or old["status"] != new["status"])
+    ])
+
+
+def apply_lot_changes(changes):
+    """
+    Propaga a los agregados del inventario (y al historial de estados) una
+    lista de cambios (snapshot_anterior, snapshot_nuevo); None representa
+    alta o baja.
+    """
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return
+    record_status_changes(changes)
+    apply_cluster_changes(
+        (lot_state(old), lot_state(new)) for old, new in changes
+    )
+    apply_facet_changes(changes)
+
+
+def update_lot_statuses(status_by_id):
+    """
+    Cambia el estado de varios lotes sin pasar por save() (un UPDATE por
+    estado destino) manteniendo clusters, facetas y versión del inventario.
+    Devuelve la cantidad de lotes que realmente cambiaron.
+    """
+    if not status_by_id:
+        return 0
+    current = load_snapshots(list(status_by_id))
+    changed = defaultdict(list)
+    changes = []
+    for lot_id, row in current.items():
+        status = status_by_id[lot_id]
+        if row["status"] == status:
+            continue
+        changed[status].append(lot_id)
+        changes.append((row, dict(row, status=status)))
+    if not changes:
+        return 0
+
+    for status, ids in changed.items():
+        Lot.objects.filter(id__in=ids).update(status=status)
+    apply_lot_changes(changes)
+    bump_version(INVENTORY)
+    return len(changes)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from LOTES.images import process_image
+from LOTES.models import Lot, LotImage
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes (miniatura, tarjeta, completa y WebP) de las imágenes de lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenera también las que ya existen')
+
+    def handle(self, *args, **options):
+        for model in (Lot, LotImage):
+            queryset = model.objects.exclude(image="").exclude(image__isnull=True)
+            if options['force']:
+                queryset.update(image_variants={})
+            processed = 0
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                process_image(model, pk)
+                processed += 1
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: {processed} imágenes revisadas.'))
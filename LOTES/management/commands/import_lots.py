@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LOTES.importer import import_lots
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza lotes desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument('--create-stages', action='store_true', help='Crea las etapas que no existan')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as fh:
+                report = import_lots(fh, path, create_stages=options['create_stages'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in report.errors:
+            self.stdout.write(self.style.WARNING(f'Fila {line}: {message}'))
+        if report.error_count > len(report.errors):
+            self.stdout.write(self.style.WARNING(f'... y {report.error_count - len(report.errors)} errores más.'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Lotes creados: {report.created}. Actualizados: {report.updated}. Filas con errores: {report.error_count}.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from LOTES.clusters import rebuild_clusters
+from LOTES.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los agregados del inventario (clusters del mapa y facetas de búsqueda)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cells = rebuild_clusters()
+            facets = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f'Clusters: {cells} celdas. Facetas: {facets} celdas.'))
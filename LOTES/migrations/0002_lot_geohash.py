@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+# Copia congelada de LOTES.geo.encode_geohash: la migración no debe depender
+# del código vivo de la app.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=9):
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            bit = longitude >= mid
+            lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            bit = latitude >= mid
+            lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+        bits = (bits << 1) | bit
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    Lot = apps.get_model('LOTES', 'Lot')
+    lots = list(Lot.objects.only('id', 'latitude', 'longitude'))
+    for lot in lots:
+        lot.geohash = encode_geohash(float(lot.latitude or 0), float(lot.longitude or 0))
+    Lot.objects.bulk_update(lots, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lot',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-18 12:12
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Copia congelada de LOTES.clusters.rebuild_clusters tal como era al crear
+# la tabla: la migración no debe depender del código vivo de la app.
+CLUSTER_PRECISIONS = (2, 3, 4, 5, 6, 7)
+STATUS_COLUMNS = {'AVAILABLE': 'available', 'RESERVED': 'reserved', 'SOLD': 'sold'}
+
+
+def build_clusters(apps, schema_editor):
+    Lot = apps.get_model('LOTES', 'Lot')
+    LotCluster = apps.get_model('LOTES', 'LotCluster')
+
+    cells = defaultdict(lambda: {'total': 0, 'available': 0, 'reserved': 0, 'sold': 0, 'lat_sum': 0.0, 'lon_sum': 0.0})
+    rows = Lot.objects.values_list('geohash', 'status', 'latitude', 'longitude').order_by()
+    for geohash, status, latitude, longitude in rows.iterator(chunk_size=2000):
+        column = STATUS_COLUMNS.get(status)
+        for precision in CLUSTER_PRECISIONS:
+            cell = cells[(precision, geohash[:precision])]
+            cell['total'] += 1
+            if column:
+                cell[column] += 1
+            cell['lat_sum'] += float(latitude or 0)
+            cell['lon_sum'] += float(longitude or 0)
+
+    LotCluster.objects.all().delete()
+    LotCluster.objects.bulk_create(
+        [LotCluster(precision=p, cell=c, **values) for (p, c), values in cells.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0002_lot_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('cell', models.CharField(max_length=12)),
+                ('total', models.IntegerField(default=0)),
+                ('available', models.IntegerField(default=0)),
+                ('reserved', models.IntegerField(default=0)),
+                ('sold', models.IntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0)),
+                ('lon_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('precision', 'cell'), name='unique_lot_cluster_cell')],
+            },
+        ),
+        migrations.RunPython(build_clusters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 12:15
+
+from collections import Counter
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de LOTES.facets.rebuild_facets y de los límites de los
+# rangos tal como eran al crear la tabla: la migración no debe depender del
+# código vivo de la app. Solo importa el límite inferior de cada rango.
+PRICE_BOUNDS = tuple(Decimal(n) for n in ('0', '50000000', '100000000', '150000000', '200000000', '300000000'))
+AREA_BOUNDS = tuple(Decimal(n) for n in ('0', '100', '150', '200', '300'))
+
+
+def bucket_index(value, bounds):
+    value = Decimal(value or 0)
+    index = 0
+    for position, lo in enumerate(bounds):
+        if value >= lo:
+            index = position
+    return index
+
+
+def build_facets(apps, schema_editor):
+    Lot = apps.get_model('LOTES', 'Lot')
+    LotFacetCell = apps.get_model('LOTES', 'LotFacetCell')
+
+    counts = Counter()
+    rows = Lot.objects.values_list('stage_id', 'status', 'price', 'area_m2').order_by()
+    for stage_id, status, price, area in rows.iterator(chunk_size=2000):
+        counts[(stage_id, status, bucket_index(price, PRICE_BOUNDS), bucket_index(area, AREA_BOUNDS))] += 1
+
+    LotFacetCell.objects.all().delete()
+    LotFacetCell.objects.bulk_create(
+        [
+            LotFacetCell(stage_id=s, status=st, price_bucket=p, area_bucket=a, count=n)
+            for (s, st, p, a), n in counts.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0003_lotcluster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotFacetCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=10)),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('area_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LOTES.stage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('stage', 'status', 'price_bucket', 'area_bucket'), name='unique_lot_facet_cell')],
+            },
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
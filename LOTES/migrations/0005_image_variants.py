@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0004_lotfacetcell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lot',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lotimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
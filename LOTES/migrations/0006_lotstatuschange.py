@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 12:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_status', models.CharField(blank=True, default='', max_length=10)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Disponible'), ('RESERVED', 'Reservado'), ('SOLD', 'Vendido')], max_length=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lot', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='LOTES.lot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['changed_at', 'status'], name='LOTES_lotst_changed_e306ab_idx')],
+            },
+        ),
+    ]
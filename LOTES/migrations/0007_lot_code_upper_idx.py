@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# Índice para buscar lotes por prefijo de código sin distinguir mayúsculas
+# (SALES.autocomplete: UPPER(code::text) LIKE UPPER('x%')). El índice único
+# de code distingue mayúsculas y no sirve para esa consulta. Solo PostgreSQL.
+
+POSTGRES_FORWARD = ["CREATE INDEX lot_code_upper_idx ON {table} (UPPER(code) text_pattern_ops)"]
+POSTGRES_BACKWARD = ["DROP INDEX IF EXISTS lot_code_upper_idx"]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        table = schema_editor.quote_name(apps.get_model("LOTES", "Lot")._meta.db_table)
+        for sql in statements:
+            schema_editor.execute(sql.format(table=table))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0006_lotstatuschange'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
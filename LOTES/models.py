@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+
+from .geo import encode_geohash
 
 # Create your models here.
 class Stage(models.Model):
@@ -16,6 +19,8 @@ class Lot(models.Model):
     area_m2 = models.DecimalField(max_digits=6, decimal_places=2)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     image = models.FileField(upload_to="lot_images/", blank=True, null=True)
+    # Rutas de las variantes generadas (LOTES.images); "source" es la imagen de origen
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     stage = models.ForeignKey(Stage, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='AVAILABLE')
     description = models.TextField(blank=True, null=True)
@@ -23,12 +28,73 @@ class Lot(models.Model):
     # Para mapa interactivo
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Índice espacial: geohash de (latitude, longitude), se recalcula en save()
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True, editable=False)
 
     def __str__(self):
         return self.code
 
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(float(self.latitude or 0), float(self.longitude or 0))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"geohash"}
+        super().save(*args, **kwargs)
+
+
+class LotStatusChange(models.Model):
+    # Historial de cambios de estado (lo registra LOTES.inventory); se
+    # conserva aunque el lote se borre para no alterar series pasadas.
+    lot = models.ForeignKey(Lot, null=True, on_delete=models.SET_NULL, related_name="status_changes")
+    previous_status = models.CharField(max_length=10, blank=True, default="")
+    status = models.CharField(max_length=10, choices=Lot.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["changed_at", "status"])]
+
+    def __str__(self):
+        return f"{self.lot_id}: {self.previous_status or '-'} -> {self.status}"
+
 
 class LotImage(models.Model):
     lot = models.ForeignKey(Lot, on_delete=models.CASCADE, related_name="images")
     image = models.FileField(upload_to="lot_images/")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class LotCluster(models.Model):
+    # Agregado precalculado por celda geohash para el mapa a zoom bajo.
+    # Se mantiene incrementalmente desde LOTES.clusters.
+    precision = models.PositiveSmallIntegerField()
+    cell = models.CharField(max_length=12)
+    total = models.IntegerField(default=0)
+    available = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0)
+    lon_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["precision", "cell"], name="unique_lot_cluster_cell"),
+        ]
+
+
+class LotFacetCell(models.Model):
+    # Cubo de conteos (etapa × estado × rango de precio × rango de área)
+    # para las facetas de búsqueda. Se mantiene desde LOTES.facets.
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10)
+    price_bucket = models.PositiveSmallIntegerField()
+    area_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["stage", "status", "price_bucket", "area_bucket"],
+                name="unique_lot_facet_cell",
+            ),
+        ]
@@ -0,0 +1,49 @@
+from .catalog import filter_lots
+from .facets import AREA_BUCKETS, FREE_RANGE_FILTERS, PRICE_BUCKETS, count_facets
+from .models import Lot, Stage
+
+FACET_TITLES = {
+    "stage": "Etapa",
+    "status": "Estado",
+    "price_bucket": "Precio",
+    "area_bucket": "Área",
+}
+
+
+def search_lots(filters, queryset=None, ordering=("code",)):
+    """
+    Búsqueda de lotes con conteos por faceta. Los conteos salen del cubo
+    LotFacetCell (sin COUNT por faceta); ver LOTES.facets.count_facets.
+    Devuelve {"lots": queryset, "total": int, "facets": {...}}.
+    """
+    if queryset is None:
+        queryset = Lot.objects.select_related("stage")
+    lots = filter_lots(queryset, filters).order_by(*ordering)
+    range_only = {name: filters.get(name) for name in FREE_RANGE_FILTERS}
+    total, facets = count_facets(filters, filter_lots(Lot.objects.all(), range_only))
+    return {"lots": lots, "total": total, "facets": facets}
+
+
+def facet_options(facets, filters, stages=None):
+    """Facetas listas para mostrar: etiquetas, conteos y selección actual."""
+    if stages is None:
+        stages = Stage.objects.all().order_by("name")
+    labels = {
+        "stage": [(s.id, s.name) for s in stages],
+        "status": list(Lot.STATUS_CHOICES),
+        "price_bucket": [(i, b[0]) for i, b in enumerate(PRICE_BUCKETS)],
+        "area_bucket": [(i, b[0]) for i, b in enumerate(AREA_BUCKETS)],
+    }
+    out = []
+    for dim, choices in labels.items():
+        selected = set(filters.get(dim) or ())
+        counts = facets.get(dim, {})
+        out.append({
+            "name": dim,
+            "title": FACET_TITLES[dim],
+            "options": [
+                {"value": value, "label": label, "count": counts.get(value, 0), "selected": value in selected}
+                for value, label in choices
+            ],
+        })
+    return out
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from PROJECT_INFO.versions import INVENTORY, bump_version
+from .images import delete_variant_files, needs_variants, schedule_variants
+from .inventory import apply_lot_changes, load_snapshots, lot_snapshot
+from .models import Lot, LotImage, Stage
+
+
+@receiver(post_save, sender=Lot)
+@receiver(post_delete, sender=Lot)
+@receiver(post_save, sender=Stage)
+@receiver(post_delete, sender=Stage)
+@receiver(post_save, sender=LotImage)
+@receiver(post_delete, sender=LotImage)
+def bump_inventory_version(sender, instance, **kwargs):
+    bump_version(INVENTORY)
+
+
+@receiver(pre_save, sender=Lot)
+def remember_lot_snapshot(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk and not raw:
+        previous = load_snapshots([instance.pk]).get(instance.pk)
+    instance._snapshot = previous
+
+
+@receiver(post_save, sender=Lot)
+def update_lot_aggregates(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = lot_snapshot(instance)
+    apply_lot_changes([(getattr(instance, "_snapshot", None), current)])
+    instance._snapshot = current
+
+
+@receiver(post_delete, sender=Lot)
+def remove_lot_from_aggregates(sender, instance, **kwargs):
+    apply_lot_changes([(lot_snapshot(instance), None)])
+
+
+@receiver(post_save, sender=Lot)
+@receiver(post_save, sender=LotImage)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Lot)
+@receiver(post_delete, sender=LotImage)
+def delete_image_variants(sender, instance, **kwargs):
+    variants = dict(instance.image_variants or {})
+    if variants:
+        transaction.on_commit(lambda: delete_variant_files(variants))
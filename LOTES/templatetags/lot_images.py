@@ -0,0 +1,11 @@
+from django import template
+
+from LOTES.images import variant_url
+
+register = template.Library()
+
+
+@register.filter
+def variant(instance, key):
+    """{{ lot|variant:"card" }} -> URL de la variante (o del original)."""
+    return variant_url(instance, key)
@@ -1,3 +1,200 @@
+import io
+import random
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from decimal import Decimal
+
+from .catalog import filter_lots
+from .clusters import CLUSTER_PRECISIONS, clusters_in_bbox
+from .geo import _BASE32, bbox_filter, count_cells, cover_bbox, encode_geohash, prefix_range
+from .facets import AREA_BUCKETS, DIMENSIONS, PRICE_BUCKETS, _cube_from_lots, count_facets
+from .importer import import_lots
+from .models import Lot, LotStatusChange, Stage
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+class LotImportTests(TestCase):
+    """Reimportar una hoja sin estado no debe tocar el estado de los lotes."""
+
+    def setUp(self):
+        Stage.objects.create(name="Preventa", description="")
+        import_lots(csv_file(
+            "codigo,etapa,area,precio,estado,latitud,longitud\n"
+            "A-1,Preventa,100,1000,Disponible,10.1,-75.1\n"
+            "A-2,Preventa,120,2000,Vendido,10.2,-75.2\n"
+            "A-3,Preventa,130,3000,Reservado,10.3,-75.3\n"
+        ), "lotes.csv")
+
+    def statuses(self):
+        return dict(Lot.objects.values_list("code", "status"))
+
+    def test_reimport_without_status_column_keeps_status(self):
+        last_change = LotStatusChange.objects.order_by("-id").values_list("id", flat=True).first()
+        result = import_lots(csv_file(
+            "codigo,etapa,area,precio,latitud,longitud\n"
+            "A-1,Preventa,100,1500,10.1,-75.1\n"
+            "A-2,Preventa,120,2500,10.2,-75.2\n"
+            "A-3,Preventa,130,3500,10.3,-75.3\n"
+            "A-4,Preventa,140,4500,10.4,-75.4\n"
+        ), "precios.csv")
+        self.assertEqual((result.created, result.updated, result.error_count), (1, 3, 0))
+        self.assertEqual(
+            self.statuses(), {"A-1": "AVAILABLE", "A-2": "SOLD", "A-3": "RESERVED", "A-4": "AVAILABLE"}
+        )
+        self.assertEqual(Lot.objects.get(code="A-2").price, 2500)
+        # Solo el alta de A-4 queda en el historial; ningún lote "vuelve" a disponible
+        self.assertEqual(
+            list(LotStatusChange.objects.filter(id__gt=last_change).values_list("lot__code", "status")),
+            [("A-4", "AVAILABLE")],
+        )
+
+    def test_empty_status_cell_keeps_status_and_explicit_status_updates(self):
+        import_lots(csv_file(
+            "codigo,etapa,area,precio,estado,latitud,longitud\n"
+            "A-1,Preventa,100,1000,Vendido,10.1,-75.1\n"
+            "A-2,Preventa,120,2000,,10.2,-75.2\n"
+        ), "estados.csv")
+        self.assertEqual(self.statuses(), {"A-1": "SOLD", "A-2": "SOLD", "A-3": "RESERVED"})
+
+    def test_unknown_status_is_an_error(self):
+        result = import_lots(csv_file(
+            "codigo,etapa,area,precio,estado,latitud,longitud\n"
+            "A-1,Preventa,100,1000,Perdido,10.1,-75.1\n"
+        ), "malo.csv")
+        self.assertEqual(result.error_count, 1)
+        self.assertEqual(self.statuses()["A-1"], "AVAILABLE")
+
+
+class GeoTests(TestCase):
+    def test_encode_reference_values(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(encode_geohash(-25.382708, -49.265506, 8), "6gkzwgjz")
+        self.assertEqual(encode_geohash(0, 0, 4), "s000")
+
+    def test_prefix_range_bounds(self):
+        self.assertEqual(prefix_range("d2g4"), ("d2g4", "d2g5"))
+        self.assertEqual(prefix_range("d2g9"), ("d2g9", "d2gb"))
+        self.assertEqual(prefix_range("d2gz"), ("d2gz", "d2h"))
+        self.assertEqual(prefix_range("zz"), ("zz", None))
+
+    def test_prefix_range_matches_startswith(self):
+        # Los límites son solo letras y dígitos: mismo orden en cualquier collation
+        random.seed(7)
+        hashes = ["".join(random.choice(_BASE32) for _ in range(6)) for _ in range(3000)]
+        for prefix in ("d", "d2", "9z", "zz", "u4p"):
+            lo, hi = prefix_range(prefix)
+            self.assertTrue(set(hi or "") <= set(_BASE32))
+            inside = {h for h in hashes if h >= lo and (hi is None or h < hi)}
+            self.assertEqual(inside, {h for h in hashes if h.startswith(prefix)}, prefix)
+
+    def test_cover_bbox(self):
+        prefixes = cover_bbox(10.0, -75.5, 10.5, -75.0)
+        self.assertLessEqual(len(prefixes), 24)
+        self.assertEqual(len({len(p) for p in prefixes}), 1)
+        self.assertEqual(len(prefixes), count_cells(10.0, -75.5, 10.5, -75.0, len(prefixes[0])))
+        # Cada esquina cae en alguna celda de la cobertura
+        for lat, lon in ((10.0, -75.5), (10.5, -75.0), (10.25, -75.25)):
+            self.assertTrue(any(encode_geohash(lat, lon).startswith(p) for p in prefixes))
+        self.assertEqual(cover_bbox(-90, -180, 90, 180), [""])
+
+    def test_bbox_filter(self):
+        stage = Stage.objects.create(name="Preventa", description="")
+        random.seed(3)
+        inside = set()
+        for i in range(200):
+            lat, lon = random.uniform(9.5, 11), random.uniform(-76, -74.5)
+            lot = Lot.objects.create(code=f"L{i}", stage=stage, area_m2=100, price=1000, latitude=lat, longitude=lon)
+            if 10.0 <= lat <= 10.5 and -75.5 <= lon <= -75.0:
+                inside.add(lot.id)
+        found = bbox_filter(Lot.objects.all(), 10.0, -75.5, 10.5, -75.0)
+        self.assertTrue(inside)
+        self.assertEqual(set(found.values_list("id", flat=True)), inside)
+
+
+class ClusterTests(TestCase):
+    """Los clusters de un bbox suman los mismos lotes que el bbox."""
+
+    BBOX = (10.0, -75.5, 10.5, -75.0)
+
+    def setUp(self):
+        stage = Stage.objects.create(name="Preventa", description="")
+        random.seed(5)
+        statuses = ("AVAILABLE", "RESERVED", "SOLD")
+        # Un grupo dentro del bbox y otro lejos (otras celdas en todos los niveles)
+        points = [(random.uniform(10.1, 10.4), random.uniform(-75.4, -75.1)) for _ in range(120)]
+        points += [(random.uniform(4, 5), random.uniform(-74, -73)) for _ in range(60)]
+        for i, (lat, lon) in enumerate(points):
+            Lot.objects.create(code=f"L{i}", stage=stage, area_m2=100, price=1000,
+                               latitude=lat, longitude=lon, status=statuses[i % 3])
+
+    def test_cluster_counts_match_lots(self):
+        south, west, north, east = self.BBOX
+        lots = Lot.objects.filter(latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east)
+        expected = {status: lots.filter(status=status).count() for status in ("AVAILABLE", "RESERVED", "SOLD")}
+        for precision in CLUSTER_PRECISIONS[:4]:
+            clusters = list(clusters_in_bbox(south, west, north, east, precision))
+            self.assertTrue(all(len(c.cell) == precision for c in clusters))
+            self.assertEqual(sum(c.total for c in clusters), lots.count(), precision)
+            self.assertEqual(
+                {"AVAILABLE": sum(c.available for c in clusters), "RESERVED": sum(c.reserved for c in clusters),
+                 "SOLD": sum(c.sold for c in clusters)},
+                expected,
+            )
+
+
+class FacetTests(TestCase):
+    """Los conteos del cubo coinciden con contar los lotes directamente."""
+
+    def setUp(self):
+        random.seed(11)
+        stages = [Stage.objects.create(name=f"Etapa {i}", description="") for i in range(3)]
+        prices = [Decimal(n) for n in ("0", "49999999.99", "50000000", "150000000", "300000000")]
+        areas = [Decimal(n) for n in ("99.99", "100", "300", "450")]
+        for i in range(150):
+            price = random.choice(prices) if i % 4 == 0 else Decimal(random.randint(1, 400)) * 1000000
+            area = random.choice(areas) if i % 5 == 0 else Decimal(random.randint(60, 400))
+            Lot.objects.create(
+                code=f"L{i}", stage=random.choice(stages), price=price, area_m2=area,
+                latitude=10, longitude=-75, status=random.choice(("AVAILABLE", "RESERVED", "SOLD")),
+            )
+        self.values = {
+            "stage": [s.id for s in stages],
+            "status": ["AVAILABLE", "RESERVED", "SOLD"],
+            "price_bucket": list(range(len(PRICE_BUCKETS))),
+            "area_bucket": list(range(len(AREA_BUCKETS))),
+        }
+
+    def assert_matches_lots(self, filters):
+        range_only = {name: filters.get(name) for name in ("price_min", "price_max", "area_min", "area_max")}
+        total, facets = count_facets(filters, filter_lots(Lot.objects.all(), range_only))
+        self.assertEqual(total, filter_lots(Lot.objects.all(), filters).count())
+        for dim in DIMENSIONS:
+            for value in self.values[dim]:
+                expected = filter_lots(Lot.objects.all(), {**filters, dim: [value]}).count()
+                self.assertEqual(facets[dim].get(value, 0), expected, (dim, value))
+
+    def test_cube_table(self):
+        self.assert_matches_lots({})
+        self.assert_matches_lots({"status": ["SOLD"], "price_bucket": [1, 2]})
+
+    def test_free_ranges(self):
+        self.assert_matches_lots({"price_min": Decimal("40000000"), "price_max": Decimal("250000000")})
+        self.assert_matches_lots({"area_min": Decimal("100"), "stage": [self.values["stage"][0]], "area_bucket": [1]})
 
-# Create your tests here.
+    def test_free_range_groups_by_cell(self):
+        with CaptureQueriesContext(connection) as queries:
+            cells = _cube_from_lots(Lot.objects.all())
+        # La base de datos devuelve una fila por celda, no por precio/área distintos
+        with connection.cursor() as cursor:
+            cursor.execute(queries[0]["sql"])
+            db_rows = cursor.fetchall()
+        self.assertEqual(len(db_rows), len(cells))
+        self.assertEqual(len({cell[:-1] for cell in cells}), len(cells))
+        self.assertLess(len(cells), Lot.objects.values("price", "area_m2").distinct().count())
+        self.assertEqual(sum(cell[-1] for cell in cells), Lot.objects.count())
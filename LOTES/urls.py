@@ -3,9 +3,12 @@ from .views import (
     lot_list,
     map_view,
     lot_list_api,
+    lot_map_data,
+    lot_map_clusters,
     admin_lot_list,
     admin_lot_create,
     admin_lot_edit,
+    admin_lot_import,
     admin_stage_list,
     admin_stage_create,
     admin_stage_edit,
@@ -16,12 +19,15 @@ urlpatterns = [
     path('', lot_list, name='lot_list'),
     path('mapa/', map_view, name='lot_map'),
     path('api/list/', lot_list_api, name='lot_list_api'),
+    path('api/map/', lot_map_data, name='lot_map_data'),
+    path('api/map/clusters/', lot_map_clusters, name='lot_map_clusters'),
     path('buy/<int:lot_id>/', buy_lot, name='buy_lot'),
     
     # Admin Lotes
     path('admin/list/', admin_lot_list, name='admin_lot_list'),
     path('admin/create/', admin_lot_create, name='admin_lot_create'),
     path('admin/edit/<int:lot_id>/', admin_lot_edit, name='admin_lot_edit'),
+    path('admin/import/', admin_lot_import, name='admin_lot_import'),
     
     # Admin Etapas
     path('admin/stages/', admin_stage_list, name='admin_stage_list'),
@@ -1,60 +1,229 @@
+import hashlib
+
 from USERS.decorators import admin_required
+from django.contrib import messages
 from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import Case, Count, Max, Min, Q, When
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
+from PROJECT_INFO.pagecache import anonymous_page_cache
+from PROJECT_INFO.versions import CONTENT, INVENTORY, get_version
+from SIGLO.pagination import InvalidCursor, paginate_keyset
+from .catalog import CATALOG_FIELDS, FILTER_PARAMS, filter_lots, parse_fields, parse_lot_filters, serialize_rows
+from .clusters import CLUSTER_MAX_ZOOM, clusters_in_bbox, precision_for_view, serialize_cluster
+from .geo import bbox_filter, parse_bbox
+from .importer import import_lots
 from .models import Lot, Stage, LotImage
+from .search import facet_options, search_lots
+
+CATALOG_PAGE_SIZE = 100
+CATALOG_MAX_PAGE_SIZE = 500
+
+ADMIN_LOT_PAGE_SIZE = 50
+ADMIN_LOT_SORTS = {
+    "code": "code",
+    "stage": "stage__name",
+    "area": "area_m2",
+    "price": "price",
+    "status": "status",
+}
+
+# Mapa: por debajo de MAP_DETAIL_ZOOM solo se envía lo necesario para pintar
+# el marcador; el detalle del popup llega al acercarse.
+MAP_MAX_FEATURES = 1000
+MAP_DETAIL_ZOOM = 15
+MAP_SUMMARY_FIELDS = ("id", "code", "status", "latitude", "longitude")
+MAP_DETAIL_FIELDS = MAP_SUMMARY_FIELDS + ("stage", "area_m2", "price", "image_url", "image_variants")
+# Rango de coordenadas válidas (costa Caribe colombiana), igual que en el mapa
+MAP_VALID_COORDS = Q(latitude__gt=5, latitude__lt=15, longitude__gt=-80, longitude__lt=-70)
+
 
+def _toggle_url(params, name, value):
+    params = params.copy()
+    values = [v for v in params.getlist(name) if v != str(value)]
+    if len(values) == len(params.getlist(name)):
+        values.append(str(value))
+    params.setlist(name, values)
+    return "?" + params.urlencode() if params else "?"
 
+
+@anonymous_page_cache((INVENTORY, CONTENT), params=FILTER_PARAMS)
 def lot_list(request):
-    lots = Lot.objects.select_related("stage").all().order_by("code")
+    try:
+        filters = parse_lot_filters(request.GET)
+    except ValueError as e:
+        messages.warning(request, str(e))
+        filters = {}
     stages = Stage.objects.all().order_by("name")
-    return render(request, "lotes/list.html", {"lots": lots, "stages": stages})
+    search = search_lots(filters, Lot.objects.select_related("stage").prefetch_related("images"))
+    facets = facet_options(search["facets"], filters, stages)
+    for facet in facets:
+        for option in facet["options"]:
+            option["url"] = _toggle_url(request.GET, facet["name"], option["value"])
+    context = {
+        "lots": search["lots"],
+        "stages": stages,
+        "facets": facets,
+        "total": search["total"],
+        "has_filters": bool(request.GET),
+    }
+    return render(request, "lotes/list.html", context)
 
 
 def map_view(request):
-    lots = Lot.objects.select_related("stage").all().order_by("code")
-    return render(request, "lotes/map.html", {"lots": lots})
+    stats = Lot.objects.aggregate(
+        available=Count("id", filter=Q(status="AVAILABLE")),
+        reserved=Count("id", filter=Q(status="RESERVED")),
+        sold=Count("id", filter=Q(status="SOLD")),
+    )
+    bounds = Lot.objects.filter(MAP_VALID_COORDS).aggregate(
+        south=Min("latitude"), west=Min("longitude"),
+        north=Max("latitude"), east=Max("longitude"),
+    )
+    focus = None
+    lot_id = request.GET.get("lot_id")
+    if lot_id and lot_id.isdigit():
+        focus = Lot.objects.filter(MAP_VALID_COORDS, pk=lot_id).values("id", "latitude", "longitude").first()
+    context = {
+        "stats": stats,
+        "bounds": bounds if bounds["south"] is not None else None,
+        "focus": focus,
+        "cluster_max_zoom": CLUSTER_MAX_ZOOM,
+    }
+    return render(request, "lotes/map.html", context)
+
+
+def _inventory_version(request):
+    # Se consulta una sola vez por request: la usan el ETag y el Last-Modified.
+    if not hasattr(request, "_inventory_version"):
+        request._inventory_version = get_version(INVENTORY)
+    return request._inventory_version
+
 
+def _catalog_etag(request, *args, **kwargs):
+    version, _ = _inventory_version(request)
+    params = sorted(request.GET.lists())
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+    return f"inv{version}-{digest}"
 
+
+def _catalog_last_modified(request, *args, **kwargs):
+    _, updated_at = _inventory_version(request)
+    return updated_at
+
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
 def lot_list_api(request):
-    lots = Lot.objects.select_related("stage").all().order_by("code")
-    data = []
-    for lot in lots:
-        data.append(
-            {
-                "id": lot.id,
-                "code": lot.code,
-                "area_m2": float(lot.area_m2),
-                "price": float(lot.price),
-                "status": lot.status,
-                "stage": lot.stage.name if lot.stage else "",
-                "latitude": float(lot.latitude) if lot.latitude else None,
-                "longitude": float(lot.longitude) if lot.longitude else None,
-            }
-        )
-    return JsonResponse({"results": data})
+    try:
+        filters = parse_lot_filters(request.GET)
+        fields = parse_fields(request.GET)
+        limit = int(request.GET.get("limit") or CATALOG_PAGE_SIZE)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    limit = max(1, min(limit, CATALOG_MAX_PAGE_SIZE))
+
+    columns = {"code"} | {CATALOG_FIELDS[name][0] for name in fields}
+    lots = filter_lots(Lot.objects.all(), filters).values(*columns)
+    try:
+        rows, next_cursor = paginate_keyset(lots, ["code"], request.GET.get("cursor"), limit)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    data = serialize_rows(rows, fields)
+    response = JsonResponse({"results": data, "next_cursor": next_cursor})
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def lot_map_data(request):
+    try:
+        south, west, north, east = parse_bbox(request.GET.get("bbox"))
+        zoom = int(request.GET.get("zoom") or 0)
+        filters = parse_lot_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    zoom = max(0, min(zoom, 22))
+
+    fields = MAP_DETAIL_FIELDS if zoom >= MAP_DETAIL_ZOOM else MAP_SUMMARY_FIELDS
+    columns = {CATALOG_FIELDS[name][0] for name in fields}
+    lots = bbox_filter(filter_lots(Lot.objects.all(), filters), south, west, north, east)
+    rows = list(lots.order_by("code").values(*columns)[: MAP_MAX_FEATURES + 1])
+    truncated = len(rows) > MAP_MAX_FEATURES
+
+    response = JsonResponse({
+        "zoom": zoom,
+        "results": serialize_rows(rows[:MAP_MAX_FEATURES], fields),
+        "truncated": truncated,
+    })
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)
+def lot_map_clusters(request):
+    try:
+        south, west, north, east = parse_bbox(request.GET.get("bbox"))
+        zoom = int(request.GET.get("zoom") or 0)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    zoom = max(0, min(zoom, 22))
+
+    precision = precision_for_view(zoom, south, west, north, east)
+    clusters = clusters_in_bbox(south, west, north, east, precision)
+    response = JsonResponse({
+        "zoom": zoom,
+        "precision": precision,
+        "results": [serialize_cluster(c) for c in clusters],
+    })
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
 
 
 @admin_required
 def admin_lot_list(request):
-    from SALES.models import Purchase, Payment
-    lots = Lot.objects.select_related("stage").all().order_by("code")
-    
-    # Attach recent payment info for each lot
-    for lot in lots:
-        if lot.status in ['RESERVED', 'SOLD']:
-            # Find the most recent purchase that includes this lot
-            purchase = Purchase.objects.filter(lots=lot).order_by('-created_at').first()
-            if purchase:
-                # Get the most recent payment for this purchase
-                recent_payment = Payment.objects.filter(purchase=purchase).order_by('-payment_date', '-id').first()
-                lot.recent_payment = recent_payment
-                lot.associated_purchase = purchase
-        else:
-            lot.recent_payment = None
-            lot.associated_purchase = None
+    from SALES.projections import attach_current_purchases, current_purchase_subquery
+
+    sort = request.GET.get("sort") or "code"
+    if sort.lstrip("-") not in ADMIN_LOT_SORTS:
+        sort = "code"
+    field = ADMIN_LOT_SORTS[sort.lstrip("-")]
+    ordering = [f"-{field}" if sort.startswith("-") else field, "id"]
+
+    lots = (
+        Lot.objects.select_related("stage")
+        .annotate(
+            current_purchase_id=Case(
+                When(status__in=["RESERVED", "SOLD"], then=current_purchase_subquery()),
+                default=None,
+            )
+        )
+        .order_by(*ordering)
+    )
+    page = Paginator(lots, ADMIN_LOT_PAGE_SIZE).get_page(request.GET.get("page"))
+    page.object_list = attach_current_purchases(list(page.object_list))
+
+    return render(request, "lotes/admin_lot_list.html", {"lots": page.object_list, "page": page, "sort": sort})
 
-    return render(request, "lotes/admin_lot_list.html", {"lots": lots})
+
+@admin_required
+def admin_lot_import(request):
+    context = {"report": None, "error": None}
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload or not upload.name.lower().endswith((".csv", ".xlsx")):
+            context["error"] = "Selecciona un archivo CSV o XLSX."
+        else:
+            try:
+                context["report"] = import_lots(
+                    upload.file, upload.name, create_stages=bool(request.POST.get("create_stages"))
+                )
+            except ValueError as e:
+                context["error"] = str(e)
+    return render(request, "lotes/admin_lot_import.html", context)
 
 
 @admin_required
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PqrsConfig(AppConfig):
     name = 'PQRS'
+
+    def ready(self):
+        import PQRS.signals
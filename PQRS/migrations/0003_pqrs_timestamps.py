@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 12:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PQRS', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pqrs',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        # Sin default al agregarla: las filas existentes quedan en NULL en vez
+        # de recibir la fecha de la migración (un pico falso en las series).
+        migrations.AddField(
+            model_name='pqrs',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pqrs',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=django.utils.timezone.now, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Índice de texto completo sobre message y response. En SQLite es una tabla
+# FTS5 que mantiene PQRS.signals; en PostgreSQL una columna tsvector
+# generada (se actualiza sola en cada escritura) con índice GIN.
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE pqrs_search USING fts5(message, response, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO pqrs_search (rowid, message, response) SELECT id, message, coalesce(response, '') FROM {table}",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS pqrs_search"]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('spanish', coalesce(message, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(response, '')), 'B')) STORED",
+    "CREATE INDEX pqrs_search_vector_idx ON {table} USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS pqrs_search_vector_idx",
+    "ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        table = schema_editor.quote_name(apps.get_model("PQRS", "PQRS")._meta.db_table)
+        for sql in statements:
+            schema_editor.execute(sql.format(table=table))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PQRS', '0003_pqrs_timestamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 
 # Create your models here.
 from django.conf import settings
+from django.utils import timezone
 
 class PQRS(models.Model):
     TYPE_CHOICES = (
@@ -20,4 +21,16 @@ class PQRS(models.Model):
     type = models.CharField(max_length=1, choices=TYPE_CHOICES)
     message = models.TextField()
     response = models.TextField(blank=True, null=True)
-    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN')
\ No newline at end of file
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='OPEN')
+    # Para las series de PQRS abiertas/cerradas (ver PROJECT_INFO.timeseries).
+    # NULL en las PQRS creadas antes de este campo: su fecha real no se
+    # conoce y las series las excluyen.
+    created_at = models.DateTimeField(default=timezone.now, null=True, blank=True, db_index=True)
+    closed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.status == 'CLOSED' and self.closed_at is None:
+            self.closed_at = timezone.now()
+        elif self.status != 'CLOSED':
+            self.closed_at = None
+        super().save(*args, **kwargs)
@@ -0,0 +1,165 @@
+import html
+import re
+
+from django.db import connection
+from django.utils.safestring import mark_safe
+
+from .models import PQRS
+
+PQRS_PAGE_SIZE = 25
+# Tabla FTS5 (solo SQLite); en PostgreSQL se usa la columna search_vector
+# con índice GIN. Ambas las crea la migración 0004_pqrs_search.
+FTS_TABLE = "pqrs_search"
+TS_CONFIG = "spanish"
+# Marcas de resaltado: caracteres de uso privado que no aparecen en el
+# texto; se escapa el HTML y luego se cambian por <mark>.
+MARK_START, MARK_STOP = "\ue000", "\ue001"
+SNIPPET_WORDS = 24
+WORD_RE = re.compile(r"\w+")
+
+
+def search_words(text):
+    return WORD_RE.findall(text or "")[:10]
+
+
+def highlight(text):
+    escaped = html.escape(text or "")
+    return mark_safe(escaped.replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>"))
+
+
+def _table():
+    return connection.ops.quote_name(PQRS._meta.db_table)
+
+
+def _filters_sql(filters):
+    clauses, params = [], []
+    for name in ("type", "status"):
+        if filters.get(name):
+            clauses.append(f"p.{connection.ops.quote_name(name)} = %s")
+            params.append(filters[name])
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class _SQLiteBackend:
+    # Cada palabra como prefijo entre comillas: el texto del usuario nunca
+    # se interpreta como sintaxis de FTS5.
+    @staticmethod
+    def query(words):
+        return " ".join(f'"{word}"*' for word in words)
+
+    def count(self, words, filters):
+        where, params = _filters_sql(filters)
+        sql = (
+            f"SELECT COUNT(*) FROM {FTS_TABLE} JOIN {_table()} p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{where}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.query(words), *params])
+            return cursor.fetchone()[0]
+
+    def page(self, words, filters, offset, limit):
+        where, params = _filters_sql(filters)
+        snippet = f"snippet({FTS_TABLE}, %s, %s, %s, '…', {SNIPPET_WORDS})"
+        sql = (
+            f"SELECT p.id, bm25({FTS_TABLE}, 2.0, 1.0) AS score, {snippet}, {snippet} "
+            f"FROM {FTS_TABLE} JOIN {_table()} p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{where} ORDER BY score, p.id DESC LIMIT %s OFFSET %s"
+        )
+        marks = [MARK_START, MARK_STOP]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [0, *marks, 1, *marks, self.query(words), *params, limit, offset])
+            # bm25 es menor cuanto más relevante
+            return [(pk, -score, message, response) for pk, score, message, response in cursor.fetchall()]
+
+
+class _PostgresBackend:
+    # Mismo criterio que en SQLite: todas las palabras, como prefijo
+    @staticmethod
+    def query(words):
+        return " & ".join(f"{word}:*" for word in words)
+
+    def count(self, words, filters):
+        where, params = _filters_sql(filters)
+        sql = (
+            f"SELECT COUNT(*) FROM {_table()} p "
+            f"WHERE p.search_vector @@ to_tsquery('{TS_CONFIG}', %s){where}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.query(words), *params])
+            return cursor.fetchone()[0]
+
+    def page(self, words, filters, offset, limit):
+        where, params = _filters_sql(filters)
+        options = f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=8, MaxFragments=2, FragmentDelimiter=…"
+        # ts_headline solo sobre las filas de la página
+        sql = (
+            f"SELECT p.id, ranked.score, "
+            f"ts_headline('{TS_CONFIG}', p.message, ranked.q, %s), "
+            f"ts_headline('{TS_CONFIG}', coalesce(p.response, ''), ranked.q, %s) "
+            f"FROM (SELECT p.id, q, ts_rank(p.search_vector, q) AS score "
+            f"FROM {_table()} p, to_tsquery('{TS_CONFIG}', %s) q "
+            f"WHERE p.search_vector @@ q{where} ORDER BY score DESC, p.id DESC LIMIT %s OFFSET %s) ranked "
+            f"JOIN {_table()} p ON p.id = ranked.id ORDER BY ranked.score DESC, p.id DESC"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [options, options, self.query(words), *params, limit, offset])
+            return cursor.fetchall()
+
+
+def _backend():
+    return _PostgresBackend() if connection.vendor == "postgresql" else _SQLiteBackend()
+
+
+class PQRSSearch:
+    """
+    Resultados de búsqueda ordenados por relevancia, para usar con
+    Paginator: count() y cada porción hacen una consulta al índice. Cada
+    PQRS trae `score`, `message_highlight` y `response_highlight`.
+    """
+
+    def __init__(self, text, filters=None):
+        self.words = search_words(text)
+        self.filters = filters or {}
+        self.backend = _backend()
+
+    def count(self):
+        return self.backend.count(self.words, self.filters)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("PQRSSearch solo admite porciones.")
+        offset = key.start or 0
+        rows = self.backend.page(self.words, self.filters, offset, key.stop - offset)
+        objects = PQRS.objects.select_related("client").in_bulk([row[0] for row in rows])
+        results = []
+        for pk, score, message, response in rows:
+            pq = objects.get(pk)
+            if pq is None:
+                continue
+            pq.score = score
+            pq.message_highlight = highlight(message)
+            pq.response_highlight = highlight(response) if MARK_START in (response or "") else ""
+            results.append(pq)
+        return results
+
+
+def index_pqrs(pq):
+    """Actualiza la fila de la PQRS en el índice FTS5 (PostgreSQL usa una columna generada)."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pq.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, message, response) VALUES (%s, %s, %s)",
+            [pq.pk, pq.message or "", pq.response or ""],
+        )
+
+
+def unindex_pqrs(pk):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from PROJECT_INFO.summaries import refresh_client_summaries_on_commit
+from PROJECT_INFO.timeseries import touch_series
+from PROJECT_INFO.versions import PQRS as PQRS_VERSION, bump_version
+from .models import PQRS
+from .search import index_pqrs, unindex_pqrs
+
+
+@receiver(post_save, sender=PQRS)
+@receiver(post_delete, sender=PQRS)
+def bump_pqrs_version(sender, instance, **kwargs):
+    bump_version(PQRS_VERSION)
+
+
+def _series_days(*moments):
+    return {timezone.localdate(moment) for moment in moments if moment}
+
+
+@receiver(pre_save, sender=PQRS)
+def remember_pqrs_dates(sender, instance, raw=False, **kwargs):
+    instance._previous_dates = None
+    if instance.pk and not raw:
+        instance._previous_dates = PQRS.objects.filter(pk=instance.pk).values_list("created_at", "closed_at").first()
+
+
+@receiver(post_save, sender=PQRS)
+def touch_pqrs_series(sender, instance, raw=False, **kwargs):
+    # Abiertas y cerradas se cuentan por created_at y closed_at: si cambian
+    # (cierre, reapertura, edición) cambian también buckets ya cerrados
+    previous = getattr(instance, "_previous_dates", None) or ()
+    current = (instance.created_at, instance.closed_at)
+    if not raw and tuple(previous) != current:
+        touch_series(_series_days(*previous, *current))
+
+
+@receiver(post_delete, sender=PQRS)
+def touch_pqrs_series_on_delete(sender, instance, **kwargs):
+    touch_series(_series_days(instance.created_at, instance.closed_at))
+
+
+@receiver(post_save, sender=PQRS)
+@receiver(post_delete, sender=PQRS)
+def update_client_summary(sender, instance, raw=False, **kwargs):
+    # Las PQRS abiertas forman parte del resumen del cliente
+    if not raw:
+        refresh_client_summaries_on_commit([instance.client_id])
+
+
+@receiver(post_save, sender=PQRS)
+def update_search_index(sender, instance, **kwargs):
+    index_pqrs(instance)
+
+
+@receiver(post_delete, sender=PQRS)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_pqrs(instance.pk)
@@ -1,3 +1,90 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import PQRS
+from .search import PQRS_PAGE_SIZE, PQRSSearch
+
+
+class PQRSSearchTests(TestCase):
+    """Búsqueda de texto completo sobre la tabla FTS5 (SQLite)."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user(username="cliente", password="x", role="CLIENT")
+        self.admin = User.objects.create_user(username="admin", password="x", role="ADMIN")
+
+    def pqrs(self, message, response=None, **extra):
+        extra.setdefault("type", "P")
+        return PQRS.objects.create(client=self.client_user, message=message, response=response, **extra)
+
+    def ids(self, text, **filters):
+        return [pq.id for pq in PQRSSearch(text, filters)[:100]]
+
+    def test_prefix_words_and_diacritics(self):
+        water = self.pqrs("Sin servicio de agua en la manzana 4")
+        petition = self.pqrs("Petición de cambio de lote")
+        self.pqrs("Consulta sobre escrituras")
+        self.assertEqual(self.ids("agu"), [water.id])
+        self.assertEqual(self.ids("peticion"), [petition.id])
+        # Todas las palabras deben aparecer
+        self.assertEqual(self.ids("servicio manzana"), [water.id])
+        self.assertEqual(self.ids("servicio lote"), [])
+
+    def test_message_ranks_above_response(self):
+        in_response = self.pqrs("Consulta general", response="Revisamos la factura del mes")
+        in_message = self.pqrs("Error en la factura")
+        self.assertEqual(self.ids("factura"), [in_message.id, in_response.id])
+
+    def test_highlights_escape_html(self):
+        self.pqrs("<b>Urgente</b>: la factura llegó doble", response="Ya corregimos la factura")
+        pq = PQRSSearch("factura")[:1][0]
+        self.assertIn("&lt;b&gt;Urgente&lt;/b&gt;", pq.message_highlight)
+        self.assertIn("<mark>factura</mark>", pq.message_highlight)
+        self.assertIn("<mark>factura</mark>", pq.response_highlight)
+
+    def test_user_text_is_not_query_syntax(self):
+        self.pqrs("Problema con la cerca")
+        for text in ('"cerca', "cerca*", "(cerca)", "-cerca", "cerca:", "^cerca"):
+            self.assertEqual(len(self.ids(text)), 1, text)
+        self.assertEqual(self.ids('cerca" OR "'), [])
+
+    def test_filters(self):
+        open_q = self.pqrs("Ruido en la obra", type="Q")
+        closed_q = self.pqrs("Ruido nocturno", type="Q", status="CLOSED")
+        self.pqrs("Ruido de maquinaria")
+        self.assertEqual(set(self.ids("ruido", type="Q")), {open_q.id, closed_q.id})
+        self.assertEqual(self.ids("ruido", type="Q", status="CLOSED"), [closed_q.id])
+        self.assertEqual(PQRSSearch("ruido", {"status": "OPEN"}).count(), 2)
+
+    def test_index_follows_edits_and_deletes(self):
+        pq = self.pqrs("Pregunta sobre linderos")
+        pq.response = "Los linderos están en el plano"
+        pq.message = "Pregunta sobre el plano"
+        pq.save()
+        self.assertEqual(self.ids("plano"), [pq.id])
+        self.assertEqual(self.ids("pregunta linderos"), [pq.id])
+        pq.delete()
+        self.assertEqual(self.ids("plano"), [])
+
+    def test_admin_list_paginates_results(self):
+        created = [self.pqrs(f"Reclamo por humedad número {i}") for i in range(PQRS_PAGE_SIZE + 5)]
+        self.pqrs("Otro asunto")
+        self.client.force_login(self.admin)
+        url = reverse("admin_pqrs_list")
+
+        first = self.client.get(url, {"q": "humedad"})
+        second = self.client.get(url, {"q": "humedad", "page": 2})
+        self.assertEqual(first.context["page"].paginator.count, len(created))
+        seen = [pq.id for pq in first.context["items"]] + [pq.id for pq in second.context["items"]]
+        self.assertEqual(len(first.context["items"]), PQRS_PAGE_SIZE)
+        self.assertEqual(sorted(seen), sorted(pq.id for pq in created))
+        self.assertContains(first, "<mark>humedad</mark>")
+        self.assertContains(second, "q=humedad")
+
+    def test_admin_list_without_text_filters_by_orm(self):
+        self.pqrs("Abierta")
+        closed = self.pqrs("Cerrada", status="CLOSED")
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("admin_pqrs_list"), {"status": "CLOSED", "q": "  "})
+        self.assertEqual([pq.id for pq in response.context["items"]], [closed.id])
@@ -1,14 +1,17 @@
 from django.template.loader import render_to_string
-from USERS.views import send_mailjet_email
+from PROJECT_INFO.notifications import send_email
 from USERS.decorators import admin_required, client_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
+from django.utils.http import urlencode
 from django.views.generic.edit import CreateView
 
 from .models import PQRS
+from .search import PQRS_PAGE_SIZE, PQRSSearch, search_words
 
 
 class PQRSCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
@@ -34,11 +37,12 @@ class PQRSCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         html_content = render_to_string('emails/pqrs_created_email.html', context)
         
         try:
-            send_mailjet_email(
+            send_email(
                 subject=subject,
                 html_content=html_content,
                 to_email=self.request.user.email,
                 to_name=self.request.user.get_full_name() or self.request.user.username,
+                category='pqrs_created',
             )
             messages.success(
                 self.request, 
@@ -69,8 +73,31 @@ def my_pqrs_list(request):
 
 @admin_required
 def admin_pqrs_list(request):
-    items = PQRS.objects.select_related("client").all().order_by("-id")
-    return render(request, "pqrs/admin_pqrs_list.html", {"items": items})
+    q = (request.GET.get("q") or "").strip()[:200]
+    filters = {
+        "type": request.GET.get("type") if request.GET.get("type") in dict(PQRS.TYPE_CHOICES) else "",
+        "status": request.GET.get("status") if request.GET.get("status") in dict(PQRS.STATUS_CHOICES) else "",
+    }
+    if search_words(q):
+        items = PQRSSearch(q, filters)
+    else:
+        items = (
+            PQRS.objects.select_related("client")
+            .filter(**{name: value for name, value in filters.items() if value})
+            .order_by("-id")
+        )
+    page = Paginator(items, PQRS_PAGE_SIZE).get_page(request.GET.get("page"))
+    query = urlencode({name: value for name, value in {"q": q, **filters}.items() if value})
+    context = {
+        "items": page.object_list,
+        "page": page,
+        "q": q,
+        "filters": filters,
+        "query": query,
+        "type_choices": PQRS.TYPE_CHOICES,
+        "status_choices": PQRS.STATUS_CHOICES,
+    }
+    return render(request, "pqrs/admin_pqrs_list.html", context)
 
 
 @admin_required
@@ -101,11 +128,12 @@ def admin_pqrs_edit(request, pqrs_id):
             html_content = render_to_string('emails/pqrs_updated_email.html', context)
             
             try:
-                send_mailjet_email(
+                send_email(
                     subject=subject,
                     html_content=html_content,
                     to_email=pq.client.email,
                     to_name=pq.client.get_full_name() or pq.client.username,
+                    category='pqrs_updated',
                 )
                 messages.success(request, f"Respuesta enviada correctamente al cliente {pq.client.username}.")
             except Exception as e:
@@ -1,7 +1,29 @@
 from django.contrib import admin
-from .models import ProjectInfo
+from .models import ClientSummary, EmailDelivery, Job, ProjectInfo
 
 
 @admin.register(ProjectInfo)
 class ProjectInfoAdmin(admin.ModelAdmin):
     list_display = ("title",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "task")
+    readonly_fields = ("created_at", "finished_at", "locked_at", "locked_by", "last_error")
+
+
+@admin.register(EmailDelivery)
+class EmailDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "to_email", "subject", "category", "status", "http_status")
+    list_filter = ("status", "category")
+    search_fields = ("to_email", "subject", "message_id")
+    readonly_fields = ("created_at",)
+
+
+@admin.register(ClientSummary)
+class ClientSummaryAdmin(admin.ModelAdmin):
+    list_display = ("user", "purchases_count", "lots_owned", "total_amount", "paid_amount", "balance", "open_pqrs")
+    search_fields = ("user__email",)
+    readonly_fields = ("updated_at",)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ProjectInfoConfig(AppConfig):
     name = 'PROJECT_INFO'
+
+    def ready(self):
+        import PROJECT_INFO.signals
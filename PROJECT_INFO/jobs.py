@@ -0,0 +1,114 @@
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 30  # segundos
+BACKOFF_MAX = 3600
+# Un trabajo RUNNING sin terminar después de este tiempo se da por
+# abandonado (worker caído) y vuelve a la cola.
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue(task, payload=None, run_at=None, max_attempts=5):
+    """
+    Agrega un trabajo a la cola. `task` es la ruta de una función
+    ("SALES.receipts.send_payment_receipt") que recibe el payload como
+    argumentos con nombre. Llamado dentro de transaction.atomic() el
+    trabajo solo existe si la transacción confirma.
+    """
+    return Job.objects.create(
+        task=task,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay + random.uniform(0, delay / 10))
+
+
+def requeue_stale(now=None):
+    now = now or timezone.now()
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT).update(
+        status=Job.PENDING, locked_at=None, locked_by=""
+    )
+
+
+def claim_jobs(worker, limit=10):
+    """
+    Reclama hasta `limit` trabajos vencidos. Cada uno se toma con un UPDATE
+    condicional (status='PENDING'), así varios workers pueden consultar la
+    misma cola sin ejecutar dos veces el mismo trabajo.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.PENDING, run_at__lte=now).order_by("run_at", "id")
+    claimed = []
+    for job_id in candidates.values_list("id", flat=True)[:limit]:
+        if Job.objects.filter(id=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F("attempts") + 1
+        ):
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by("run_at", "id"))
+
+
+def run_job(job):
+    """Ejecuta un trabajo ya reclamado y registra el resultado."""
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            logger.error("Trabajo %s agotó sus reintentos:\n%s", job, error)
+            Job.objects.filter(id=job.id).update(
+                status=Job.FAILED, last_error=error, finished_at=now, locked_at=None, locked_by=""
+            )
+        else:
+            logger.warning("Trabajo %s falló (intento %s):\n%s", job, job.attempts, error)
+            Job.objects.filter(id=job.id).update(
+                status=Job.PENDING, last_error=error, run_at=now + backoff(job.attempts),
+                locked_at=None, locked_by="",
+            )
+        return False
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, finished_at=timezone.now(), locked_at=None, locked_by=""
+    )
+    return True
+
+
+def run_pending(worker=None, limit=10):
+    """Procesa un lote de trabajos vencidos. Devuelve (exitosos, fallidos)."""
+    worker = worker or worker_name()
+    requeue_stale()
+    done = failed = 0
+    for job in claim_jobs(worker, limit):
+        if run_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def retry_failed(ids=None):
+    """Devuelve a la cola trabajos fallidos (dead letter)."""
+    queryset = Job.objects.filter(status=Job.FAILED)
+    if ids:
+        queryset = queryset.filter(id__in=ids)
+    return queryset.update(status=Job.PENDING, attempts=0, run_at=timezone.now(), finished_at=None)
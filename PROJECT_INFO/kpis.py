@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from LOTES.models import Lot
+from PQRS.models import PQRS
+from SALES.cashflow import portfolio_projection
+from SALES.models import DailySales, Purchase
+from .versions import INVENTORY, PQRS as PQRS_VERSION, SALES, USERS, get_versions
+
+# Dominios de los que depende el resumen: cualquier escritura en ellos
+# incrementa su versión y con eso cambia la clave de caché.
+KPI_VERSION_KEYS = (USERS, INVENTORY, SALES, PQRS_VERSION)
+# Las claves viejas no se borran; solo dejan de consultarse y expiran.
+KPI_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def compute_kpis(today=None):
+    """Indicadores del panel administrativo: una consulta por tabla."""
+    users = get_user_model().objects.aggregate(
+        users_total=Count("id"),
+        clients_total=Count("id", filter=Q(role="CLIENT")),
+        admins_total=Count("id", filter=Q(role__in=["ADMIN", "EXECUTIVE"])),
+    )
+    lots = Lot.objects.aggregate(
+        lots_total=Count("id"),
+        lots_available=Count("id", filter=Q(status="AVAILABLE")),
+        lots_sold=Count("id", filter=Q(status="SOLD")),
+    )
+    purchases = Purchase.objects.aggregate(
+        purchases_total=Count("id"),
+        total_purchase_amount=Sum("total_amount"),
+    )
+    paid = DailySales.objects.aggregate(total_paid_amount=Sum("amount"))
+    pqrs = PQRS.objects.aggregate(
+        pqrs_total=Count("id"),
+        pqrs_open=Count("id", filter=Q(status="OPEN")),
+    )
+    kpis = {**users, **lots, **purchases, **paid, **pqrs}
+    kpis["total_purchase_amount"] = kpis["total_purchase_amount"] or 0
+    kpis["total_paid_amount"] = kpis["total_paid_amount"] or 0
+    kpis["cashflow"] = portfolio_projection(today)
+    return kpis
+
+
+def kpi_snapshot():
+    """
+    Resumen del panel desde la caché. La clave lleva las versiones de datos
+    (leídas antes de calcular, así una escritura concurrente nunca deja un
+    resumen viejo bajo una versión nueva) y el día, porque la proyección de
+    cartera depende de la fecha.
+    """
+    today = timezone.localdate()
+    versions = get_versions(*KPI_VERSION_KEYS)
+    key = "kpi-snapshot:{}:{}".format(
+        today.isoformat(), ":".join(str(versions[name][0]) for name in KPI_VERSION_KEYS)
+    )
+    kpis = cache.get(key)
+    if kpis is None:
+        kpis = compute_kpis(today)
+        cache.set(key, kpis, KPI_CACHE_TIMEOUT)
+    return kpis
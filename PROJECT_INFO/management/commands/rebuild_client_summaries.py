@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from PROJECT_INFO.summaries import refresh_client_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen de cuenta (ClientSummary) de todos los clientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Clientes recalculados por lote')
+
+    def handle(self, *args, **options):
+        ids = list(get_user_model().objects.filter(role='CLIENT').order_by('pk').values_list('pk', flat=True))
+        size = options['batch_size']
+        total = 0
+        for start in range(0, len(ids), size):
+            total += len(refresh_client_summaries(ids[start:start + size]))
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes de clientes recalculados: {total}.'))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from PROJECT_INFO.jobs import retry_failed, run_pending, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de trabajos en segundo plano (comprobantes de pago, correos, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa los trabajos vencidos y termina')
+        parser.add_argument('--batch', type=int, default=10, help='Trabajos reclamados por vuelta')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--retry-failed', action='store_true', help='Devuelve a la cola los trabajos fallidos y termina')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(self.style.SUCCESS(f'Trabajos reencolados: {retry_failed()}.'))
+            return
+
+        worker = worker_name()
+        self.stdout.write(f'Worker {worker} iniciado.')
+        try:
+            while True:
+                close_old_connections()
+                done, failed = run_pending(worker, options['batch'])
+                if done or failed:
+                    self.stdout.write(f'Completados: {done}. Fallidos: {failed}.')
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PROJECT_INFO', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('status', models.CharField(choices=[('SENT', 'Enviado'), ('FAILED', 'Fallido')], max_length=10)),
+                ('http_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('message_id', models.CharField(blank=True, default='', max_length=64)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='PROJECT_INF_created_06cf4d_idx')],
+            },
+        ),
+    ]
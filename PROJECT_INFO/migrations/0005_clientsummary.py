@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 12:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PROJECT_INFO', '0004_emaildelivery'),
+        ('USERS', '0003_user_upper_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='account_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('purchases_count', models.PositiveIntegerField(default=0)),
+                ('lots_owned', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('open_pqrs', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,95 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class ProjectInfo(models.Model):
     title = models.CharField(max_length=200)
-    description = models.TextField()
\ No newline at end of file
+    description = models.TextField()
+
+
+class DataVersion(models.Model):
+    # Contador monotónico por dominio de datos (inventario, ventas, ...).
+    # Se incrementa en cada escritura y sirve como clave de caché / ETag.
+    key = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key}@{self.version}"
+
+
+class Job(models.Model):
+    # Cola de trabajos en segundo plano respaldada por la base de datos
+    # (ver PROJECT_INFO.jobs y el comando run_jobs).
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (PENDING, "Pendiente"),
+        (RUNNING, "En ejecución"),
+        (DONE, "Completado"),
+        (FAILED, "Fallido"),
+    ]
+
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
+
+    def __str__(self):
+        return f"{self.task}#{self.pk} ({self.status})"
+
+
+class EmailDelivery(models.Model):
+    # Resultado de cada correo enviado por PROJECT_INFO.notifications
+    SENT = "SENT"
+    FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (SENT, "Enviado"),
+        (FAILED, "Fallido"),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    category = models.CharField(max_length=50, blank=True, default="")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    http_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    message_id = models.CharField(max_length=64, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"{self.to_email} {self.subject} ({self.status})"
+
+
+class ClientSummary(models.Model):
+    # Resumen de la cuenta de cada cliente para su panel y la app móvil;
+    # lo mantienen las señales de SALES y PQRS (ver PROJECT_INFO.summaries).
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="account_summary"
+    )
+    purchases_count = models.PositiveIntegerField(default=0)
+    lots_owned = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    open_pqrs = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen de {self.user_id}"
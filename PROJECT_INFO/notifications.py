@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import EmailDelivery
+
+logger = logging.getLogger(__name__)
+
+MAILJET_SEND_URL = "https://api.mailjet.com/v3.1/send"
+# Máximo de mensajes por llamada a la API de envío v3.1 de Mailjet
+BATCH_SIZE = 50
+TIMEOUT = 15  # segundos
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class EmailDeliveryError(Exception):
+    def __init__(self, delivery):
+        super().__init__(f"No se pudo enviar el correo a {delivery.to_email}: {delivery.error}")
+        self.delivery = delivery
+
+
+def get_session():
+    """
+    Sesión HTTP compartida por todo el proceso: mantiene abiertas las
+    conexiones con Mailjet entre envíos. Solo se reintentan los errores de
+    conexión, nunca un POST que ya llegó al servidor (duplicaría correos).
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.auth = (os.environ.get('MJ_APIKEY_PUBLIC'), os.environ.get('MJ_APIKEY_PRIVATE'))
+            adapter = HTTPAdapter(pool_maxsize=10, max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5))
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def email_message(subject, html_content, to_email, to_name='', attachments=None):
+    """Mensaje en el formato de la API v3.1 de Mailjet."""
+    message = {
+        'From': {'Email': settings.DEFAULT_FROM_EMAIL, 'Name': 'SIGLO'},
+        'To': [{'Email': to_email, 'Name': to_name}],
+        'Subject': subject,
+        'HTMLPart': html_content,
+    }
+    if attachments:
+        message['Attachments'] = attachments
+    return message
+
+
+def _error_text(data, response):
+    if isinstance(data, dict):
+        errors = data.get('Errors') or []
+        if errors:
+            return "; ".join(e.get('ErrorMessage', '') for e in errors)
+        if data.get('ErrorMessage'):
+            return data['ErrorMessage']
+    return response.text[:500]
+
+
+def _results(batch, response):
+    """Une cada mensaje del lote con su resultado en la respuesta de Mailjet."""
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    results = data.get('Messages') if isinstance(data, dict) else None
+    if not isinstance(results, list) or len(results) != len(batch):
+        # Error de toda la llamada (credenciales, formato, ...)
+        return [(False, "", _error_text(data, response))] * len(batch)
+    parsed = []
+    for result in results:
+        if result.get('Status') == 'success':
+            to = (result.get('To') or [{}])[0]
+            parsed.append((True, str(to.get('MessageID', '')), ""))
+        else:
+            parsed.append((False, "", _error_text(result, response)))
+    return parsed
+
+
+def _post(batch):
+    try:
+        response = get_session().post(MAILJET_SEND_URL, json={'Messages': batch}, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        return None, [(False, "", f"{type(e).__name__}: {e}")] * len(batch)
+    return response.status_code, _results(batch, response)
+
+
+def send_messages(messages, category=''):
+    """
+    Envía los mensajes (ver email_message) en lotes de BATCH_SIZE por
+    llamada y guarda un EmailDelivery por destinatario. No lanza excepciones
+    por errores de envío: el resultado de cada mensaje queda en la lista
+    devuelta.
+    """
+    deliveries = []
+    for start in range(0, len(messages), BATCH_SIZE):
+        batch = messages[start:start + BATCH_SIZE]
+        http_status, results = _post(batch)
+        for message, (ok, message_id, error) in zip(batch, results):
+            if not ok:
+                logger.warning("Correo a %s no enviado: %s", message['To'][0]['Email'], error)
+            deliveries.append(EmailDelivery(
+                to_email=message['To'][0]['Email'],
+                subject=message['Subject'][:255],
+                category=category,
+                status=EmailDelivery.SENT if ok else EmailDelivery.FAILED,
+                http_status=http_status,
+                message_id=message_id,
+                error=error,
+            ))
+    return EmailDelivery.objects.bulk_create(deliveries)
+
+
+def send_email(subject, html_content, to_email, to_name='', attachments=None, category=''):
+    """Envía un solo correo. Lanza EmailDeliveryError si Mailjet no lo aceptó."""
+    message = email_message(subject, html_content, to_email, to_name, attachments)
+    delivery = send_messages([message], category)[0]
+    if delivery.status != EmailDelivery.SENT:
+        raise EmailDeliveryError(delivery)
+    return delivery
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, QueryDict
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .versions import get_versions
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Por debajo de este tamaño comprimir no compensa
+MIN_GZIP_SIZE = 200
+
+
+def _accepts_gzip(request):
+    return "gzip" in request.headers.get("Accept-Encoding", "").lower()
+
+
+def _cacheable(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _page_response(entry, etag, use_gzip):
+    body = entry["gzip"] if use_gzip else entry["body"]
+    response = HttpResponse(body, content_type=entry["content_type"])
+    if use_gzip:
+        response["Content-Encoding"] = "gzip"
+    response["Content-Length"] = str(len(body))
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+    return response
+
+
+def anonymous_page_cache(version_keys, params=()):
+    """
+    Caché de la página completa para visitantes sin sesión. La clave es la
+    ruta, los parámetros de `params` (los demás, como utm_*, se descartan
+    también para la vista, así la página es la misma para toda la clave) y
+    las versiones de datos de `version_keys`: una escritura en esos datos
+    cambia la clave y el ETag. Se guarda el cuerpo ya comprimido con gzip.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            query = QueryDict(mutable=True)
+            for name in params:
+                values = request.GET.getlist(name)
+                if values:
+                    query.setlist(name, values)
+            query._mutable = False
+            request.GET = query
+
+            versions = get_versions(*version_keys)
+            digest = hashlib.sha1(repr((
+                request.path,
+                sorted(query.lists()),
+                [versions[key][0] for key in version_keys],
+            )).encode()).hexdigest()
+            key = f"page:{digest}"
+            entry = cache.get(key)
+
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                # Solo respuestas iguales para cualquier visitante: sin
+                # cookies, sin token CSRF y sin mensajes nuevos.
+                if (
+                    response.status_code != 200
+                    or response.streaming
+                    or response.cookies
+                    or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+                    or len(get_messages(request))
+                ):
+                    return response
+                body = response.content
+                entry = {
+                    "content_type": response["Content-Type"],
+                    "body": body,
+                    "gzip": gzip.compress(body, mtime=0) if len(body) >= MIN_GZIP_SIZE else None,
+                }
+                cache.set(key, entry, PAGE_CACHE_TIMEOUT)
+
+            use_gzip = entry["gzip"] is not None and _accepts_gzip(request)
+            # Cada codificación es una representación distinta: ETag propio
+            etag = f'"{digest[:24]}{"-gz" if use_gzip else ""}"'
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                patch_vary_headers(response, ("Accept-Encoding", "Cookie"))
+                return response
+            return _page_response(entry, etag, use_gzip)
+        return wrapper
+    return decorator
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ProjectInfo
+from .versions import CONTENT, bump_version
+
+
+@receiver(post_save, sender=ProjectInfo)
+@receiver(post_delete, sender=ProjectInfo)
+def bump_content_version(sender, instance, **kwargs):
+    bump_version(CONTENT)
@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from PQRS.models import PQRS
+from SALES.models import Payment, Purchase
+from .models import ClientSummary
+
+SUMMARY_FIELDS = ("purchases_count", "lots_owned", "total_amount", "paid_amount", "balance", "open_pqrs")
+
+
+def _grouped(queryset, field, **aggregates):
+    return {row.pop(field): row for row in queryset.values(field).annotate(**aggregates)}
+
+
+def compute_client_summaries(user_ids):
+    """Resúmenes de los usuarios indicados: una consulta agrupada por tabla."""
+    user_ids = set(user_ids)
+    purchases = _grouped(
+        Purchase.objects.filter(client_id__in=user_ids), "client_id",
+        count=Count("id"), total=Sum("total_amount"),
+    )
+    lots = _grouped(
+        Purchase.lots.through.objects.filter(purchase__client_id__in=user_ids), "purchase__client_id",
+        count=Count("lot_id", distinct=True),
+    )
+    paid = _grouped(
+        Payment.objects.filter(purchase__client_id__in=user_ids), "purchase__client_id",
+        total=Sum("amount"),
+    )
+    pqrs = _grouped(
+        PQRS.objects.filter(client_id__in=user_ids, status="OPEN"), "client_id",
+        count=Count("id"),
+    )
+    summaries = []
+    for user_id in user_ids:
+        total = purchases.get(user_id, {}).get("total") or Decimal("0")
+        paid_amount = paid.get(user_id, {}).get("total") or Decimal("0")
+        summaries.append(ClientSummary(
+            user_id=user_id,
+            purchases_count=purchases.get(user_id, {}).get("count", 0),
+            lots_owned=lots.get(user_id, {}).get("count", 0),
+            total_amount=total,
+            paid_amount=paid_amount,
+            balance=total - paid_amount,
+            open_pqrs=pqrs.get(user_id, {}).get("count", 0),
+        ))
+    return summaries
+
+
+def refresh_client_summaries(user_ids):
+    """
+    Recalcula y guarda (insertando o actualizando) los resúmenes de los
+    usuarios indicados. Se recalcula solo a quienes cambiaron, desde los
+    datos, para que el resumen no acumule errores.
+    """
+    # Se descartan usuarios borrados después de programar la actualización
+    user_ids = set(get_user_model().objects.filter(pk__in=set(user_ids) - {None}).values_list("pk", flat=True))
+    if not user_ids:
+        return []
+    return ClientSummary.objects.bulk_create(
+        compute_client_summaries(user_ids),
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=[*SUMMARY_FIELDS, "updated_at"],
+    )
+
+
+def refresh_client_summaries_on_commit(user_ids):
+    """Programa refresh_client_summaries para después del commit de la escritura."""
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: refresh_client_summaries(user_ids))
+
+
+def client_summary(user):
+    """Resumen de un usuario; si aún no existe (cuenta sin movimientos) se crea."""
+    summary = ClientSummary.objects.filter(user=user).first()
+    if summary is None:
+        summary = refresh_client_summaries([user.pk])[0]
+    return summary
+
+
+def summary_data(summary):
+    return {name: getattr(summary, name) for name in SUMMARY_FIELDS} | {"updated_at": summary.updated_at}
@@ -1,3 +1,350 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from LOTES.models import Lot, Stage
+from PQRS.models import PQRS
+from SALES.models import DailySales, Payment, Purchase
+from SALES.reconciliation import validate_payments
+from SALES.rollups import rebuild_rollups, refresh_days
+from .jobs import LOCK_TIMEOUT, claim_jobs, enqueue, requeue_stale, retry_failed, run_pending
+from .kpis import kpi_snapshot
+from .models import ClientSummary, Job
+from .summaries import SUMMARY_FIELDS, compute_client_summaries
+from .timeseries import kpi_series
+
+CALLS = []
+
+
+def sample_task(value, fail=False):
+    """Tarea de prueba para la cola (se encola por su ruta)."""
+    if fail:
+        raise RuntimeError(f"falló {value}")
+    CALLS.append(value)
+
+
+class JobQueueTests(TestCase):
+    TASK = "PROJECT_INFO.tests.sample_task"
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_claim_and_run(self):
+        job = enqueue(self.TASK, {"value": 1})
+        later = enqueue(self.TASK, {"value": 2}, run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(run_pending("w1"), (1, 0))
+        self.assertEqual(CALLS, [1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.DONE, 1, ""))
+        self.assertIsNotNone(job.finished_at)
+        # Aún no vence
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.PENDING)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        job = enqueue(self.TASK, {"value": 1})
+        self.assertEqual(claim_jobs("w1"), [job])
+        self.assertEqual(claim_jobs("w2"), [])
+        # Un worker caído: el trabajo vuelve a la cola pasado LOCK_TIMEOUT
+        self.assertEqual(requeue_stale(timezone.now() + LOCK_TIMEOUT + timedelta(seconds=1)), 1)
+        self.assertEqual([j.id for j in claim_jobs("w2")], [job.id])
+
+    def test_failure_retries_with_backoff_then_dead_letters(self):
+        job = enqueue(self.TASK, {"value": 1, "fail": True}, max_attempts=2)
+        with self.assertLogs("PROJECT_INFO.jobs", "WARNING"):
+            self.assertEqual(run_pending("w1"), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn("RuntimeError: falló 1", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        # Antes del backoff no se vuelve a intentar
+        self.assertEqual(run_pending("w1"), (0, 0))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("PROJECT_INFO.jobs", "ERROR"):
+            self.assertEqual(run_pending("w1"), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+        self.assertEqual(retry_failed(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+
+    def test_run_jobs_once(self):
+        enqueue(self.TASK, {"value": 3})
+        call_command("run_jobs", once=True, stdout=io.StringIO())
+        self.assertEqual(CALLS, [3])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+
+class KpiSnapshotTests(TestCase):
+    """El resumen del panel se sirve de caché hasta que cambia alguno de sus datos."""
+
+    def setUp(self):
+        cache.clear()
+        self.client_user = get_user_model().objects.create_user(
+            username="cliente", password="x", email="cliente@example.com", role="CLIENT"
+        )
+        stage = Stage.objects.create(name="Preventa", description="")
+        self.lot = Lot.objects.create(
+            code="A-1", stage=stage, area_m2=100, price=1000, latitude=10, longitude=-75
+        )
+
+    def assert_cached(self):
+        # Solo la lectura de las versiones
+        with self.assertNumQueries(1):
+            return kpi_snapshot()
+
+    def test_model_saves_invalidate_snapshot(self):
+        kpis = kpi_snapshot()
+        self.assertEqual((kpis["users_total"], kpis["lots_sold"], kpis["purchases_total"]), (1, 0, 0))
+        self.assertEqual(self.assert_cached(), kpis)
+
+        get_user_model().objects.create_user(username="otro", password="x", role="CLIENT")
+        self.assertEqual(kpi_snapshot()["clients_total"], 2)
+
+        self.lot.status = "SOLD"
+        self.lot.save()
+        self.assertEqual(kpi_snapshot()["lots_sold"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = Purchase.objects.create(client=self.client_user, total_amount=Decimal("1000"))
+        kpis = kpi_snapshot()
+        self.assertEqual((kpis["purchases_total"], kpis["total_purchase_amount"]), (1, Decimal("1000")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(purchase=purchase, amount=Decimal("250"))
+        self.assertEqual(kpi_snapshot()["total_paid_amount"], Decimal("250"))
+
+        PQRS.objects.create(client=self.client_user, type="P", message="Consulta")
+        self.assertEqual(kpi_snapshot()["pqrs_open"], 1)
+        self.assert_cached()
+
+    def test_login_does_not_invalidate_snapshot(self):
+        kpi_snapshot()
+        self.client.force_login(self.client_user)
+        self.assert_cached()
+
+
+class KpiSeriesCacheTests(TestCase):
+    """Los buckets cerrados en caché reflejan los cambios posteriores a su fecha."""
+
+    def setUp(self):
+        cache.clear()
+        client = get_user_model().objects.create_user(
+            username="cliente", password="x", email="cliente@example.com", role="CLIENT"
+        )
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        purchase = Purchase.objects.create(client=client, total_amount=Decimal("1000"))
+        self.payment = Payment.objects.create(purchase=purchase, amount=Decimal("100"))
+        # payment_date es auto_now_add: se mueve a ayer y se recalcula el resumen
+        Payment.objects.filter(pk=self.payment.pk).update(payment_date=self.yesterday)
+        refresh_days({self.today, self.yesterday})
+
+    def yesterday_bucket(self):
+        series = kpi_series("day", self.yesterday, self.today, today=self.today)
+        self.assertFalse(series[0]["open"])
+        return series[0]
+
+    def test_validation_after_the_day_closed_updates_cached_bucket(self):
+        before = self.yesterday_bucket()
+        self.assertEqual((before["collected"], before["collected_validated"]), (100, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            validate_payments([self.payment.pk])
+
+        after = self.yesterday_bucket()
+        self.assertEqual((after["collected"], after["collected_validated"]), (100, 100))
+
+    def change_rollup_silently(self):
+        # Sin señales ni versiones: si el bucket sale de la caché, conserva el valor anterior
+        DailySales.objects.filter(date=self.yesterday).update(amount=Decimal("999"))
+
+    def test_closed_bucket_served_from_cache(self):
+        self.yesterday_bucket()
+        self.change_rollup_silently()
+        # Solo las versiones y las cuatro fuentes del bucket en curso
+        with self.assertNumQueries(5):
+            self.assertEqual(self.yesterday_bucket()["collected"], 100)
+
+    def test_unrelated_writes_keep_closed_bucket(self):
+        self.yesterday_bucket()
+        self.change_rollup_silently()
+        client = self.payment.purchase.client
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(purchase=self.payment.purchase, amount=Decimal("50"))
+        PQRS.objects.create(client=client, type="P", message="Hoy", status="CLOSED")
+        self.assertEqual(self.yesterday_bucket()["collected"], 100)
+
+        # Una escritura con fecha de ayer sí lo invalida
+        with self.captureOnCommitCallbacks(execute=True):
+            validate_payments([self.payment.pk])
+        self.assertEqual(self.yesterday_bucket()["collected_validated"], 100)
+
+    def test_pqrs_changes_invalidate_their_days(self):
+        pqrs = PQRS.objects.create(client=self.payment.purchase.client, type="Q", message="Ayer", status="CLOSED")
+        moment = timezone.now() - timedelta(days=1)
+        PQRS.objects.filter(pk=pqrs.pk).update(created_at=moment, closed_at=moment)
+        cache.clear()
+        bucket = self.yesterday_bucket()
+        self.assertEqual((bucket["pqrs_opened"], bucket["pqrs_closed"]), (1, 1))
+
+        pqrs.refresh_from_db()
+        pqrs.status = "OPEN"
+        pqrs.save()
+        self.assertEqual(self.yesterday_bucket()["pqrs_closed"], 0)
+        pqrs.delete()
+        self.assertEqual(self.yesterday_bucket()["pqrs_opened"], 0)
+
+    def test_rebuild_invalidates_every_bucket(self):
+        self.yesterday_bucket()
+        Payment.objects.filter(pk=self.payment.pk).update(amount=Decimal("300"))
+        self.assertEqual(self.yesterday_bucket()["collected"], 100)
+        rebuild_rollups()
+        self.assertEqual(self.yesterday_bucket()["collected"], 300)
+
+
+class PqrsSeriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = get_user_model().objects.create_user(username="cliente", password="x", role="CLIENT")
+
+    def test_rows_without_created_at_are_excluded(self):
+        today = timezone.localdate()
+        PQRS.objects.create(client=self.client_user, type="P", message="Nueva")
+        closed = PQRS.objects.create(client=self.client_user, type="Q", message="Cerrada", status="CLOSED")
+        # Anterior al campo: created_at NULL. Al volver a guardarla recibe closed_at
+        legacy = PQRS.objects.create(client=self.client_user, type="R", message="Antigua", status="CLOSED")
+        PQRS.objects.filter(pk=legacy.pk).update(created_at=None, closed_at=None)
+        legacy.refresh_from_db()
+        legacy.response = "Respondida"
+        legacy.save()
+        self.assertIsNotNone(legacy.closed_at)
+
+        bucket = kpi_series("day", today, today, today=today)[0]
+        self.assertEqual((bucket["pqrs_opened"], bucket["pqrs_closed"]), (2, 1))
+        self.assertIsNotNone(closed.closed_at)
+
+
+class ClientSummaryTests(TestCase):
+    """ClientSummary coincide con un cálculo directo tras cada escritura."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.ana = User.objects.create_user(username="ana", password="x", email="ana@example.com", role="CLIENT")
+        self.bruno = User.objects.create_user(username="bruno", password="x", email="bruno@example.com", role="CLIENT")
+        stage = Stage.objects.create(name="Preventa", description="")
+        self.lots = [
+            Lot.objects.create(code=f"A-{i}", stage=stage, area_m2=100, price=500, latitude=10, longitude=-75)
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase = Purchase.objects.create(client=self.ana, total_amount=Decimal("1000"))
+            self.purchase.lots.set(self.lots[:2])
+            self.other = Purchase.objects.create(client=self.bruno, total_amount=Decimal("500"))
+            self.other.lots.set(self.lots[2:])
+            self.payment = Payment.objects.create(purchase=self.purchase, amount=Decimal("300"))
+
+    def stored(self, user):
+        summary = ClientSummary.objects.get(user=user)
+        return {name: getattr(summary, name) for name in SUMMARY_FIELDS}
+
+    def assert_in_sync(self, *users):
+        expected = {s.user_id: s for s in compute_client_summaries([user.pk for user in users])}
+        for user in users:
+            self.assertEqual(
+                self.stored(user), {name: getattr(expected[user.pk], name) for name in SUMMARY_FIELDS}, user.username
+            )
+
+    def test_payment_validation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            validate_payments([self.payment.pk])
+            Payment.objects.create(purchase=self.purchase, amount=Decimal("200"))
+        self.assert_in_sync(self.ana, self.bruno)
+        self.assertEqual((self.stored(self.ana)["paid_amount"], self.stored(self.ana)["balance"]),
+                         (Decimal("500"), Decimal("500")))
+
+    def test_purchase_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase.delete()
+        self.assert_in_sync(self.ana, self.bruno)
+        self.assertEqual(self.stored(self.ana)["purchases_count"], 0)
+        self.assertEqual(self.stored(self.ana)["paid_amount"], 0)
+
+    def test_lot_reassignment(self):
+        moved = self.lots[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase.lots.remove(moved)
+            self.other.lots.add(moved)
+        self.assert_in_sync(self.ana, self.bruno)
+        self.assertEqual((self.stored(self.ana)["lots_owned"], self.stored(self.bruno)["lots_owned"]), (1, 2))
+
+        # Desde el lado del lote (relación inversa)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.purchase_set.set([self.purchase])
+        self.assert_in_sync(self.ana, self.bruno)
+        self.assertEqual((self.stored(self.ana)["lots_owned"], self.stored(self.bruno)["lots_owned"]), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.purchase_set.clear()
+        self.assert_in_sync(self.ana, self.bruno)
+        self.assertEqual(self.stored(self.ana)["lots_owned"], 1)
+
+    def test_account_summary_api(self):
+        url = reverse("account_summary_api")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Autenticación requerida."})
+
+        self.client.force_login(self.ana)
+        data = self.client.get(url).json()
+        self.assertEqual((data["purchases_count"], data["lots_owned"]), (1, 2))
+        self.assertEqual((Decimal(data["paid_amount"]), Decimal(data["balance"])), (Decimal("300"), Decimal("700")))
+
+
+class AnonymousPageCacheTests(TestCase):
+    """ETag y 304 de la caché de páginas para visitantes sin sesión."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("dashboard")
+
+    def test_if_none_match_until_data_changes(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], etag)
+        self.assertEqual(again.content, b"")
+
+        # Una escritura en inventario sube su versión: la página cambia de clave
+        Stage.objects.create(name="Preventa", description="")
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        self.assertContains(changed, "Preventa")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=changed["ETag"]).status_code, 304)
+
+    def test_gzip_has_its_own_etag(self):
+        plain = self.client.get(self.url)["ETag"]
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertNotEqual(compressed["ETag"], plain)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(response.status_code, 200)
 
-# Create your tests here.
+    def test_authenticated_requests_bypass_cache(self):
+        user = get_user_model().objects.create_user(username="cliente", password="x", role="CLIENT")
+        self.client.force_login(user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
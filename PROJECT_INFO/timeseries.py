@@ -0,0 +1,178 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from LOTES.models import LotStatusChange
+from PQRS.models import PQRS
+from SALES.models import DailySales
+from .versions import SERIES, bump_version, get_versions
+
+PERIODS = ("day", "week", "month")
+# Buckets devueltos si no se indica inicio
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+MAX_BUCKETS = 400
+# Un bucket cerrado sí puede cambiar (un pago se valida días después de su
+# fecha, se borra una compra antigua), así que cada bucket tiene su propia
+# versión (series_version_key) y la suben solo las escrituras que tocan sus
+# fechas (touch_series): lo que pasa hoy no invalida los buckets pasados.
+# SERIES los invalida todos (reconstrucción del resumen diario). Los cambios
+# de estado de lotes se registran siempre con la hora actual y solo caen en
+# el bucket en curso, que no se guarda. Las claves viejas solo expiran.
+CLOSED_BUCKET_TIMEOUT = 60 * 60 * 24
+METRICS = (
+    "collected", "collected_validated", "payments", "purchases",
+    "lots_reserved", "lots_sold", "pqrs_opened", "pqrs_closed",
+)
+
+
+def bucket_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, period):
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def _truncate(field, period, is_datetime):
+    if period == "week":
+        return TruncWeek(field, output_field=DateField())
+    if period == "month":
+        return TruncMonth(field, output_field=DateField())
+    return TruncDate(field) if is_datetime else F(field)
+
+
+def parse_series_params(params, today=None):
+    """Lee period, start y end (YYYY-MM-DD). Lanza ValueError si son inválidos."""
+    today = today or timezone.localdate()
+    period = params.get("period") or "day"
+    if period not in PERIODS:
+        raise ValueError(f"Periodo inválido: usa {', '.join(PERIODS)}.")
+    try:
+        end = date.fromisoformat(params["end"]) if params.get("end") else today
+        start = date.fromisoformat(params["start"]) if params.get("start") else None
+    except ValueError:
+        raise ValueError("Fechas inválidas: usa el formato AAAA-MM-DD.")
+    end = bucket_start(end, period)
+    if start is None:
+        start = end
+        for _ in range(DEFAULT_BUCKETS[period] - 1):
+            start = bucket_start(start - timedelta(days=1), period)
+    start = bucket_start(start, period)
+    if start > end:
+        raise ValueError("La fecha inicial es posterior a la final.")
+    return period, start, end
+
+
+def _empty():
+    return {name: 0 for name in METRICS} | {"collected": Decimal("0"), "collected_validated": Decimal("0")}
+
+
+def compute_buckets(period, start, end):
+    """
+    Métricas por bucket entre `start` y el bucket que empieza en `end`
+    (incluido): una consulta agrupada por fuente, truncando en la base.
+    """
+    stop = next_bucket(end, period)
+    tz_start = timezone.make_aware(datetime.combine(start, time.min))
+    tz_stop = timezone.make_aware(datetime.combine(stop, time.min))
+    buckets = {}
+
+    def cell(bucket):
+        return buckets.setdefault(bucket, _empty())
+
+    for row in (
+        DailySales.objects.filter(date__gte=start, date__lt=stop)
+        .annotate(bucket=_truncate("date", period, False)).values("bucket")
+        .annotate(
+            collected=Sum("amount"),
+            collected_validated=Sum("amount", filter=Q(validated=True)),
+            payments=Sum("payment_count"),
+            purchases=Sum("purchase_count"),
+        )
+    ):
+        cell(row["bucket"]).update(
+            collected=row["collected"] or Decimal("0"),
+            collected_validated=row["collected_validated"] or Decimal("0"),
+            payments=row["payments"] or 0,
+            purchases=row["purchases"] or 0,
+        )
+
+    for row in (
+        LotStatusChange.objects.filter(changed_at__gte=tz_start, changed_at__lt=tz_stop, status__in=["RESERVED", "SOLD"])
+        .annotate(bucket=_truncate("changed_at", period, True)).values("bucket", "status")
+        .annotate(count=Count("id"))
+    ):
+        cell(row["bucket"])["lots_reserved" if row["status"] == "RESERVED" else "lots_sold"] = row["count"]
+
+    # Las PQRS anteriores a created_at/closed_at (created_at NULL) no tienen
+    # fechas reales y quedan fuera de las dos series.
+    for field, metric in (("created_at", "pqrs_opened"), ("closed_at", "pqrs_closed")):
+        for row in (
+            PQRS.objects.filter(created_at__isnull=False, **{f"{field}__gte": tz_start, f"{field}__lt": tz_stop})
+            .annotate(bucket=_truncate(field, period, True)).values("bucket")
+            .annotate(count=Count("id"))
+        ):
+            cell(row["bucket"])[metric] = row["count"]
+    return buckets
+
+
+def series_version_key(period, bucket):
+    return f"series:{period}:{bucket.isoformat()}"
+
+
+def touch_series(days):
+    """Sube la versión de los buckets (de cada periodo) que contienen esos días."""
+    keys = {series_version_key(period, bucket_start(day, period)) for day in days if day for period in PERIODS}
+    # Siempre en el mismo orden: las filas de versión se bloquean hasta el commit
+    bump_version(*sorted(keys))
+
+
+def _cache_key(period, bucket, epoch, version):
+    return f"kpi-series:{epoch}:{version}:{period}:{bucket.isoformat()}"
+
+
+def kpi_series(period, start, end, today=None):
+    """
+    Serie de indicadores por bucket. Los buckets cerrados (anteriores al
+    actual) se guardan en caché uno por uno bajo su versión vigente (leída
+    antes de calcular, como en kpis.kpi_snapshot); sin escrituras en sus
+    fechas solo se consulta el bucket en curso. ValueError si el rango tiene
+    más de MAX_BUCKETS periodos.
+    """
+    current = bucket_start(today or timezone.localdate(), period)
+    starts = []
+    bucket = start
+    while bucket <= end:
+        starts.append(bucket)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"El rango supera {MAX_BUCKETS} periodos.")
+        bucket = next_bucket(bucket, period)
+
+    closed = [b for b in starts if b < current]
+    found = get_versions(SERIES, *(series_version_key(period, b) for b in closed))
+    epoch = found[SERIES][0]
+    keys = {b: _cache_key(period, b, epoch, found[series_version_key(period, b)][0]) for b in closed}
+    cached = cache.get_many(list(keys.values()))
+    values = {b: cached[key] for b, key in keys.items() if key in cached}
+    missing = [b for b in starts if b not in values]
+    if missing:
+        computed = compute_buckets(period, missing[0], missing[-1])
+        fresh = {b: computed.get(b, _empty()) for b in missing}
+        values.update(fresh)
+        cache.set_many(
+            {keys[b]: value for b, value in fresh.items() if b in keys},
+            CLOSED_BUCKET_TIMEOUT,
+        )
+    return [{"bucket": b, "open": b >= current, **values[b]} for b in starts]
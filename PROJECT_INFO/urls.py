@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import dashboard, admin_content
+from .views import dashboard, admin_content, account_summary_api, kpi_series_api
 from USERS.views import admin_user_list
 
 urlpatterns = [
     path('', dashboard, name='dashboard'),
+    path('api/account/summary/', account_summary_api, name='account_summary_api'),
+    path('api/kpis/series/', kpi_series_api, name='kpi_series_api'),
     path('admin/content/', admin_content, name='admin_content'),
     path('panel/usuarios/', admin_user_list, name='admin_user_list_panel'),
 ]
@@ -0,0 +1,44 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+INVENTORY = "inventory"
+SALES = "sales"
+USERS = "users"
+PQRS = "pqrs"
+CONTENT = "content"
+# Todas las series de indicadores a la vez (ver PROJECT_INFO.timeseries)
+SERIES = "series"
+
+
+def bump_version(*keys):
+    """Incrementa los contadores indicados (creándolos si no existen)."""
+    now = timezone.now()
+    for key in keys:
+        updated = DataVersion.objects.filter(key=key).update(
+            version=F("version") + 1, updated_at=now
+        )
+        if not updated:
+            _, created = DataVersion.objects.get_or_create(
+                key=key, defaults={"version": 1, "updated_at": now}
+            )
+            if not created:
+                DataVersion.objects.filter(key=key).update(
+                    version=F("version") + 1, updated_at=now
+                )
+
+
+def get_versions(*keys):
+    """Devuelve {key: (version, updated_at)} con una sola consulta."""
+    found = {
+        row["key"]: (row["version"], row["updated_at"])
+        for row in DataVersion.objects.filter(key__in=keys).values(
+            "key", "version", "updated_at"
+        )
+    }
+    return {key: found.get(key, (0, None)) for key in keys}
+
+
+def get_version(key):
+    return get_versions(key)[key]
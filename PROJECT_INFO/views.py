@@ -1,77 +1,32 @@
-from USERS.decorators import admin_required
-from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from USERS.decorators import admin_required, api_login_required
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 
-from LOTES.models import Lot, Stage
-from PQRS.models import PQRS
-from SALES.models import Payment, Purchase
+from LOTES.models import Stage
+from .kpis import kpi_snapshot
 from .models import ProjectInfo
+from .pagecache import anonymous_page_cache
+from .summaries import client_summary, summary_data
+from .timeseries import kpi_series, parse_series_params
+from .versions import CONTENT, INVENTORY
 
 
+@anonymous_page_cache((INVENTORY, CONTENT))
 def dashboard(request):
     if request.user.is_authenticated:
         role = getattr(request.user, "role", "CLIENT")
 
         if role in ["ADMIN", "EXECUTIVE"]:
-            User = get_user_model()
-
-            users_total = User.objects.count()
-            clients_total = User.objects.filter(role="CLIENT").count()
-            admins_total = User.objects.filter(role__in=["ADMIN", "EXECUTIVE"]).count()
-
-            lots_total = Lot.objects.count()
-            lots_available = Lot.objects.filter(status="AVAILABLE").count()
-            lots_sold = Lot.objects.filter(status="SOLD").count()
-
-            purchases_total = Purchase.objects.count()
-            total_purchase_amount = (
-                Purchase.objects.aggregate(total=Sum("total_amount"))["total"] or 0
-            )
-            total_paid_amount = (
-                Payment.objects.aggregate(total=Sum("amount"))["total"] or 0
-            )
-
-            pqrs_total = PQRS.objects.count()
-            pqrs_open = PQRS.objects.filter(status="OPEN").count()
-
-            context = {
-                "users_total": users_total,
-                "clients_total": clients_total,
-                "admins_total": admins_total,
-                "lots_total": lots_total,
-                "lots_available": lots_available,
-                "lots_sold": lots_sold,
-                "purchases_total": purchases_total,
-                "total_purchase_amount": total_purchase_amount,
-                "total_paid_amount": total_paid_amount,
-                "pqrs_total": pqrs_total,
-                "pqrs_open": pqrs_open,
-            }
-            return render(request, "project_info/admin_dashboard.html", context)
-
-        purchases = Purchase.objects.filter(client=request.user)
-        lots_owned_count = purchases.values("lots").distinct().count()
-        total_purchase_amount = (
-            purchases.aggregate(total=Sum("total_amount"))["total"] or 0
-        )
-        total_paid_amount = (
-            Payment.objects.filter(purchase__client=request.user).aggregate(
-                total=Sum("amount")
-            )["total"]
-            or 0
-        )
-        balance_total = total_purchase_amount - total_paid_amount
-
-        pqrs_open = PQRS.objects.filter(client=request.user, status="OPEN").count()
+            return render(request, "project_info/admin_dashboard.html", kpi_snapshot())
 
+        summary = client_summary(request.user)
         context = {
-            "purchases_total": purchases.count(),
-            "lots_owned_count": lots_owned_count,
-            "total_purchase_amount": total_purchase_amount,
-            "total_paid_amount": total_paid_amount,
-            "balance_total": balance_total,
-            "pqrs_open": pqrs_open,
+            "purchases_total": summary.purchases_count,
+            "lots_owned_count": summary.lots_owned,
+            "total_purchase_amount": summary.total_amount,
+            "total_paid_amount": summary.paid_amount,
+            "balance_total": summary.balance,
+            "pqrs_open": summary.open_pqrs,
         }
         return render(request, "project_info/client_dashboard.html", context)
 
@@ -87,6 +42,23 @@ def dashboard(request):
     return render(request, "project_info/dashboard.html", {"stages": stages})
 
 
+@api_login_required
+def account_summary_api(request):
+    """Resumen de la cuenta del usuario en JSON (app móvil)."""
+    return JsonResponse(summary_data(client_summary(request.user)))
+
+
+@admin_required
+def kpi_series_api(request):
+    """Series de indicadores para gráficas: ?period=day|week|month&start=&end=."""
+    try:
+        period, start, end = parse_series_params(request.GET)
+        series = kpi_series(period, start, end)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"period": period, "start": start, "end": end, "series": series})
+
+
 def error_404_view(request, exception):
     return render(request, "404.html", status=404)
 
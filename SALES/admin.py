@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Purchase, Payment
+from .models import InstallmentPlan, Purchase, Payment
 
 
 class PaymentInline(admin.TabularInline):
@@ -7,12 +7,17 @@ class PaymentInline(admin.TabularInline):
     extra = 0
 
 
+class InstallmentPlanInline(admin.StackedInline):
+    model = InstallmentPlan
+    extra = 0
+
+
 @admin.register(Purchase)
 class PurchaseAdmin(admin.ModelAdmin):
     list_display = ("id", "client", "total_amount", "created_at", "balance")
     list_filter = ("client", "created_at")
     search_fields = ("id", "client__email", "client__username")
-    inlines = [PaymentInline]
+    inlines = [InstallmentPlanInline, PaymentInline]
 
 
 @admin.register(Payment)
@@ -0,0 +1,90 @@
+from functools import reduce
+from operator import and_, or_
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from LOTES.models import Lot
+from .models import Purchase
+
+AUTOCOMPLETE_LIMIT = 20
+# Hasta cuántos dígitos se busca un prefijo de id de compra
+MAX_ID_DIGITS = 12
+
+# Todas las búsquedas son por prefijo y sin distinguir mayúsculas
+# (UPPER(x) LIKE 'X%'). En PostgreSQL cada columna tiene un índice sobre
+# UPPER(x) (migraciones USERS 0004 y LOTES 0007), así que el costo no
+# depende del tamaño de la tabla.
+
+
+def client_label(user):
+    name = user.get_full_name()
+    return f"{name} · {user.email}" if name else user.email
+
+
+def lot_label(lot):
+    return f"{lot.code} · {lot.stage.name if lot.stage_id else 'Sin etapa'} · ${lot.price} · {lot.get_status_display()}"
+
+
+def purchase_label(purchase):
+    client = purchase.client
+    return f"#{purchase.id} · {client.get_full_name() or client.email} · ${purchase.total_amount}"
+
+
+def client_query(q):
+    """Clientes cuyo correo empieza por `q` o cuyo nombre/apellido empieza por cada palabra de `q`."""
+    conditions = [Q(email__istartswith=q)]
+    words = q.split()
+    if words and "@" not in q:
+        conditions.append(reduce(and_, (
+            Q(first_name__istartswith=word) | Q(last_name__istartswith=word)
+            for word in words
+        )))
+    return get_user_model().objects.filter(reduce(or_, conditions), role="CLIENT")
+
+
+def search_clients(q):
+    users = client_query(q).order_by("email")[:AUTOCOMPLETE_LIMIT]
+    return [{"id": user.id, "label": client_label(user)} for user in users]
+
+
+def search_lots(q):
+    lots = (
+        Lot.objects.filter(code__istartswith=q)
+        .select_related("stage")
+        .order_by("code")[:AUTOCOMPLETE_LIMIT]
+    )
+    return [{"id": lot.id, "label": lot_label(lot)} for lot in lots]
+
+
+def _id_prefix(q):
+    """
+    Ids que empiezan por los dígitos de `q` como rangos sobre la llave
+    primaria (12 -> 12, 120-129, 1200-1299, ...), sin convertir a texto.
+    """
+    if not q.isdigit() or q != str(int(q)):
+        return None
+    n = int(q)
+    condition = Q(id=n)
+    for extra in range(1, MAX_ID_DIGITS - len(q) + 1):
+        scale = 10 ** extra
+        condition |= Q(id__gte=n * scale, id__lt=(n + 1) * scale)
+    return condition
+
+
+def search_purchases(q):
+    q = q.lstrip("#")
+    condition = _id_prefix(q)
+    purchases = Purchase.objects.select_related("client")
+    if condition is not None:
+        purchases = purchases.filter(condition).order_by("id")
+    else:
+        purchases = purchases.filter(client__in=client_query(q)).order_by("-created_at")
+    return [{"id": p.id, "label": purchase_label(p)} for p in purchases[:AUTOCOMPLETE_LIMIT]]
+
+
+LOOKUPS = {
+    "clients": search_clients,
+    "lots": search_lots,
+    "purchases": search_purchases,
+}
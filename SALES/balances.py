@@ -0,0 +1,46 @@
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Payment, Purchase
+from .projections import ZERO
+
+
+def _payment_sum(**filters):
+    return Coalesce(
+        Subquery(
+            Payment.objects.filter(purchase=OuterRef("pk"), **filters)
+            .values("purchase")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        ),
+        ZERO,
+    )
+
+
+def refresh_purchase_totals(purchase_ids):
+    """
+    Recalcula paid_total, validated_total y balance de las compras indicadas
+    con un único UPDATE: las sumas se hacen en la base de datos dentro de la
+    misma sentencia, así que el resultado es consistente aunque haya pagos
+    concurrentes sobre la misma compra.
+    """
+    paid = _payment_sum()
+    return Purchase.objects.filter(id__in=purchase_ids).update(
+        paid_total=paid,
+        validated_total=_payment_sum(is_validated=True),
+        balance=F("total_amount") - paid,
+    )
+
+
+def purchases_with_drift(queryset=None):
+    """Compras cuyos totales guardados no coinciden con sus pagos."""
+    if queryset is None:
+        queryset = Purchase.objects.all()
+    return queryset.annotate(
+        actual_paid=_payment_sum(),
+        actual_validated=_payment_sum(is_validated=True),
+    ).filter(
+        ~Q(paid_total=F("actual_paid"))
+        | ~Q(validated_total=F("actual_validated"))
+        | ~Q(balance=F("total_amount") - F("actual_paid"))
+    )
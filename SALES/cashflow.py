@@ -0,0 +1,207 @@
+import calendar
+from array import array
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InstallmentPlan
+
+HORIZON_MONTHS = 12
+# Antigüedad de la mora (días desde la obligación impaga más antigua)
+AGING_BUCKETS = (
+    (30, "0-30 días"),
+    (60, "31-60 días"),
+    (90, "61-90 días"),
+    (None, "Más de 90 días"),
+)
+MAX_INSTALLMENTS = 360
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _due_date(month_index, due_day):
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(due_day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _cents(value):
+    return int((value or 0) * 100)
+
+
+def _money(cents):
+    return (Decimal(cents) / 100).quantize(Decimal("0.01"))
+
+
+def parse_plan(data, total_amount):
+    """
+    Lee installments, down_payment, start_date y first_due_date de un
+    formulario. Devuelve None si no se pidió plan; ValueError si es inválido.
+    """
+    raw = (data.get("installments") or "").strip()
+    if not raw or raw == "0":
+        return None
+    try:
+        count = int(raw)
+        down_payment = Decimal(str(data.get("down_payment") or 0))
+        start_date = date.fromisoformat(data.get("start_date") or timezone.localdate().isoformat())
+        first_due_date = date.fromisoformat(data.get("first_due_date") or "")
+    except (ValueError, ArithmeticError):
+        raise ValueError("Datos del plan de pagos inválidos.")
+    if not 1 <= count <= MAX_INSTALLMENTS:
+        raise ValueError(f"El plan debe tener entre 1 y {MAX_INSTALLMENTS} cuotas.")
+    if down_payment < 0 or down_payment > Decimal(str(total_amount or 0)):
+        raise ValueError("La cuota inicial debe estar entre 0 y el total de la compra.")
+    if first_due_date < start_date:
+        raise ValueError("La primera cuota no puede vencer antes del inicio del plan.")
+    return {
+        "installment_count": count,
+        "down_payment": down_payment,
+        "start_date": start_date,
+        "first_due_date": first_due_date,
+    }
+
+
+class PlanColumns:
+    """
+    Planes abiertos en columnas (arreglos de enteros): valores en centavos,
+    fechas como ordinal o índice de mes. Así la proyección recorre números
+    planos en vez de instancias de modelos.
+    """
+    FIELDS = ("total", "paid", "down", "count", "start", "first_month", "due_day")
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, array("q"))
+
+    def __len__(self):
+        return len(self.total)
+
+    def append(self, total, paid, down, count, start_date, first_due_date):
+        self.total.append(_cents(total))
+        self.paid.append(_cents(paid))
+        self.down.append(_cents(down))
+        self.count.append(count)
+        self.start.append(start_date.toordinal())
+        self.first_month.append(_month_index(first_due_date))
+        self.due_day.append(first_due_date.day)
+
+
+def load_open_plans(queryset=None):
+    """Planes de compras con saldo por validar, en una sola consulta."""
+    if queryset is None:
+        queryset = InstallmentPlan.objects.all()
+    rows = queryset.filter(purchase__validated_total__lt=F("purchase__total_amount")).values_list(
+        "purchase__total_amount", "purchase__validated_total", "down_payment",
+        "installment_count", "start_date", "first_due_date",
+    )
+    columns = PlanColumns()
+    for row in rows.iterator(chunk_size=5000):
+        columns.append(*row)
+    return columns
+
+
+def _bucket(age):
+    for index, (limit, _) in enumerate(AGING_BUCKETS):
+        if limit is None or age <= limit:
+            return index
+
+
+def project(columns, today=None, horizon=HORIZON_MONTHS):
+    """
+    Proyecta el recaudo esperado por mes, la mora y su antigüedad. Cada
+    plan se resuelve con aritmética sobre sus columnas (cuotas vencidas y
+    cubiertas por lo pagado) y su flujo futuro se suma como un rango en un
+    arreglo de diferencias por mes, sin expandir cuota por cuota.
+    """
+    today = today or timezone.localdate()
+    today_ord = today.toordinal()
+    current = _month_index(today)
+    month_days = calendar.monthrange(today.year, today.month)[1]
+    diff = [0] * (horizon + 1)
+    arrears_total = 0
+    aging_count = [0] * len(AGING_BUCKETS)
+    aging_amount = [0] * len(AGING_BUCKETS)
+
+    total_col, paid_col, down_col, count_col = columns.total, columns.paid, columns.down, columns.count
+    start_col, month_col, day_col = columns.start, columns.first_month, columns.due_day
+    for i in range(len(columns)):
+        paid, down, n, first_month, due_day = paid_col[i], down_col[i], count_col[i], month_col[i], day_col[i]
+        # La base exige al menos una cuota; un plan sin cuotas se proyecta como una sola
+        n = max(n, 1)
+        financed = max(total_col[i] - down, 0)
+        base = financed // n
+        last = financed - base * (n - 1)
+
+        # Cuotas vencidas a hoy (las que vencen hoy cuentan como vencidas)
+        elapsed = current - first_month
+        if elapsed < 0:
+            due = 0
+        else:
+            due = min(elapsed + (today.day >= min(due_day, month_days)), n)
+        down_due = down if today_ord >= start_col[i] else 0
+
+        # Cuotas cubiertas por lo pagado después de la cuota inicial (con
+        # base 0 todas menos la última valen 0 y ya están cubiertas)
+        credit = max(paid - down, 0)
+        covered = min(credit // base, n - 1) if base else n - 1
+        partial = credit - base * covered
+        if covered == n - 1 and partial >= last:
+            covered, partial = n, 0
+
+        arrears = down_due + (base * due if due < n else financed) - paid
+        if arrears > 0:
+            arrears_total += arrears
+            if paid < down_due:
+                oldest = start_col[i]
+            else:
+                oldest = _due_date(first_month + covered, due_day).toordinal()
+            bucket = _bucket(today_ord - oldest)
+            aging_count[bucket] += 1
+            aging_amount[bucket] += arrears
+
+        # Cuota inicial aún por vencer (planes que empiezan después de hoy)
+        if paid < down and not down_due:
+            offset = _month_index(date.fromordinal(start_col[i])) - current
+            if offset < horizon:
+                diff[offset] += down - paid
+                diff[offset + 1] -= down - paid
+
+        first = max(covered, due)
+        if first >= n:
+            continue
+        lo, hi = first_month + first - current, first_month + n - 1 - current
+        a, b = max(lo, 0), min(hi, horizon - 1)
+        if a <= b:
+            diff[a] += base
+            diff[b + 1] -= base
+        if 0 <= hi < horizon:
+            diff[hi] += last - base
+            diff[hi + 1] -= last - base
+        if first == covered and partial and 0 <= lo < horizon:
+            diff[lo] -= partial
+            diff[lo + 1] += partial
+
+    months = []
+    running = 0
+    for offset in range(horizon):
+        running += diff[offset]
+        year, month = divmod(current + offset, 12)
+        months.append({"month": date(year, month + 1, 1), "expected": _money(running)})
+    return {
+        "plans": len(columns),
+        "months": months,
+        "expected_total": sum((m["expected"] for m in months), Decimal("0.00")),
+        "arrears": _money(arrears_total),
+        "aging": [
+            {"label": label, "count": aging_count[i], "amount": _money(aging_amount[i])}
+            for i, (_, label) in enumerate(AGING_BUCKETS)
+        ],
+    }
+
+
+def portfolio_projection(today=None, horizon=HORIZON_MONTHS):
+    return project(load_open_plans(), today, horizon)
@@ -0,0 +1,53 @@
+import re
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+# Tiempo durante el cual un reintento devuelve el resultado original
+KEY_TTL = timedelta(hours=24)
+KEY_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+FIELD_NAME = "idempotency_key"
+
+
+def new_key():
+    """Clave para el campo oculto del formulario; cada carga del formulario lleva una nueva."""
+    return uuid.uuid4().hex
+
+
+def request_key(request):
+    """
+    Clave del envío: el campo oculto del formulario o la cabecera
+    Idempotency-Key (clientes que reintentan por su cuenta). None si no
+    viene o no tiene un formato válido.
+    """
+    key = request.POST.get(FIELD_NAME) or request.headers.get("Idempotency-Key") or ""
+    return key if KEY_RE.match(key) else None
+
+
+def find_key(user, key):
+    if not key:
+        return None
+    return (
+        IdempotencyKey.objects.filter(user=user, key=key, created_at__gte=timezone.now() - KEY_TTL)
+        .select_related("payment")
+        .first()
+    )
+
+
+def remember_key(user, key, payment, redirect_url):
+    """
+    Guarda la clave junto al pago. Debe llamarse en la misma transacción que
+    crea el pago: si otro envío con la misma clave se adelantó, la
+    restricción única lanza IntegrityError y el pago se revierte.
+    """
+    IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=timezone.now() - KEY_TTL).delete()
+    return IdempotencyKey.objects.create(user=user, key=key, payment=payment, redirect_url=redirect_url)
+
+
+def purge_expired_keys(now=None):
+    cutoff = (now or timezone.now()) - KEY_TTL
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,147 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from SIGLO.pagination import InvalidCursor, paginate_keyset
+from .models import Purchase
+
+ADMIN_PAGE_SIZE = 50
+
+# Orden de los listados del admin: nombre en ?sort -> columna. Cada columna
+# tiene un índice compuesto (columna, id) en SALES.models, el mismo que
+# usa el cursor, así que ninguna página hace un recorrido completo.
+PAYMENT_SORTS = {
+    "date": "payment_date",
+    "amount": "amount",
+    "id": "id",
+}
+PURCHASE_SORTS = {
+    "date": "created_at",
+    "total": "total_amount",
+    "balance": "balance",
+    "id": "id",
+}
+DEFAULT_SORT = "-date"
+# Parámetros de filtro que se conservan al ordenar y paginar
+FILTER_PARAMS = ("client", "start", "end", "validated", "stage")
+
+
+def _date(params, name):
+    raw = (params.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"Fecha inválida para '{name}'; usa el formato AAAA-MM-DD.")
+
+
+def parse_list_filters(params):
+    """Lee client, start, end, validated (1/0) y stage desde un QueryDict."""
+    validated = (params.get("validated") or "").strip()
+    if validated not in ("", "1", "0"):
+        raise ValueError("Valor inválido para 'validated'.")
+    stage = (params.get("stage") or "").strip()
+    if stage and not stage.isdigit():
+        raise ValueError("Valor inválido para 'stage'.")
+    filters = {
+        "client": (params.get("client") or "").strip(),
+        "start": _date(params, "start"),
+        "end": _date(params, "end"),
+        "validated": {"": None, "1": True, "0": False}[validated],
+        "stage": int(stage) if stage else None,
+    }
+    if filters["start"] and filters["end"] and filters["end"] < filters["start"]:
+        raise ValueError("La fecha final es anterior a la inicial.")
+    return filters
+
+
+def _client_ids(text):
+    """Subconsulta de clientes por id, correo o nombre."""
+    if text.isdigit():
+        return [int(text)]
+    words = text.split()
+    condition = Q(email__icontains=text)
+    if words:
+        name = Q()
+        for word in words:
+            name &= Q(first_name__icontains=word) | Q(last_name__icontains=word)
+        condition |= name
+    return get_user_model().objects.filter(condition).values("id")
+
+
+def _with_stage(stage_id, purchase_ref):
+    # Exists en la tabla intermedia en vez de un join para no duplicar filas
+    return Exists(Purchase.lots.through.objects.filter(purchase_id=purchase_ref, lot__stage_id=stage_id))
+
+
+def filter_payments(queryset, filters):
+    if filters["client"]:
+        queryset = queryset.filter(purchase__client_id__in=_client_ids(filters["client"]))
+    if filters["start"]:
+        queryset = queryset.filter(payment_date__gte=filters["start"])
+    if filters["end"]:
+        queryset = queryset.filter(payment_date__lte=filters["end"])
+    if filters["validated"] is not None:
+        queryset = queryset.filter(is_validated=filters["validated"])
+    if filters["stage"]:
+        queryset = queryset.filter(_with_stage(filters["stage"], OuterRef("purchase_id")))
+    return queryset
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_purchases(queryset, filters):
+    """
+    En compras, validated=1 son las que no tienen pagos pendientes de
+    validar y validated=0 las que sí; se compara con los totales guardados
+    en la compra, sin consultar los pagos.
+    """
+    if filters["client"]:
+        queryset = queryset.filter(client_id__in=_client_ids(filters["client"]))
+    if filters["start"]:
+        queryset = queryset.filter(created_at__gte=_day_start(filters["start"]))
+    if filters["end"]:
+        queryset = queryset.filter(created_at__lt=_day_start(filters["end"] + timedelta(days=1)))
+    if filters["validated"] is True:
+        queryset = queryset.filter(paid_total=F("validated_total"))
+    elif filters["validated"] is False:
+        queryset = queryset.filter(paid_total__gt=F("validated_total"))
+    if filters["stage"]:
+        queryset = queryset.filter(_with_stage(filters["stage"], OuterRef("pk")))
+    return queryset
+
+
+def parse_sort(value, sorts):
+    sort = value or DEFAULT_SORT
+    if sort.lstrip("-") not in sorts:
+        sort = DEFAULT_SORT
+    field = sorts[sort.lstrip("-")]
+    direction = "-" if sort.startswith("-") else ""
+    if field == "id":
+        return sort, [f"{direction}id"]
+    return sort, [f"{direction}{field}", f"{direction}id"]
+
+
+def admin_list_page(queryset, ordering, cursor=None, limit=ADMIN_PAGE_SIZE):
+    """
+    Una página del listado por keyset. Un cursor inválido (p. ej. de otro
+    orden) vuelve a la primera página. Devuelve (filas, siguiente_cursor).
+    """
+    try:
+        return paginate_keyset(queryset, ordering, cursor, limit)
+    except InvalidCursor:
+        return paginate_keyset(queryset, ordering, None, limit)
+
+
+def filter_query(params):
+    """Querystring con solo los filtros activos, para enlaces de orden y página."""
+    query = params.copy()
+    for name in list(query):
+        if name not in FILTER_PARAMS or not query.get(name):
+            del query[name]
+    return query.urlencode()
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from LOTES.inventory import update_lot_statuses
+from SIGLO.pagination import keyset_filter
+from .models import Purchase
+
+BATCH_SIZE = 500
+
+
+def statuses_for_purchase(lot_prices, total_paid, total_amount):
+    """
+    Estado de cada lote de una compra según lo pagado (pagos validados).
+    `lot_prices` es una lista de (lot_id, precio). El total contractual se
+    reparte entre los lotes en proporción a su precio; los lotes más caros
+    se marcan vendidos primero y el resto queda reservado. Un lote nunca
+    vuelve a estar disponible mientras pertenezca a una compra.
+    """
+    sum_lot_prices = sum((price or Decimal("0") for _, price in lot_prices), Decimal("0"))
+    contractual_total = total_amount or sum_lot_prices
+
+    targets = {}
+    for lot_id, price in lot_prices:
+        if sum_lot_prices > Decimal("0"):
+            targets[lot_id] = ((price or Decimal("0")) / sum_lot_prices) * contractual_total
+        else:
+            targets[lot_id] = Decimal("0")
+    total_targets = sum(targets.values(), Decimal("0"))
+
+    if total_paid >= total_targets and total_targets > Decimal("0"):
+        return {lot_id: "SOLD" for lot_id in targets}
+    if total_paid <= Decimal("0"):
+        return {lot_id: "RESERVED" for lot_id in targets}
+
+    statuses = {}
+    remaining = total_paid
+    for lot_id in sorted(targets, key=lambda i: (targets[i], i), reverse=True):
+        target = targets[lot_id]
+        if remaining >= target and target > Decimal("0"):
+            statuses[lot_id] = "SOLD"
+            remaining -= target
+        else:
+            statuses[lot_id] = "RESERVED"
+    return statuses
+
+
+def compute_lot_statuses(purchase_ids):
+    """
+    Calcula {lot_id: estado} para varias compras con dos consultas: los
+    pagos validados se suman en la base de datos y los precios de los lotes
+    salen de la tabla intermedia. Si un lote está en varias compras manda
+    la más reciente, igual que en el listado de lotes del admin.
+    """
+    purchases = list(
+        Purchase.objects.filter(id__in=purchase_ids)
+        .annotate(validated_paid=Sum("payment__amount", filter=Q(payment__is_validated=True)))
+        .order_by("created_at", "id")
+        .values_list("id", "total_amount", "validated_paid")
+    )
+    lots_by_purchase = defaultdict(list)
+    for purchase_id, lot_id, price in Purchase.lots.through.objects.filter(
+        purchase_id__in=[p[0] for p in purchases]
+    ).values_list("purchase_id", "lot_id", "lot__price"):
+        lots_by_purchase[purchase_id].append((lot_id, price))
+
+    statuses = {}
+    for purchase_id, total_amount, paid in purchases:
+        lot_prices = lots_by_purchase.get(purchase_id)
+        if lot_prices:
+            statuses.update(statuses_for_purchase(lot_prices, paid or Decimal("0"), total_amount))
+    return statuses
+
+
+def recompute_lot_statuses(purchase_ids):
+    """
+    Recalcula y guarda el estado de los lotes de las compras indicadas en
+    una sola transacción. Devuelve la cantidad de lotes que cambiaron.
+    """
+    with transaction.atomic():
+        return update_lot_statuses(compute_lot_statuses(purchase_ids))
+
+
+def update_lots_status_for_purchase(purchase):
+    return recompute_lot_statuses([purchase.pk])
+
+
+def iter_purchase_batches(batch_size=BATCH_SIZE):
+    """Ids de todas las compras por bloques, en orden de creación y sin OFFSET."""
+    ordering = ("created_at", "id")
+    queryset = Purchase.objects.order_by(*ordering).values_list(*ordering)
+    last = None
+    while True:
+        page = queryset if last is None else keyset_filter(queryset, ordering, last)
+        rows = list(page[:batch_size])
+        if not rows:
+            return
+        yield [purchase_id for _, purchase_id in rows]
+        last = rows[-1]
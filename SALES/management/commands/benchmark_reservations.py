@@ -0,0 +1,106 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+
+from LOTES.models import Lot, Stage
+from SALES.models import Purchase
+from SALES.reservations import LotUnavailable, reserve_lot
+
+PREFIX = "BENCH-"
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la reserva concurrente de lotes: muchos clientes compiten por pocos lotes '
+        'y se verifica que ningún lote quede vendido dos veces. Crea datos temporales '
+        'con prefijo BENCH- y los elimina al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lots', type=int, default=20, help='Lotes en disputa')
+        parser.add_argument('--clients', type=int, default=50, help='Clientes compitiendo')
+        parser.add_argument('--attempts', type=int, default=1000, help='Intentos de reserva en total')
+        parser.add_argument('--threads', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--keep', action='store_true', help='No elimina los datos temporales')
+
+    def handle(self, *args, **options):
+        if Lot.objects.filter(code__startswith=PREFIX).exists():
+            raise CommandError(f'Ya existen lotes {PREFIX}*; elimínalos antes de repetir la prueba.')
+
+        stage, lots, clients = self.setup(options['lots'], options['clients'])
+        lot_ids = [lot.id for lot in lots]
+        plan = [(random.choice(clients), random.choice(lot_ids)) for _ in range(options['attempts'])]
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def attempt(job):
+            client, lot_id = job
+            try:
+                reserve_lot(client, lot_id)
+                result = 'won'
+            except LotUnavailable:
+                result = 'lost'
+            except OperationalError:
+                # p. ej. "database is locked" en SQLite
+                result = 'error'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[result] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(attempt, plan))
+        elapsed = time.perf_counter() - started
+
+        purchases_per_lot = (
+            Purchase.lots.through.objects.filter(lot_id__in=lot_ids)
+            .values('lot_id').annotate(n=Count('purchase_id'))
+        )
+        double_sold = sum(1 for row in purchases_per_lot if row['n'] > 1)
+        reserved = Lot.objects.filter(id__in=lot_ids, status='RESERVED').count()
+
+        self.stdout.write(
+            f"Intentos: {len(plan)} en {elapsed:.2f}s ({len(plan) / elapsed:.0f}/s) con {options['threads']} hilos\n"
+            f"Reservas ganadas: {outcomes['won']}. Rechazadas: {outcomes['lost']}. Errores: {outcomes['error']}.\n"
+            f"Lotes reservados: {reserved}/{len(lot_ids)}."
+        )
+        if not options['keep']:
+            self.teardown(stage, lot_ids, clients)
+
+        if double_sold:
+            raise CommandError(f'Lotes con más de una compra: {double_sold}.')
+        if outcomes['won'] != reserved:
+            raise CommandError(
+                f"Reservas ganadas ({outcomes['won']}) distintas de lotes reservados ({reserved})."
+            )
+        self.stdout.write(self.style.SUCCESS('Sin ventas dobles.'))
+
+    def setup(self, lot_count, client_count):
+        User = get_user_model()
+        with transaction.atomic():
+            stage = Stage.objects.create(name=f'{PREFIX}etapa', description='Datos temporales de benchmark')
+            lots = [
+                Lot.objects.create(code=f'{PREFIX}{i}', stage=stage, area_m2=100, price=100000000,
+                                   latitude=0, longitude=0, status='AVAILABLE')
+                for i in range(lot_count)
+            ]
+            clients = [
+                User.objects.create(username=f'{PREFIX}{i}', email=f'bench{i}@example.com', role='CLIENT')
+                for i in range(client_count)
+            ]
+        return stage, lots, clients
+
+    def teardown(self, stage, lot_ids, clients):
+        with transaction.atomic():
+            Purchase.objects.filter(lots__in=lot_ids).delete()
+            Lot.objects.filter(id__in=lot_ids).delete()
+            stage.delete()
+            get_user_model().objects.filter(id__in=[c.id for c in clients]).delete()
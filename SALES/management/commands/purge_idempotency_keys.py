@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from SALES.idempotency import KEY_TTL, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = f'Elimina las claves de idempotencia de pagos con más de {KEY_TTL} de antigüedad'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f'Claves eliminadas: {deleted}.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from SALES.rollups import BACKFILL_DAYS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas (DailySales) por bloques de días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-days', type=int, default=BACKFILL_DAYS, help='Días calculados por bloque')
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario reconstruido: {rows} filas.'))
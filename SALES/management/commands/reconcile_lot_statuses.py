@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from LOTES.inventory import load_snapshots
+from SALES.lot_status import BATCH_SIZE, compute_lot_statuses, iter_purchase_batches, recompute_lot_statuses
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el estado de los lotes de todas las compras según sus pagos validados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Compras por bloque')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa cuántos lotes cambiarían')
+
+    def handle(self, *args, **options):
+        purchases = changed = 0
+        for ids in iter_purchase_batches(options['batch_size']):
+            purchases += len(ids)
+            if options['dry_run']:
+                statuses = compute_lot_statuses(ids)
+                current = load_snapshots(list(statuses))
+                changed += sum(1 for lot_id, row in current.items() if row['status'] != statuses[lot_id])
+            else:
+                changed += recompute_lot_statuses(ids)
+
+        verb = 'cambiarían' if options['dry_run'] else 'actualizados'
+        self.stdout.write(self.style.SUCCESS(f'Compras revisadas: {purchases}. Lotes {verb}: {changed}.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from SALES.balances import purchases_with_drift, refresh_purchase_totals
+
+
+class Command(BaseCommand):
+    help = 'Detecta (y con --fix corrige) compras cuyos totales guardados no coinciden con sus pagos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recalcula los totales de las compras con diferencias')
+
+    def handle(self, *args, **options):
+        drifted = purchases_with_drift().values_list(
+            'id', 'paid_total', 'actual_paid', 'validated_total', 'actual_validated'
+        )
+        ids = []
+        for purchase_id, paid, actual_paid, validated, actual_validated in drifted.iterator():
+            ids.append(purchase_id)
+            self.stdout.write(self.style.WARNING(
+                f'Compra #{purchase_id}: pagado {paid} (real {actual_paid}), '
+                f'validado {validated} (real {actual_validated})'
+            ))
+
+        if not ids:
+            self.stdout.write(self.style.SUCCESS('Todos los totales de compras están al día.'))
+            return
+        if options['fix']:
+            refresh_purchase_totals(ids)
+            self.stdout.write(self.style.SUCCESS(f'Compras corregidas: {len(ids)}.'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Compras con diferencias: {len(ids)}. Usa --fix para corregirlas.'))
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 12:22
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Purchase = apps.get_model('SALES', 'Purchase')
+    Payment = apps.get_model('SALES', 'Payment')
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    def payment_sum(**filters):
+        return Coalesce(
+            Subquery(
+                Payment.objects.filter(purchase=OuterRef('pk'), **filters)
+                .values('purchase').annotate(total=Sum('amount')).values('total')
+            ),
+            zero,
+        )
+
+    Purchase.objects.update(
+        paid_total=payment_sum(),
+        validated_total=payment_sum(is_validated=True),
+        balance=F('total_amount') - payment_sum(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SALES', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='validated_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SALES', '0003_purchase_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='receipt_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
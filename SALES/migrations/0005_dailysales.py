@@ -0,0 +1,118 @@
+# Generated by Django 6.0 on 2026-10-18 12:30
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.utils import timezone
+
+# Copia congelada de SALES.rollups (reparto por etapa y cálculo por día) tal
+# como era al crear la tabla: la migración no debe depender del código vivo
+# de la app.
+CENT = Decimal('0.01')
+CHUNK_DAYS = 31
+
+
+def allocate(amount, shares):
+    total = sum(price for _, price in shares)
+    parts, assigned = [], Decimal('0')
+    for index, (stage_id, price) in enumerate(shares):
+        if index == len(shares) - 1:
+            part = amount - assigned
+        else:
+            weight = price / total if total > 0 else Decimal('1') / len(shares)
+            part = (amount * weight).quantize(CENT, rounding=ROUND_HALF_UP)
+        assigned += part
+        parts.append((stage_id, part))
+    return parts
+
+
+def primary_stage(shares):
+    if not shares:
+        return None
+    return max(shares, key=lambda share: share[1])[0]
+
+
+def compute_days(days, Payment, Purchase, DailySales):
+    cells = defaultdict(lambda: {'payment_count': 0, 'amount': Decimal('0'), 'purchase_count': 0, 'lots_sold': 0})
+    payments = list(
+        Payment.objects.filter(payment_date__in=days).values_list('payment_date', 'purchase_id', 'amount', 'is_validated')
+    )
+    purchases = list(
+        Purchase.objects.filter(created_at__date__in=days).values_list('id', 'created_at', 'is_validated')
+    )
+    shares = defaultdict(list)
+    purchase_ids = {p[1] for p in payments} | {p[0] for p in purchases}
+    for purchase_id, stage_id, price in (
+        Purchase.lots.through.objects.filter(purchase_id__in=purchase_ids)
+        .order_by('lot_id')
+        .values_list('purchase_id', 'lot__stage_id', 'lot__price')
+    ):
+        shares[purchase_id].append((stage_id, price or Decimal('0')))
+
+    for day, purchase_id, amount, validated in payments:
+        for stage_id, part in allocate(amount, shares.get(purchase_id) or [(None, Decimal('0'))]):
+            cells[(day, stage_id, validated)]['amount'] += part
+        cells[(day, primary_stage(shares.get(purchase_id)), validated)]['payment_count'] += 1
+
+    for purchase_id, created_at, validated in purchases:
+        day = timezone.localdate(created_at)
+        lots = shares.get(purchase_id, [])
+        cells[(day, primary_stage(lots), validated)]['purchase_count'] += 1
+        for stage_id, _ in lots:
+            cells[(day, stage_id, validated)]['lots_sold'] += 1
+
+    return [
+        DailySales(date=day, stage_id=stage_id, validated=validated, **values)
+        for (day, stage_id, validated), values in cells.items()
+    ]
+
+
+def build_rollups(apps, schema_editor):
+    Payment = apps.get_model('SALES', 'Payment')
+    Purchase = apps.get_model('SALES', 'Purchase')
+    DailySales = apps.get_model('SALES', 'DailySales')
+
+    payments = Payment.objects.aggregate(first=Min('payment_date'), last=Max('payment_date'))
+    purchases = Purchase.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    firsts = [d for d in (payments['first'], purchases['first'] and timezone.localdate(purchases['first'])) if d]
+    lasts = [d for d in (payments['last'], purchases['last'] and timezone.localdate(purchases['last'])) if d]
+    if not firsts:
+        return
+    day, last = min(firsts), max(lasts)
+    while day <= last:
+        chunk = [day + timedelta(days=i) for i in range(CHUNK_DAYS) if day + timedelta(days=i) <= last]
+        DailySales.objects.bulk_create(compute_days(chunk, Payment, Purchase, DailySales), batch_size=1000)
+        day = chunk[-1] + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0005_image_variants'),
+        ('SALES', '0004_payment_receipt_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('validated', models.BooleanField()),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('purchase_count', models.PositiveIntegerField(default=0)),
+                ('lots_sold', models.PositiveIntegerField(default=0)),
+                ('stage', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='LOTES.stage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='SALES_daily_date_dbe2ec_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'stage', 'validated'), name='unique_daily_sales_cell')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
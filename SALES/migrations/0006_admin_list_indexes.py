@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 12:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LOTES', '0005_image_variants'),
+        ('SALES', '0005_dailysales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='SALES_payme_payment_f46ce0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['amount', 'id'], name='SALES_payme_amount_75122e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['is_validated', 'payment_date', 'id'], name='SALES_payme_is_vali_31f232_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['created_at', 'id'], name='SALES_purch_created_2fa102_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['total_amount', 'id'], name='SALES_purch_total_a_3c83e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['balance', 'id'], name='SALES_purch_balance_c6c98b_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SALES', '0006_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallmentPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('down_payment', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('installment_count', models.PositiveSmallIntegerField()),
+                ('start_date', models.DateField()),
+                ('first_due_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('purchase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plan', to='SALES.purchase')),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 13:21
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def repair_plans(apps, schema_editor):
+    # Planes guardados antes de las restricciones (el admin no validaba): sin
+    # cuotas se toman como una sola cuota, y una primera cuota anterior al
+    # inicio se mueve al inicio del plan.
+    InstallmentPlan = apps.get_model('SALES', 'InstallmentPlan')
+    InstallmentPlan.objects.filter(installment_count__lt=1).update(installment_count=1)
+    InstallmentPlan.objects.filter(first_due_date__lt=models.F('start_date')).update(first_due_date=models.F('start_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SALES', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='installmentplan',
+            name='installment_count',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(repair_plans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='installmentplan',
+            constraint=models.CheckConstraint(condition=models.Q(('installment_count__gte', 1)), name='installment_plan_count_positive', violation_error_message='El plan debe tener al menos una cuota.'),
+        ),
+        migrations.AddConstraint(
+            model_name='installmentplan',
+            constraint=models.CheckConstraint(condition=models.Q(('first_due_date__gte', models.F('start_date'))), name='installment_plan_due_after_start', violation_error_message='La primera cuota no puede vencer antes del inicio del plan.'),
+        ),
+    ]
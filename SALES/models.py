@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.conf import settings
 from LOTES.models import Lot
@@ -9,10 +12,26 @@ class Purchase(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     is_validated = models.BooleanField(default=False)
+    # Totales desnormalizados de los pagos; los mantiene SALES.signals
+    # (ver SALES.balances.refresh_purchase_totals).
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    validated_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.balance = Decimal(str(self.total_amount or 0)) - Decimal(str(self.paid_total or 0))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "total_amount" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "balance"}
+        super().save(*args, **kwargs)
 
-    def balance(self):
-        total_paid = sum(p.amount for p in self.payment_set.all())
-        return self.total_amount - total_paid
+    class Meta:
+        # Órdenes del listado del admin (ver SALES.listing), con id de desempate
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["total_amount", "id"]),
+            models.Index(fields=["balance", "id"]),
+        ]
 
 
 class Payment(models.Model):
@@ -20,3 +39,84 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     payment_date = models.DateField(auto_now_add=True)
     is_validated = models.BooleanField(default=False)
+    # Hash del contenido del comprobante guardado en el storage (ver SALES.receipts)
+    receipt_key = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["payment_date", "id"]),
+            models.Index(fields=["amount", "id"]),
+            models.Index(fields=["is_validated", "payment_date", "id"]),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    # Clave de un envío de pago ya procesado (ver SALES.idempotency). Un
+    # reintento con la misma clave devuelve el resultado original en vez de
+    # registrar otro pago. Se descartan después de SALES.idempotency.KEY_TTL.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE)
+    redirect_url = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"{self.key} -> pago #{self.payment_id}"
+
+
+class InstallmentPlan(models.Model):
+    # Plan de pagos de una compra: la cuota inicial vence en start_date y el
+    # resto del total se reparte en cuotas mensuales iguales desde
+    # first_due_date (la última absorbe el redondeo). Ver SALES.cashflow.
+    purchase = models.OneToOneField(Purchase, on_delete=models.CASCADE, related_name="plan")
+    down_payment = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    installment_count = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
+    start_date = models.DateField()
+    first_due_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(installment_count__gte=1),
+                name="installment_plan_count_positive",
+                violation_error_message="El plan debe tener al menos una cuota.",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(first_due_date__gte=models.F("start_date")),
+                name="installment_plan_due_after_start",
+                violation_error_message="La primera cuota no puede vencer antes del inicio del plan.",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Plan compra #{self.purchase_id} ({self.installment_count} cuotas)"
+
+
+class DailySales(models.Model):
+    # Resumen diario por etapa y estado de validación, recalculado por día
+    # desde SALES.signals (ver SALES.rollups). stage nulo = compras sin lotes.
+    # lots_sold cuenta los lotes de las compras creadas ese día en la etapa de
+    # cada lote, según la validación de la compra; no depende de Lot.status.
+    date = models.DateField()
+    stage = models.ForeignKey("LOTES.Stage", null=True, blank=True, on_delete=models.CASCADE)
+    validated = models.BooleanField()
+    payment_count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchase_count = models.PositiveIntegerField(default=0)
+    lots_sold = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "stage", "validated"], name="unique_daily_sales_cell"),
+        ]
+        indexes = [models.Index(fields=["date"])]
+
+    def __str__(self):
+        return f"{self.date} {self.stage_id} {'V' if self.validated else 'P'}"
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+
+from .models import Payment, Purchase
+
+ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def current_purchase_subquery():
+    """Id de la compra más reciente que incluye el lote (OuterRef = Lot.pk)."""
+    return Subquery(
+        Purchase.lots.through.objects.filter(lot_id=OuterRef("pk"))
+        .order_by("-purchase__created_at", "-purchase_id")
+        .values("purchase_id")[:1]
+    )
+
+
+def purchases_with_summary(queryset=None):
+    """Compras anotadas con su último pago, sin consultas por fila."""
+    if queryset is None:
+        queryset = Purchase.objects.all()
+    latest = Payment.objects.filter(purchase=OuterRef("pk")).order_by("-payment_date", "-id")
+    return queryset.select_related("client").annotate(
+        last_payment_id=Subquery(latest.values("id")[:1]),
+        last_payment_amount=Subquery(latest.values("amount")[:1]),
+        last_payment_date=Subquery(latest.values("payment_date")[:1]),
+        last_payment_validated=Subquery(latest.values("is_validated")[:1]),
+    )
+
+
+def attach_current_purchases(lots):
+    """
+    Asigna `associated_purchase` y `recent_payment` a cada lote de la lista.
+    Los lotes deben venir anotados con `current_purchase_id`
+    (ver current_purchase_subquery). Cuesta una sola consulta adicional.
+    """
+    ids = {lot.current_purchase_id for lot in lots if lot.current_purchase_id}
+    purchases = {p.id: p for p in purchases_with_summary(Purchase.objects.filter(id__in=ids))} if ids else {}
+
+    for purchase in purchases.values():
+        total = purchase.total_amount or Decimal("0")
+        purchase.paid_fraction = min(purchase.paid_total / total, Decimal("1")) if total > 0 else Decimal("0")
+        purchase.recent_payment = None
+        if purchase.last_payment_id:
+            purchase.recent_payment = Payment(
+                id=purchase.last_payment_id,
+                purchase=purchase,
+                amount=purchase.last_payment_amount,
+                payment_date=purchase.last_payment_date,
+                is_validated=purchase.last_payment_validated,
+            )
+
+    for lot in lots:
+        purchase = purchases.get(lot.current_purchase_id)
+        lot.associated_purchase = purchase
+        lot.recent_payment = purchase.recent_payment if purchase else None
+    return lots
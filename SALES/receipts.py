@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.template.loader import render_to_string
+
+from PROJECT_INFO.notifications import send_email
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+# Ruta del trabajo que encola register_payment (ver PROJECT_INFO.jobs)
+PAYMENT_RECEIPT_TASK = "SALES.receipts.send_payment_receipt"
+RECEIPTS_DIR = "receipts"
+# Subir cuando cambie el diseño del comprobante para regenerarlos todos
+RECEIPT_VERSION = 1
+
+
+def _payment_date(payment):
+    return payment.payment_date.strftime("%d/%m/%Y") if payment.payment_date else "Hoy"
+
+
+def _money(value):
+    # Siempre con dos decimales: Decimal("400") y el 400.00 leído de la base
+    # deben dar la misma clave
+    return f"{Decimal(str(value)):.2f}"
+
+
+def balance_after(payment):
+    """Saldo de la compra inmediatamente después de este pago."""
+    paid = (
+        Payment.objects.filter(purchase_id=payment.purchase_id, id__lte=payment.id)
+        .aggregate(total=Sum("amount"))["total"]
+        or Decimal("0")
+    )
+    return payment.purchase.total_amount - paid
+
+
+def receipt_data(payment, balance=None):
+    """
+    Todo lo que aparece en el comprobante. Si cambia cualquiera de estos
+    datos cambia la clave y el comprobante se vuelve a generar.
+    """
+    client = payment.purchase.client
+    if balance is None:
+        balance = balance_after(payment)
+    return {
+        "version": RECEIPT_VERSION,
+        "payment_id": payment.id,
+        "purchase_id": payment.purchase_id,
+        "client": client.get_full_name() or client.email,
+        "amount": _money(payment.amount),
+        "payment_date": _payment_date(payment),
+        "balance": _money(balance),
+    }
+
+
+def receipt_key(data):
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def receipt_name(key, kind):
+    return f"{RECEIPTS_DIR}/{key}.{kind}"
+
+
+def build_receipt_qr(data):
+    """PNG con el código QR del comprobante."""
+    import qrcode
+
+    qr_data = (
+        f"SIGLO-COMPROBANTE\n"
+        f"Pago: #{data['payment_id']}\n"
+        f"Compra: #{data['purchase_id']}\n"
+        f"Monto: ${data['amount']}\n"
+        f"Fecha: {data['payment_date']}"
+    )
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_receipt_pdf(data):
+    """PDF del comprobante (fpdf)."""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Comprobante de pago SIGLO", ln=True, align='C')
+    pdf.ln(10)
+    pdf.cell(200, 10, txt=f"Compra: #{data['purchase_id']}", ln=True)
+    pdf.cell(200, 10, txt=f"Cliente: {data['client']}", ln=True)
+    pdf.cell(200, 10, txt=f"Monto: ${data['amount']}", ln=True)
+    pdf.cell(200, 10, txt=f"Fecha: {data['payment_date']}", ln=True)
+    pdf.cell(200, 10, txt=f"Saldo pendiente: ${data['balance']}", ln=True)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+# tipo -> (content type, generador, nombre de descarga)
+RECEIPT_KINDS = {
+    "pdf": ("application/pdf", build_receipt_pdf, "comprobante_pago_{id}.pdf"),
+    "png": ("image/png", build_receipt_qr, "comprobante_qr_{id}.png"),
+}
+
+
+def ensure_receipt(payment, data=None, storage=default_storage):
+    """
+    Garantiza que el comprobante vigente del pago esté en el storage y
+    devuelve su clave. Solo se genera cuando la clave guardada en el pago
+    no coincide con la de sus datos actuales; los archivos anteriores se
+    eliminan.
+    """
+    data = data or receipt_data(payment)
+    key = receipt_key(data)
+    if payment.receipt_key == key:
+        return key
+    for kind, (_, build, _) in RECEIPT_KINDS.items():
+        name = receipt_name(key, kind)
+        if not storage.exists(name):
+            storage.save(name, ContentFile(build(data)))
+    if payment.receipt_key:
+        delete_receipt_files(payment.receipt_key, storage)
+    Payment.objects.filter(id=payment.id).update(receipt_key=key)
+    payment.receipt_key = key
+    return key
+
+
+def delete_receipt_files(key, storage=default_storage):
+    for kind in RECEIPT_KINDS:
+        try:
+            storage.delete(receipt_name(key, kind))
+        except Exception:
+            logger.warning("No se pudo eliminar el comprobante %s", receipt_name(key, kind))
+
+
+def _attachment(filename, content_type, content):
+    return {
+        'Filename': filename,
+        'ContentType': content_type,
+        'Base64Content': base64.b64encode(content).decode(),
+    }
+
+
+def send_payment_receipt(payment_id):
+    """
+    Trabajo de la cola: envía por Mailjet el comprobante del pago (QR y PDF
+    guardados con ensure_receipt). Si el envío falla se lanza una excepción
+    para que la cola lo reintente; si los adjuntos no se pueden generar el
+    correo sale igual.
+    """
+    payment = Payment.objects.select_related("purchase__client").filter(id=payment_id).first()
+    if payment is None:
+        logger.warning("Comprobante omitido: el pago %s ya no existe", payment_id)
+        return
+    purchase = payment.purchase
+    client = purchase.client
+    if not client.email:
+        return
+
+    data = receipt_data(payment)
+    email_context = {
+        'user_name': client.get_full_name() or client.username,
+        'purchase_id': purchase.id,
+        'amount': payment.amount,
+        'payment_date': data['payment_date'],
+        'balance': data['balance'],
+    }
+    html_content = render_to_string('emails/payment_receipt_email.html', email_context)
+
+    attachments = []
+    try:
+        key = ensure_receipt(payment, data)
+        for kind, (content_type, _, filename) in RECEIPT_KINDS.items():
+            with default_storage.open(receipt_name(key, kind), 'rb') as fh:
+                attachments.append(_attachment(filename.format(id=payment.id), content_type, fh.read()))
+    except Exception:
+        logger.exception("No se pudieron adjuntar los comprobantes del pago %s", payment.id)
+
+    # Si Mailjet no acepta el correo, send_email lanza EmailDeliveryError
+    send_email(
+        subject="Comprobante de pago - SIGLO",
+        html_content=html_content,
+        to_email=client.email,
+        to_name=client.get_full_name() or client.username,
+        attachments=attachments,
+        category="payment_receipt",
+    )
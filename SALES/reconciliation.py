@@ -0,0 +1,170 @@
+import csv
+import io
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .balances import refresh_purchase_totals
+from .lot_status import recompute_lot_statuses
+from .models import Payment
+from .rollups import refresh_days_on_commit
+
+# Un movimiento del extracto puede llegar unos días después del registro del pago
+DATE_WINDOW = timedelta(days=3)
+CENT = Decimal("0.01")
+
+COLUMNS = {
+    "fecha": "date", "date": "date", "fecha_movimiento": "date",
+    "monto": "amount", "valor": "amount", "amount": "amount", "credito": "amount", "abono": "amount",
+    "referencia": "reference", "reference": "reference", "descripcion": "reference",
+    "description": "reference", "concepto": "reference", "detalle": "reference",
+}
+REQUIRED = ("date", "amount")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y")
+# "Compra #12", "ref 12", "pedido 12" o una referencia solo numérica
+REFERENCE_RE = re.compile(r"(?:compra|ref(?:erencia)?|pedido)\s*[:#.-]?\s*(\d+)|#\s*(\d+)|^\s*(\d+)\s*$", re.I)
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return text.strip().lower().replace(" ", "_")
+
+
+def parse_amount(value):
+    """Acepta 1234.56, 1,234.56, 1.234,56 y $ 1.234 (separador de miles)."""
+    text = re.sub(r"[^\d,.\-]", "", str(value or ""))
+    if "," in text and "." in text:
+        decimal_sep = "," if text.rfind(",") > text.rfind(".") else "."
+        thousands = "." if decimal_sep == "," else ","
+        text = text.replace(thousands, "").replace(decimal_sep, ".")
+    elif "," in text:
+        head, _, tail = text.rpartition(",")
+        text = head.replace(",", "") + ("." if len(tail) != 3 else "") + tail
+    elif text.count(".") > 1 or (text.count(".") == 1 and len(text.rpartition(".")[2]) == 3):
+        text = text.replace(".", "")
+    try:
+        amount = Decimal(text).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"Monto inválido: {value!r}")
+    if amount <= 0:
+        raise ValueError(f"El movimiento no es un abono: {value!r}")
+    return amount
+
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    text = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: {value!r}")
+
+
+def parse_reference(text):
+    match = REFERENCE_RE.search(str(text or ""))
+    if not match:
+        return None
+    return int(next(group for group in match.groups() if group))
+
+
+def iter_statement(fileobj):
+    """Recorre el extracto CSV línea a línea: (línea, fecha, monto, texto, error)."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("El extracto está vacío.")
+    fields = [COLUMNS.get(_normalize(name)) for name in header]
+    missing = [name for name in REQUIRED if name not in fields]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}.")
+
+    for line, values in enumerate(reader, start=2):
+        if not any(v.strip() for v in values):
+            continue
+        data = {field: value for field, value in zip(fields, values) if field}
+        reference = data.get("reference", "")
+        try:
+            yield line, parse_date(data.get("date")), parse_amount(data.get("amount")), reference, None
+        except ValueError as e:
+            yield line, None, None, reference, str(e)
+
+
+class PendingIndex:
+    """
+    Índice en memoria de los pagos pendientes por monto. Cada búsqueda
+    revisa solo los pagos con el mismo monto y descarta los que ya fueron
+    asignados a otra línea del extracto.
+    """
+
+    def __init__(self, payments):
+        self.by_amount = defaultdict(list)
+        for payment in payments:
+            self.by_amount[payment.amount.quantize(CENT)].append(payment)
+        self.used = set()
+
+    def match(self, day, amount, purchase_id=None):
+        """Devuelve (pago, criterio) o (None, motivo)."""
+        candidates = [
+            p for p in self.by_amount.get(amount, [])
+            if p.id not in self.used and abs(p.payment_date - day) <= DATE_WINDOW
+        ]
+        referenced = [p for p in candidates if purchase_id is not None and p.purchase_id == purchase_id]
+        if referenced:
+            candidates, reason = referenced, "Referencia, monto y fecha"
+        elif purchase_id is not None:
+            reason = "Monto y fecha (la referencia no coincide)"
+        else:
+            reason = "Monto y fecha"
+        if not candidates:
+            return None, "Sin pago pendiente con ese monto y fecha"
+        if len(candidates) > 1 and not referenced:
+            return None, f"Ambiguo: {len(candidates)} pagos pendientes con ese monto y fecha"
+        payment = min(candidates, key=lambda p: (abs(p.payment_date - day), p.id))
+        self.used.add(payment.id)
+        return payment, reason
+
+
+def match_statement(fileobj):
+    """Propone una conciliación: lista de líneas con su pago candidato (o motivo)."""
+    pending = Payment.objects.filter(is_validated=False).select_related("purchase__client")
+    index = PendingIndex(pending)
+    results = []
+    for line, day, amount, reference, error in iter_statement(fileobj):
+        row = {"line": line, "date": day, "amount": amount, "reference": reference, "payment": None, "reason": error}
+        if error is None:
+            row["payment"], row["reason"] = index.match(day, amount, parse_reference(reference))
+        results.append(row)
+    return results
+
+
+def validate_payments(payment_ids):
+    """
+    Valida en una sola transacción los pagos pendientes indicados. Los
+    totales, el resumen diario y el estado de los lotes se recalculan una
+    vez por compra afectada, no por pago. Devuelve la cantidad validada.
+    """
+    with transaction.atomic():
+        pending = Payment.objects.select_for_update().filter(id__in=payment_ids, is_validated=False)
+        rows = list(pending.values_list("id", "purchase_id", "payment_date"))
+        if not rows:
+            return 0
+        Payment.objects.filter(id__in=[row[0] for row in rows]).update(is_validated=True)
+        purchase_ids = {row[1] for row in rows}
+        refresh_purchase_totals(purchase_ids)
+        recompute_lot_statuses(purchase_ids)
+        refresh_days_on_commit({row[2] for row in rows})
+    return len(rows)
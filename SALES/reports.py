@@ -0,0 +1,267 @@
+import csv
+import hashlib
+import io
+import json
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, DecimalField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from PROJECT_INFO.versions import INVENTORY, SALES, USERS, get_versions
+from .models import Payment, Purchase
+
+REPORTS_DIR = "reports"
+# Subir cuando cambie el formato de los reportes para invalidar los guardados
+REPORT_VERSION = 1
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+GROUPINGS = {
+    "payment": "Detalle de pagos",
+    "day": "Día",
+    "week": "Semana",
+    "month": "Mes",
+    "stage": "Etapa",
+    "client": "Cliente",
+}
+FORMATS = {
+    "pdf": "application/pdf",
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Versiones de datos de las que depende cada agrupación (ver PROJECT_INFO.versions).
+# Ventas cubre pagos, compras y sus lotes; usuarios, los nombres de los
+# clientes; inventario, las etapas y los precios con que se reparte el recaudo.
+REPORT_SOURCES = {
+    "payment": (SALES, USERS),
+    "client": (SALES, USERS),
+    "stage": (SALES, INVENTORY),
+}
+
+
+class ReportError(ValueError):
+    pass
+
+
+def month_range(day):
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def parse_report_params(params, today=None):
+    """
+    Valida start/end (AAAA-MM-DD), group y format. Sin fechas se usa el
+    mes en curso, igual que el antiguo reporte mensual.
+    """
+    today = today or timezone.localdate()
+    start, end = month_range(today)
+    try:
+        if params.get("start"):
+            start = date.fromisoformat(params["start"])
+        if params.get("end"):
+            end = date.fromisoformat(params["end"])
+    except ValueError:
+        raise ReportError("Fecha inválida; usa el formato AAAA-MM-DD.")
+    if end < start:
+        raise ReportError("La fecha final es anterior a la inicial.")
+    group = params.get("group") or "payment"
+    if group not in GROUPINGS:
+        raise ReportError("Agrupación inválida.")
+    fmt = params.get("format") or "pdf"
+    if fmt not in FORMATS:
+        raise ReportError("Formato inválido.")
+    return {"start": start, "end": end, "group": group, "format": fmt}
+
+
+def validated_payments(start, end):
+    return Payment.objects.filter(is_validated=True, payment_date__range=(start, end))
+
+
+def _stage_rows(payments):
+    """
+    Recaudo por etapa. El recaudo se suma por compra en la base de datos y
+    se reparte entre los lotes de cada compra en proporción a su precio
+    (por partes iguales si todos valen 0), así la suma por etapas coincide
+    con el total.
+    """
+    by_purchase = {
+        row["purchase_id"]: (row["count"], row["total"])
+        for row in payments.values("purchase_id").annotate(count=Count("id"), total=Sum("amount")).order_by()
+    }
+    lots = defaultdict(list)
+    for purchase_id, stage, price in Purchase.lots.through.objects.filter(
+        purchase_id__in=list(by_purchase)
+    ).values_list("purchase_id", "lot__stage__name", "lot__price"):
+        lots[purchase_id].append((stage, price or Decimal("0")))
+
+    counts, totals = Counter(), defaultdict(Decimal)
+    for purchase_id, (count, total) in by_purchase.items():
+        shares = lots.get(purchase_id) or [(None, Decimal("0"))]
+        lot_total = sum(price for _, price in shares)
+        for stage in {stage for stage, _ in shares}:
+            counts[stage] += count
+        for stage, price in shares:
+            weight = price / lot_total if lot_total > 0 else Decimal("1") / len(shares)
+            totals[stage] += total * weight
+
+    return [
+        {"key": stage or "", "label": stage or "Sin etapa", "count": counts[stage],
+         "total": totals[stage].quantize(Decimal("0.01"))}
+        for stage in sorted(totals, key=lambda name: name or "")
+    ]
+
+
+def report_rows(payments, group):
+    """Filas del reporte calculadas con agregados en la base de datos."""
+    if group == "payment":
+        rows = payments.select_related("purchase__client").order_by("payment_date", "id")
+        for p in rows.iterator():
+            client = p.purchase.client
+            yield {
+                "key": p.id,
+                "label": f"{p.payment_date:%d/%m/%Y} - {client.get_full_name() or client.email} - Compra #{p.purchase_id}",
+                "count": 1,
+                "total": p.amount,
+            }
+        return
+    if group == "stage":
+        yield from _stage_rows(payments)
+        return
+
+    if group == "client":
+        rows = (
+            payments.values("purchase__client_id")
+            .annotate(
+                first_name=Max("purchase__client__first_name"),
+                last_name=Max("purchase__client__last_name"),
+                email=Max("purchase__client__email"),
+                count=Count("id"),
+                total=Sum("amount"),
+            )
+            .order_by("-total", "purchase__client_id")
+        )
+        for row in rows:
+            name = f"{row['first_name']} {row['last_name']}".strip() or row["email"]
+            yield {"key": row["purchase__client_id"], "label": name, "count": row["count"], "total": row["total"]}
+        return
+
+    period = {"day": F("payment_date"), "week": TruncWeek("payment_date"), "month": TruncMonth("payment_date")}[group]
+    label = {"day": "%d/%m/%Y", "week": "Semana del %d/%m/%Y", "month": "%m/%Y"}[group]
+    rows = payments.annotate(period=period).values("period").annotate(count=Count("id"), total=Sum("amount")).order_by("period")
+    for row in rows:
+        yield {"key": row["period"].isoformat(), "label": row["period"].strftime(label), "count": row["count"], "total": row["total"]}
+
+
+def report_summary(payments):
+    summary = payments.aggregate(count=Count("id"), total=Coalesce(Sum("amount"), Value(Decimal("0")), output_field=MONEY), last_id=Max("id"))
+    summary["total"] = Decimal(summary["total"]).quantize(Decimal("0.01"))
+    return summary
+
+
+def _title(params):
+    return f"Reporte de ventas {params['start']:%d/%m/%Y} - {params['end']:%d/%m/%Y}"
+
+
+def render_pdf(params, rows, summary):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(190, 10, txt=_title(params), ln=True, align='C')
+    pdf.set_font("Arial", size=10)
+    pdf.cell(190, 8, txt=f"Agrupado por: {GROUPINGS[params['group']]}", ln=True, align='C')
+    pdf.ln(6)
+
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(130, 10, GROUPINGS[params['group']], 1)
+    pdf.cell(25, 10, "Pagos", 1)
+    pdf.cell(35, 10, "Monto", 1)
+    pdf.ln()
+
+    pdf.set_font("Arial", size=10)
+    for row in rows:
+        label = str(row["label"]).encode("latin-1", "replace").decode("latin-1")
+        pdf.cell(130, 8, label[:65], 1)
+        pdf.cell(25, 8, str(row["count"]), 1)
+        pdf.cell(35, 8, f"${row['total']}", 1)
+        pdf.ln()
+
+    pdf.ln(5)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(130, 10, "TOTAL RECAUDADO:", 0)
+    pdf.cell(25, 10, str(summary["count"]), 0)
+    pdf.cell(35, 10, f"${summary['total']}", 0)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def render_csv(params, rows, summary):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([GROUPINGS[params["group"]], "Pagos", "Monto"])
+    for row in rows:
+        writer.writerow([row["label"], row["count"], row["total"]])
+    writer.writerow(["TOTAL", summary["count"], summary["total"]])
+    # BOM para que Excel detecte UTF-8
+    return ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+
+def render_xlsx(params, rows, summary):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Reporte")
+    sheet.append([_title(params)])
+    sheet.append([GROUPINGS[params["group"]], "Pagos", "Monto"])
+    for row in rows:
+        sheet.append([row["label"], row["count"], row["total"]])
+    sheet.append(["TOTAL", summary["count"], summary["total"]])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+RENDERERS = {"pdf": render_pdf, "csv": render_csv, "xlsx": render_xlsx}
+
+
+def report_filename(params):
+    return f"reporte_{params['start']:%Y%m%d}_{params['end']:%Y%m%d}_{params['group']}.{params['format']}"
+
+
+def _artifact_name(params, summary):
+    # La huella del periodo (cantidad, total y último id de pagos validados)
+    # no ve ediciones que la conservan (un pago movido a otra compra, un
+    # cliente renombrado, montos que se compensan): se suman las versiones
+    # de datos de la agrupación, a costa de regenerar también tras
+    # escrituras ajenas al periodo.
+    keys = REPORT_SOURCES.get(params["group"], (SALES,))
+    versions = {key: version for key, (version, _) in get_versions(*keys).items()}
+    raw = json.dumps(
+        {**params, "summary": summary, "versions": versions, "version": REPORT_VERSION}, sort_keys=True, default=str
+    )
+    return f"{REPORTS_DIR}/{hashlib.sha256(raw.encode()).hexdigest()}.{params['format']}"
+
+
+def generate_report(params, today=None, storage=default_storage):
+    """
+    Devuelve el contenido del reporte en el formato pedido. Los periodos
+    cerrados (que terminan antes de hoy) se guardan en el storage con una
+    clave derivada de sus datos y se reutilizan mientras no cambien.
+    """
+    today = today or timezone.localdate()
+    payments = validated_payments(params["start"], params["end"])
+    summary = report_summary(payments)
+    name = _artifact_name(params, summary) if params["end"] < today else None
+    if name and storage.exists(name):
+        with storage.open(name, "rb") as fh:
+            return fh.read()
+
+    content = RENDERERS[params["format"]](params, report_rows(payments, params["group"]), summary)
+    if name:
+        storage.save(name, ContentFile(content))
+    return content
@@ -0,0 +1,37 @@
+from django.db import transaction
+
+from LOTES.inventory import SNAPSHOT_FIELDS, apply_lot_changes
+from LOTES.models import Lot
+from PROJECT_INFO.versions import INVENTORY, bump_version
+from .models import Purchase
+
+
+class LotUnavailable(Exception):
+    pass
+
+
+def reserve_lot(client, lot_id):
+    """
+    Reserva un lote para `client` y crea su compra.
+
+    El lote se reclama con un UPDATE condicional (status='AVAILABLE'): la
+    base de datos garantiza que solo una transacción lo consigue, sin
+    bloqueos previos ni lectura-luego-escritura. Los agregados del
+    inventario (filas muy compartidas) se actualizan después del commit
+    para no alargar la transacción que compite por el lote.
+    """
+    with transaction.atomic():
+        claimed = Lot.objects.filter(id=lot_id, status="AVAILABLE").update(status="RESERVED")
+        if not claimed:
+            raise LotUnavailable(lot_id)
+        after = Lot.objects.values(*SNAPSHOT_FIELDS).get(id=lot_id)
+        purchase = Purchase.objects.create(client=client, total_amount=after["price"])
+        Purchase.lots.through.objects.create(purchase=purchase, lot_id=lot_id)
+        transaction.on_commit(lambda: _inventory_changed(dict(after, status="AVAILABLE"), after))
+    return purchase
+
+
+def _inventory_changed(before, after):
+    with transaction.atomic():
+        apply_lot_changes([(before, after)])
+        bump_version(INVENTORY)
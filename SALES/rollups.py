@@ -0,0 +1,171 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.utils import timezone
+
+from PROJECT_INFO.timeseries import touch_series
+from PROJECT_INFO.versions import SALES, SERIES, bump_version
+from .models import DailySales, Payment, Purchase
+
+CENT = Decimal("0.01")
+BACKFILL_DAYS = 31
+
+
+def _allocate(amount, shares):
+    """
+    Reparte `amount` entre [(stage_id, precio)] en proporción al precio
+    (por partes iguales si todos valen 0). El último recibe el redondeo
+    para que la suma sea exacta.
+    """
+    total = sum(price for _, price in shares)
+    parts, assigned = [], Decimal("0")
+    for index, (stage_id, price) in enumerate(shares):
+        if index == len(shares) - 1:
+            part = amount - assigned
+        else:
+            weight = price / total if total > 0 else Decimal("1") / len(shares)
+            part = (amount * weight).quantize(CENT, rounding=ROUND_HALF_UP)
+        assigned += part
+        parts.append((stage_id, part))
+    return parts
+
+
+def _primary_stage(shares):
+    # La compra se cuenta una sola vez, en la etapa de su lote más caro
+    if not shares:
+        return None
+    return max(shares, key=lambda share: share[1])[0]
+
+
+def compute_days(days):
+    """Filas de DailySales de los días indicados, calculadas desde cero."""
+    days = set(days)
+    cells = defaultdict(lambda: {"payment_count": 0, "amount": Decimal("0"), "purchase_count": 0, "lots_sold": 0})
+
+    payments = list(
+        Payment.objects.filter(payment_date__in=days).values_list("payment_date", "purchase_id", "amount", "is_validated")
+    )
+    purchases = list(
+        Purchase.objects.filter(created_at__date__in=days).values_list("id", "created_at", "is_validated")
+    )
+    shares = defaultdict(list)
+    purchase_ids = {p[1] for p in payments} | {p[0] for p in purchases}
+    for purchase_id, stage_id, price in (
+        Purchase.lots.through.objects.filter(purchase_id__in=purchase_ids)
+        .order_by("lot_id")
+        .values_list("purchase_id", "lot__stage_id", "lot__price")
+    ):
+        shares[purchase_id].append((stage_id, price or Decimal("0")))
+
+    for day, purchase_id, amount, validated in payments:
+        for stage_id, part in _allocate(amount, shares.get(purchase_id) or [(None, Decimal("0"))]):
+            cell = cells[(day, stage_id, validated)]
+            cell["amount"] += part
+        # El pago cuenta una vez, en la etapa principal de la compra
+        cells[(day, _primary_stage(shares.get(purchase_id)), validated)]["payment_count"] += 1
+
+    for purchase_id, created_at, validated in purchases:
+        day = timezone.localdate(created_at)
+        lots = shares.get(purchase_id, [])
+        cells[(day, _primary_stage(lots), validated)]["purchase_count"] += 1
+        for stage_id, _ in lots:
+            cells[(day, stage_id, validated)]["lots_sold"] += 1
+
+    return [
+        DailySales(date=day, stage_id=stage_id, validated=validated, **values)
+        for (day, stage_id, validated), values in cells.items()
+    ]
+
+
+def refresh_days(days):
+    """
+    Recalcula el resumen de los días indicados (borra y vuelve a insertar).
+    Incrementar la versión de ventas primero bloquea su fila hasta el
+    commit, así dos recálculos del mismo día no se pisan.
+    """
+    days = {day for day in days if day is not None}
+    if not days:
+        return 0
+    with transaction.atomic():
+        bump_version(SALES)
+        touch_series(days)
+        rows = compute_days(days)
+        DailySales.objects.filter(date__in=days).delete()
+        DailySales.objects.bulk_create(rows)
+    return len(rows)
+
+
+def refresh_days_on_commit(days):
+    """Programa refresh_days para después del commit (fuera de la transacción de escritura)."""
+    days = set(days)
+    transaction.on_commit(lambda: refresh_days(days))
+
+
+def purchase_days(purchase_ids):
+    """Días cuyo resumen depende de las compras indicadas."""
+    days = set(
+        Payment.objects.filter(purchase_id__in=purchase_ids).values_list("payment_date", flat=True).distinct()
+    )
+    for created_at in Purchase.objects.filter(id__in=purchase_ids).values_list("created_at", flat=True):
+        days.add(timezone.localdate(created_at))
+    return days
+
+
+def refresh_purchases_on_commit(purchase_ids):
+    refresh_days_on_commit(purchase_days(purchase_ids))
+
+
+def data_range():
+    """Primer y último día con pagos o compras (None, None si no hay datos)."""
+    payments = Payment.objects.aggregate(first=Min("payment_date"), last=Max("payment_date"))
+    purchases = Purchase.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+    firsts = [d for d in (payments["first"], purchases["first"] and timezone.localdate(purchases["first"])) if d]
+    lasts = [d for d in (payments["last"], purchases["last"] and timezone.localdate(purchases["last"])) if d]
+    if not firsts:
+        return None, None
+    return min(firsts), max(lasts)
+
+
+def rebuild_rollups(chunk_days=BACKFILL_DAYS):
+    """Reconstruye todo el resumen por bloques de días. Devuelve las filas creadas."""
+    first, last = data_range()
+    created = 0
+    with transaction.atomic():
+        bump_version(SALES, SERIES)
+        DailySales.objects.all().delete()
+        day = first
+        while day is not None and day <= last:
+            chunk = [day + timedelta(days=i) for i in range(chunk_days)]
+            rows = compute_days([d for d in chunk if d <= last])
+            DailySales.objects.bulk_create(rows, batch_size=1000)
+            created += len(rows)
+            day = chunk[-1] + timedelta(days=1)
+    return created
+
+
+def daily_series(start=None, end=None, period=None, **filters):
+    """
+    Serie temporal leída del resumen: lista de {bucket, payment_count,
+    amount, purchase_count, lots_sold}. `period` es una función de truncado
+    (TruncWeek, TruncMonth...) o None para días; `filters` se aplica a
+    DailySales (stage_id=..., validated=...).
+    """
+    queryset = DailySales.objects.filter(**filters)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return list(
+        queryset.annotate(bucket=period("date") if period else F("date"))
+        .values("bucket")
+        .annotate(
+            payment_count=Sum("payment_count"),
+            amount=Sum("amount"),
+            purchase_count=Sum("purchase_count"),
+            lots_sold=Sum("lots_sold"),
+        )
+        .order_by("bucket")
+    )
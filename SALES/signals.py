@@ -1,8 +1,130 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Payment
+from django.utils import timezone
+
+from LOTES.models import Lot
+from PROJECT_INFO.summaries import refresh_client_summaries_on_commit
+from PROJECT_INFO.versions import SALES, bump_version
+from .balances import refresh_purchase_totals
+from .models import InstallmentPlan, Payment, Purchase
+from .receipts import delete_receipt_files
+from .rollups import refresh_days_on_commit, refresh_purchases_on_commit
+
+
+def _refresh_clients_of(purchase_ids):
+    purchase_ids = set(purchase_ids) - {None}
+    if purchase_ids:
+        refresh_client_summaries_on_commit(
+            Purchase.objects.filter(id__in=purchase_ids).values_list("client_id", flat=True).distinct()
+        )
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_purchase(sender, instance, **kwargs):
+    # Si el pago cambia de compra (o de fecha) hay que recalcular también la anterior
+    instance._previous_purchase_id = instance._previous_date = None
+    if instance.pk:
+        previous = Payment.objects.filter(pk=instance.pk).values_list("purchase_id", "payment_date").first()
+        if previous:
+            instance._previous_purchase_id, instance._previous_date = previous
 
 
 @receiver(post_save, sender=Payment)
-def noop_payment_signal(sender, instance, created, **kwargs):
-    return
+def update_purchase_totals(sender, instance, created, raw=False, **kwargs):
+    purchase_ids = {instance.purchase_id, getattr(instance, "_previous_purchase_id", None)} - {None}
+    refresh_purchase_totals(purchase_ids)
+    if not raw:
+        refresh_days_on_commit({instance.payment_date, getattr(instance, "_previous_date", None)})
+        _refresh_clients_of(purchase_ids)
+
+
+@receiver(post_delete, sender=Payment)
+def update_purchase_totals_on_delete(sender, instance, **kwargs):
+    refresh_purchase_totals([instance.purchase_id])
+    refresh_days_on_commit({instance.payment_date})
+    # Si se borra la compra completa, su propia señal actualiza al cliente
+    _refresh_clients_of([instance.purchase_id])
+
+
+@receiver(pre_delete, sender=Payment)
+def delete_payment_receipt(sender, instance, **kwargs):
+    # La clave se lee de la base: la instancia puede no tenerla al día
+    key = Payment.objects.filter(pk=instance.pk).values_list("receipt_key", flat=True).first()
+    if key:
+        transaction.on_commit(lambda: delete_receipt_files(key))
+
+
+@receiver(pre_save, sender=Purchase)
+def remember_purchase_client(sender, instance, raw=False, **kwargs):
+    # Si la compra cambia de cliente, el resumen del anterior también cambia
+    instance._previous_client_id = None
+    if instance.pk and not raw:
+        instance._previous_client_id = Purchase.objects.filter(pk=instance.pk).values_list("client_id", flat=True).first()
+
+
+@receiver(post_save, sender=Purchase)
+def update_purchase_balance(sender, instance, created, raw=False, **kwargs):
+    # save() sobrescribe los totales con los valores en memoria; se
+    # recalculan para no pisar pagos registrados mientras tanto.
+    if not created and not raw:
+        refresh_purchase_totals([instance.pk])
+    if not raw:
+        refresh_days_on_commit({timezone.localdate(instance.created_at)})
+        refresh_client_summaries_on_commit({instance.client_id, getattr(instance, "_previous_client_id", None)} - {None})
+
+
+@receiver(post_delete, sender=Purchase)
+def update_rollups_on_purchase_delete(sender, instance, **kwargs):
+    refresh_days_on_commit({timezone.localdate(instance.created_at)})
+    refresh_client_summaries_on_commit([instance.client_id])
+
+
+@receiver(post_save, sender=InstallmentPlan)
+@receiver(post_delete, sender=InstallmentPlan)
+def bump_sales_version_on_plan_change(sender, instance, **kwargs):
+    # Los planes no entran en el resumen diario, pero sí en la proyección de cartera
+    bump_version(SALES)
+
+
+@receiver(m2m_changed, sender=Purchase.lots.through)
+def update_rollups_on_lots_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Los lotes de una compra definen su etapa y el reparto de sus pagos
+    if reverse and action == "pre_clear":
+        # post_clear no trae pk_set: las compras del lote se leen antes de vaciarlo
+        instance._cleared_purchase_ids = set(
+            sender.objects.filter(lot_id=instance.pk).values_list("purchase_id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        purchase_ids = pk_set or set()
+        if action == "post_clear":
+            purchase_ids = getattr(instance, "_cleared_purchase_ids", set())
+    else:
+        purchase_ids = [instance.pk]
+    refresh_purchases_on_commit(purchase_ids)
+    # Cambia la cantidad de lotes en el resumen del cliente
+    if reverse:
+        _refresh_clients_of(purchase_ids)
+    else:
+        refresh_client_summaries_on_commit([instance.client_id])
+
+
+@receiver(pre_save, sender=Lot)
+def remember_lot_sales_fields(sender, instance, raw=False, **kwargs):
+    # LOTES.signals ya cargó el estado previo del lote en instance._snapshot
+    previous = getattr(instance, "_snapshot", None)
+    instance._sales_fields_changed = bool(previous) and (
+        previous["stage_id"] != instance.stage_id or previous["price"] != instance.price
+    )
+
+
+@receiver(post_save, sender=Lot)
+def update_rollups_on_lot_change(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, "_sales_fields_changed", False):
+        return
+    refresh_purchases_on_commit(
+        Purchase.lots.through.objects.filter(lot_id=instance.pk).values_list("purchase_id", flat=True)
+    )
@@ -1,3 +1,673 @@
-from django.test import TestCase
+import calendar
+import io
+import random
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.storage import InMemoryStorage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count, Sum
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from LOTES.models import Lot, LotCluster, LotFacetCell, Stage
+from .autocomplete import search_clients, search_lots
+from .cashflow import AGING_BUCKETS, PlanColumns, portfolio_projection, project
+from .listing import admin_list_page
+from .idempotency import KEY_TTL, find_key
+from .models import DailySales, IdempotencyKey, InstallmentPlan, Payment, Purchase
+from .receipts import RECEIPT_KINDS, ensure_receipt, receipt_data, receipt_key, receipt_name
+from .reconciliation import validate_payments
+from .rollups import rebuild_rollups
+from .reports import generate_report
+from .reservations import LotUnavailable, reserve_lot
+
+
+def make_client(username="cliente", **extra):
+    extra.setdefault("email", f"{username}@example.com")
+    return get_user_model().objects.create_user(username=username, password="x", role="CLIENT", **extra)
+
+
+class KeysetDatetimeTests(TestCase):
+    """Paginación por keyset sobre created_at (orden "date" del listado de compras)."""
+
+    def setUp(self):
+        self.client_user = make_client()
+        self.ids = [
+            Purchase.objects.create(client=self.client_user, total_amount=Decimal("100")).id
+            for _ in range(6)
+        ]
+
+    def set_times(self, step):
+        # Base con microsegundos: el cursor no puede redondear a milisegundos
+        base = timezone.now().replace(microsecond=123456)
+        for index, purchase_id in enumerate(self.ids):
+            Purchase.objects.filter(id=purchase_id).update(created_at=base + index * step)
+
+    def walk(self, ordering):
+        seen, cursor = [], None
+        for _ in range(len(self.ids) + 1):
+            rows, cursor = admin_list_page(Purchase.objects.all(), ordering, cursor, limit=2)
+            seen.extend(row.id for row in rows)
+            if cursor is None:
+                return seen
+        self.fail(f"La paginación no terminó: {seen}")
+
+    def test_rows_one_millisecond_apart(self):
+        self.set_times(timedelta(milliseconds=1))
+        self.assertEqual(self.walk(["created_at", "id"]), self.ids)
+        self.assertEqual(self.walk(["-created_at", "-id"]), self.ids[::-1])
+
+    def test_rows_within_the_same_millisecond(self):
+        self.set_times(timedelta(microseconds=7))
+        self.assertEqual(self.walk(["created_at", "id"]), self.ids)
+        self.assertEqual(self.walk(["-created_at", "-id"]), self.ids[::-1])
+
+
+class AutocompleteTests(TestCase):
+    """Los autocompletados del admin no distinguen mayúsculas."""
+
+    def setUp(self):
+        self.mcdonald = make_client("mcdonald", first_name="Ronald", last_name="McDonald")
+        self.ana = make_client("ana", email="Ana.Perez@Example.COM", first_name="Ana", last_name="Pérez")
+        stage = Stage.objects.create(name="Preventa", description="")
+        self.lot = Lot.objects.create(code="AB-12", stage=stage, area_m2=100, price=1000, latitude=10, longitude=-75)
+
+    def client_ids(self, q):
+        return [row["id"] for row in search_clients(q)]
+
+    def test_name_prefix_ignores_case(self):
+        for q in ("mcd", "McD", "MCDON", "ron mcd"):
+            self.assertEqual(self.client_ids(q), [self.mcdonald.id], q)
+
+    def test_mixed_case_email(self):
+        for q in ("ana.perez@example.com", "ANA.PEREZ@", "Ana.P"):
+            self.assertEqual(self.client_ids(q), [self.ana.id], q)
+
+    def test_lot_code_ignores_case(self):
+        for q in ("ab-1", "Ab-12", "AB"):
+            self.assertEqual([row["id"] for row in search_lots(q)], [self.lot.id], q)
+
+
+def make_lot(code="A-1", stage=None, **extra):
+    stage = stage or Stage.objects.create(name="Preventa", description="")
+    values = {"area_m2": 100, "price": 1000, "latitude": 10, "longitude": -75, **extra}
+    return Lot.objects.create(code=code, stage=stage, **values)
+
+
+class ReserveLotTests(TestCase):
+    def setUp(self):
+        self.lot = make_lot()
+        self.first, self.second = make_client("uno"), make_client("dos")
+
+    def test_second_reservation_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = reserve_lot(self.first, self.lot.id)
+        with self.assertRaises(LotUnavailable):
+            reserve_lot(self.second, self.lot.id)
+
+        self.lot.refresh_from_db()
+        self.assertEqual(self.lot.status, "RESERVED")
+        self.assertEqual(list(Purchase.objects.filter(lots=self.lot)), [purchase])
+        self.assertEqual((purchase.client, purchase.total_amount), (self.first, Decimal("1000")))
+        # Los agregados del inventario se ajustan después del commit
+        self.assertEqual(
+            list(LotFacetCell.objects.filter(count__gt=0).values_list("status", "count")), [("RESERVED", 1)]
+        )
+        self.assertTrue(LotCluster.objects.filter(reserved=1, available=0).exists())
+
+
+class ReservationRaceTests(TransactionTestCase):
+    """Varios hilos compiten por el mismo lote: como mucho uno lo consigue."""
+
+    def test_concurrent_reservations_sell_the_lot_once(self):
+        lot = make_lot()
+        clients = [make_client(f"cliente{i}") for i in range(8)]
+        barrier = threading.Barrier(len(clients))
+        outcomes = []
+
+        def attempt(client):
+            barrier.wait()
+            try:
+                reserve_lot(client, lot.id)
+                outcomes.append("won")
+            except LotUnavailable:
+                outcomes.append("lost")
+            except OperationalError:
+                # SQLite puede rechazar escrituras concurrentes ("database is locked")
+                outcomes.append("error")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(outcomes), len(clients))
+        self.assertLessEqual(outcomes.count("won"), 1)
+        purchases = Purchase.objects.filter(lots=lot).count()
+        self.assertLessEqual(purchases, 1)
+        self.assertEqual(Lot.objects.get(id=lot.id).status, "RESERVED" if purchases else "AVAILABLE")
+        if connection.vendor == "postgresql":
+            self.assertEqual(sorted(outcomes), ["lost"] * (len(clients) - 1) + ["won"])
+
+    def test_benchmark_command(self):
+        # Un solo hilo: en SQLite los hilos chocan con "database is locked"
+        out = io.StringIO()
+        call_command("benchmark_reservations", lots=3, clients=4, attempts=30, threads=1, stdout=out)
+        self.assertIn("Sin ventas dobles.", out.getvalue())
+        self.assertFalse(Lot.objects.filter(code__startswith="BENCH-").exists())
+
+    def test_benchmark_reports_won_reserved_mismatch(self):
+        # Una "reserva" que no reserva nada: ganadas != reservados, sin ventas dobles
+        with mock.patch("SALES.management.commands.benchmark_reservations.reserve_lot"):
+            with self.assertRaisesMessage(CommandError, "Reservas ganadas (5) distintas de lotes reservados (0)."):
+                call_command("benchmark_reservations", lots=2, clients=2, attempts=5, threads=2, stdout=io.StringIO())
+
+
+class IdempotentPaymentTests(TestCase):
+    """Un reenvío con la misma clave devuelve el pago original."""
+
+    KEY = "clave-de-prueba-0001"
+
+    def setUp(self):
+        self.user = make_client()
+        self.purchase = Purchase.objects.create(client=self.user, total_amount=Decimal("1000"))
+        self.client.force_login(self.user)
+        self.url = reverse("register_payment", args=[self.purchase.id])
+
+    def post(self, amount="100", key=KEY):
+        return self.client.post(self.url, {"amount": amount, "idempotency_key": key}, follow=True)
+
+    def messages(self, response):
+        return [str(message) for message in response.context["messages"]]
+
+    def test_resubmission_replays_the_original_payment(self):
+        self.post()
+        payment = Payment.objects.get()
+        # El reenvío no se vuelve a validar: el monto ya excede el saldo
+        response = self.post(amount="5000")
+        self.assertRedirects(response, reverse("purchase_detail", args=[self.purchase.id]))
+        self.assertIn(f"El pago #{payment.id} ya había sido registrado.", self.messages(response))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_other_key_registers_another_payment(self):
+        self.post()
+        self.post(key="otra-clave-0002")
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_expired_key_is_reused(self):
+        self.post()
+        IdempotencyKey.objects.update(created_at=timezone.now() - KEY_TTL - timedelta(minutes=1))
+        self.post()
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().payment, Payment.objects.latest("id"))
+
+    def test_concurrent_submission_loses_on_unique_key(self):
+        # Otro envío con la misma clave confirma entre find_key y remember_key
+        self.post()
+        first = Payment.objects.get()
+        with mock.patch("SALES.views.find_key", side_effect=[None, find_key(self.user, self.KEY)]):
+            response = self.post()
+        self.assertIn(f"El pago #{first.id} ya había sido registrado.", self.messages(response))
+        # El pago del envío perdedor se revirtió con la transacción
+        self.assertEqual(list(Payment.objects.all()), [first])
+
+    def test_conflict_without_previous_submission_rerenders_form(self):
+        # La restricción falla pero no queda una clave vigente que devolver
+        admin = get_user_model().objects.create_user(username="admin", password="x", role="ADMIN")
+        cases = [
+            (self.user, self.url, {"amount": "100", "idempotency_key": self.KEY}),
+            (admin, reverse("admin_payment_create"),
+             {"purchase": self.purchase.id, "amount": "100", "idempotency_key": self.KEY}),
+        ]
+        for user, url, data in cases:
+            self.client.force_login(user)
+            with mock.patch("SALES.views.remember_key", side_effect=IntegrityError):
+                response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.context["error"], "No se pudo registrar el pago. Intenta de nuevo.")
+            self.assertEqual(response.context["idempotency_key"], self.KEY)
+        self.assertFalse(Payment.objects.exists())
+
+
+class ValidatePaymentsTests(TestCase):
+    """validate_payments recalcula totales, estado de los lotes y resumen diario."""
+
+    def setUp(self):
+        stage = Stage.objects.create(name="Preventa", description="")
+        self.big = make_lot("A-1", stage, price=600)
+        self.small = make_lot("A-2", stage, price=400)
+        self.other = make_lot("B-1", stage, price=500)
+        client = make_client()
+        self.purchase = Purchase.objects.create(client=client, total_amount=Decimal("1000"))
+        self.purchase.lots.set([self.big, self.small])
+        self.second = Purchase.objects.create(client=client, total_amount=Decimal("500"))
+        self.second.lots.set([self.other])
+        Lot.objects.update(status="RESERVED")
+        self.payments = [
+            Payment.objects.create(purchase=self.purchase, amount=Decimal("400")),
+            Payment.objects.create(purchase=self.purchase, amount=Decimal("250")),
+            Payment.objects.create(purchase=self.second, amount=Decimal("500")),
+        ]
+
+    def statuses(self):
+        return dict(Lot.objects.values_list("code", "status"))
+
+    def totals(self, purchase):
+        purchase.refresh_from_db()
+        return purchase.paid_total, purchase.validated_total, purchase.balance
+
+    def test_validates_pending_and_recomputes(self):
+        first, second, third = self.payments
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(validate_payments([first.id, third.id]), 2)
+
+        self.assertEqual(self.totals(self.purchase), (Decimal("650"), Decimal("400"), Decimal("350")))
+        self.assertEqual(self.totals(self.second), (Decimal("500"), Decimal("500"), Decimal("0")))
+        # 400 validados cubren la parte del lote de 400, no la del de 600
+        self.assertEqual(self.statuses(), {"A-1": "RESERVED", "A-2": "SOLD", "B-1": "SOLD"})
+        today = timezone.localdate()
+        validated = DailySales.objects.filter(date=today, validated=True)
+        self.assertEqual(sum(row.amount for row in validated), Decimal("900"))
+        self.assertEqual(sum(row.payment_count for row in validated), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Ya validados: no se cuentan ni se recalcula nada
+            self.assertEqual(validate_payments([first.id, third.id]), 0)
+            self.assertEqual(validate_payments([second.id]), 1)
+        self.assertEqual(self.totals(self.purchase), (Decimal("650"), Decimal("650"), Decimal("350")))
+        # 650 alcanzan para el lote de 600; el de 400 queda reservado
+        self.assertEqual(self.statuses(), {"A-1": "SOLD", "A-2": "RESERVED", "B-1": "SOLD"})
+        self.assertEqual(
+            sum(DailySales.objects.filter(date=today, validated=True).values_list("amount", flat=True)),
+            Decimal("1150"),
+        )
+        self.assertFalse(DailySales.objects.filter(date=today, validated=False, amount__gt=0).exists())
+
+    def test_full_payment_sells_every_lot(self):
+        Payment.objects.create(purchase=self.purchase, amount=Decimal("350"))
+        validate_payments(Payment.objects.filter(purchase=self.purchase).values_list("id", flat=True))
+        self.assertEqual(self.totals(self.purchase), (Decimal("1000"), Decimal("1000"), Decimal("0")))
+        self.assertEqual(self.statuses(), {"A-1": "SOLD", "A-2": "SOLD", "B-1": "RESERVED"})
+
+    def test_unknown_ids(self):
+        self.assertEqual(validate_payments([]), 0)
+        self.assertEqual(validate_payments([999999]), 0)
+        self.assertFalse(Payment.objects.filter(is_validated=True).exists())
+
+
+class ReceiptKeyTests(TestCase):
+    """La clave del comprobante depende solo de sus datos y sigue sus cambios."""
+
+    def setUp(self):
+        self.user = make_client(first_name="Ana", last_name="Pérez")
+        self.purchase = Purchase.objects.create(client=self.user, total_amount=Decimal("1000"))
+        self.first = Payment.objects.create(purchase=self.purchase, amount=Decimal("400"))
+        self.second = Payment.objects.create(purchase=self.purchase, amount=Decimal("250"))
+        self.storage = InMemoryStorage()
+
+    def key(self, payment):
+        return receipt_key(receipt_data(Payment.objects.get(pk=payment.pk)))
+
+    def files(self, key):
+        return {kind for kind in RECEIPT_KINDS if self.storage.exists(receipt_name(key, kind))}
+
+    def test_key_is_deterministic(self):
+        data = receipt_data(self.first)
+        self.assertEqual((data["amount"], data["balance"]), ("400.00", "600.00"))
+        self.assertEqual(receipt_data(self.second)["balance"], "350.00")
+        self.assertEqual(receipt_key(data), receipt_key(dict(reversed(list(data.items())))))
+        self.assertEqual(receipt_key(data), self.key(self.first))
+        self.assertEqual(receipt_key(receipt_data(self.first, Decimal("600"))), receipt_key(data))
+
+    def test_key_follows_every_printed_field(self):
+        first, second = self.key(self.first), self.key(self.second)
+        # Un pago posterior no cambia el saldo de los anteriores
+        Payment.objects.create(purchase=self.purchase, amount=Decimal("100"))
+        self.assertEqual((self.key(self.first), self.key(self.second)), (first, second))
+
+        # El monto del primero cambia también el saldo impreso en el segundo
+        Payment.objects.filter(pk=self.first.pk).update(amount=Decimal("300"))
+        self.assertNotEqual(self.key(self.first), first)
+        self.assertNotEqual(self.key(self.second), second)
+
+        before = self.key(self.first)
+        self.user.first_name = "Ana María"
+        self.user.save()
+        self.assertNotEqual(self.key(self.first), before)
+
+    def test_ensure_receipt_regenerates_only_on_change(self):
+        key = ensure_receipt(self.first, storage=self.storage)
+        self.assertEqual(Payment.objects.get(pk=self.first.pk).receipt_key, key)
+        self.assertEqual(self.files(key), set(RECEIPT_KINDS))
+        with mock.patch.dict(RECEIPT_KINDS, {kind: (ct, mock.Mock(), name) for kind, (ct, _, name) in RECEIPT_KINDS.items()}):
+            self.assertEqual(ensure_receipt(Payment.objects.get(pk=self.first.pk), storage=self.storage), key)
+            self.assertFalse(any(build.called for _, build, _ in RECEIPT_KINDS.values()))
+
+        Payment.objects.filter(pk=self.first.pk).update(amount=Decimal("300"))
+        new_key = ensure_receipt(Payment.objects.get(pk=self.first.pk), storage=self.storage)
+        self.assertNotEqual(new_key, key)
+        self.assertEqual((self.files(key), self.files(new_key)), (set(), set(RECEIPT_KINDS)))
+
+    def test_admin_edit_keeps_key_written_meanwhile(self):
+        admin = get_user_model().objects.create_user(username="admin", password="x", role="ADMIN")
+        self.client.force_login(admin)
+
+        def generate_receipt_meanwhile(model, **lookup):
+            # Otro proceso genera el comprobante entre la lectura y el guardado
+            if model is Purchase:
+                ensure_receipt(Payment.objects.get(pk=self.first.pk), storage=self.storage)
+            return get_object_or_404(model, **lookup)
+
+        with mock.patch("SALES.views.get_object_or_404", side_effect=generate_receipt_meanwhile):
+            self.client.post(
+                reverse("admin_payment_edit", args=[self.first.id]),
+                {"purchase": self.purchase.id, "amount": "300"},
+            )
+        payment = Payment.objects.get(pk=self.first.pk)
+        self.assertEqual(payment.amount, Decimal("300"))
+        stored = payment.receipt_key
+        self.assertEqual(self.files(stored), set(RECEIPT_KINDS))
+        # La clave guardada es la del monto anterior: el próximo acceso regenera
+        self.assertNotEqual(stored, self.key(payment))
+        self.assertNotEqual(ensure_receipt(payment, storage=self.storage), stored)
+        self.assertEqual(self.files(stored), set())
+
+
+class ReportArtifactTests(TestCase):
+    """Los reportes de periodos cerrados se regeneran cuando cambian sus datos."""
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        self.ana = make_client("ana", first_name="Ana", last_name="Gómez")
+        self.bruno = make_client("bruno", first_name="Bruno", last_name="Díaz")
+        self.purchase = Purchase.objects.create(client=self.ana, total_amount=Decimal("1000"))
+        self.other = Purchase.objects.create(client=self.bruno, total_amount=Decimal("1000"))
+        self.payment = Payment.objects.create(purchase=self.purchase, amount=Decimal("300"), is_validated=True)
+        Payment.objects.filter(pk=self.payment.pk).update(payment_date=self.yesterday)
+        self.payment.refresh_from_db()
+
+    def report(self, group="payment"):
+        params = {"start": self.yesterday, "end": self.yesterday, "group": group, "format": "csv"}
+        return generate_report(params, today=self.today, storage=self.storage).decode("utf-8")
+
+    def artifacts(self):
+        return len(self.storage.listdir("reports")[1])
+
+    def test_closed_period_is_reused(self):
+        first = self.report()
+        with mock.patch.dict("SALES.reports.RENDERERS", {"csv": mock.Mock()}):
+            self.assertEqual(self.report(), first)
+        self.assertEqual(self.artifacts(), 1)
+
+    def test_moving_payment_to_another_client_regenerates(self):
+        self.assertIn("Ana Gómez", self.report())
+        self.assertIn("Ana Gómez", self.report("client"))
+        # Cantidad, total y último id del periodo no cambian
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.purchase = self.other
+            self.payment.save()
+        for group in ("payment", "client"):
+            content = self.report(group)
+            self.assertIn("Bruno Díaz", content)
+            self.assertNotIn("Ana Gómez", content)
+
+    def test_renaming_client_regenerates(self):
+        self.report("client")
+        self.ana.last_name = "Gómez Ruiz"
+        self.ana.save()
+        self.assertIn("Ana Gómez Ruiz", self.report("client"))
+
+    def test_offsetting_amount_edits_regenerate(self):
+        second = Payment.objects.create(purchase=self.other, amount=Decimal("200"), is_validated=True)
+        Payment.objects.filter(pk=second.pk).update(payment_date=self.yesterday)
+        second.refresh_from_db()
+        self.assertIn("Bruno Díaz,1,200", self.report("client"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.filter(pk=self.payment.pk).update(amount=Decimal("200"))
+            second.amount = Decimal("300")
+            second.save()
+        rows = self.report("client").splitlines()
+        self.assertTrue(rows[1].startswith("Bruno Díaz,1,300"), rows)
+        self.assertTrue(rows[2].startswith("Ana Gómez,1,200"), rows)
+
+
+class DailySalesRollupTests(TestCase):
+    """Cada fila del resumen diario coincide con un agregado directo de ese día."""
+
+    def setUp(self):
+        self.preventa = Stage.objects.create(name="Preventa", description="")
+        self.venta = Stage.objects.create(name="Venta", description="")
+        self.a = make_lot("A-1", self.preventa, price=600)
+        self.b = make_lot("B-1", self.venta, price=400)
+        self.c = make_lot("A-2", self.preventa, price=500)
+        self.user = make_client()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def rollup(self):
+        return {
+            (row.date, row.stage_id, row.validated): (row.payment_count, row.amount, row.purchase_count, row.lots_sold)
+            for row in DailySales.objects.all()
+        }
+
+    def assert_matches_direct(self):
+        rows = DailySales.objects.all()
+        for day in (self.yesterday, self.today):
+            for validated in (False, True):
+                cells = [row for row in rows if row.date == day and row.validated == validated]
+                payments = Payment.objects.filter(payment_date=day, is_validated=validated).aggregate(
+                    count=Count("id"), amount=Sum("amount")
+                )
+                self.assertEqual(sum(row.payment_count for row in cells), payments["count"])
+                self.assertEqual(sum(row.amount for row in cells), payments["amount"] or 0)
+                purchases = Purchase.objects.filter(created_at__date=day, is_validated=validated)
+                self.assertEqual(sum(row.purchase_count for row in cells), purchases.count())
+                # lots_sold: lotes de las compras creadas ese día, en la etapa de
+                # cada lote, sin importar el estado actual del lote
+                lots = dict(
+                    Purchase.lots.through.objects.filter(purchase__in=purchases)
+                    .values("lot__stage_id").annotate(n=Count("id")).values_list("lot__stage_id", "n")
+                )
+                self.assertEqual({row.stage_id: row.lots_sold for row in cells if row.lots_sold}, lots)
+
+    def test_rollup_follows_creates_edits_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mixed = Purchase.objects.create(client=self.user, total_amount=Decimal("1000"))
+            mixed.lots.set([self.a, self.b])
+            single = Purchase.objects.create(client=self.user, total_amount=Decimal("500"), is_validated=True)
+            single.lots.set([self.c])
+            pending = Payment.objects.create(purchase=mixed, amount=Decimal("500"))
+            validated = Payment.objects.create(purchase=single, amount=Decimal("100"), is_validated=True)
+        self.assert_matches_direct()
+        # El pago se reparte por precio entre las etapas y se cuenta en la del lote más caro
+        self.assertEqual(self.rollup()[(self.today, self.preventa.id, False)], (1, Decimal("300"), 1, 1))
+        self.assertEqual(self.rollup()[(self.today, self.venta.id, False)], (0, Decimal("200"), 0, 1))
+        self.assertEqual(self.rollup()[(self.today, self.preventa.id, True)], (1, Decimal("100"), 1, 1))
+
+        # Una edición por commit: cada una debe recalcular por sí sola los días que toca
+        edits = [
+            (pending, {"amount": Decimal("250")}),
+            (pending, {"payment_date": self.yesterday}),
+            (validated, {"purchase": mixed}),
+            (mixed, {"is_validated": True}),
+        ]
+        for instance, changes in edits:
+            with self.captureOnCommitCallbacks(execute=True):
+                for field, value in changes.items():
+                    setattr(instance, field, value)
+                instance.save()
+            self.assert_matches_direct()
+        with self.captureOnCommitCallbacks(execute=True):
+            mixed.lots.remove(self.b)
+        self.assert_matches_direct()
+        self.assertEqual(self.rollup()[(self.yesterday, self.preventa.id, False)], (1, Decimal("250"), 0, 0))
+        # Vender un lote no cambia lots_sold: cuenta por fecha de la compra
+        Lot.objects.filter(pk=self.a.pk).update(status="SOLD")
+        self.assert_matches_direct()
+
+        for instance in (pending, single):
+            with self.captureOnCommitCallbacks(execute=True):
+                instance.delete()
+            self.assert_matches_direct()
+        self.assertFalse(DailySales.objects.filter(date=self.yesterday).exists())
+
+    def test_rebuild_matches_incremental_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = Purchase.objects.create(client=self.user, total_amount=Decimal("1500"))
+            purchase.lots.set([self.a, self.b, self.c])
+            Payment.objects.create(purchase=purchase, amount=Decimal("700"))
+            old = Payment.objects.create(purchase=purchase, amount=Decimal("333.33"), is_validated=True)
+            old.payment_date = self.yesterday
+            old.save()
+            Purchase.objects.create(client=self.user, total_amount=Decimal("80"))
+        incremental = self.rollup()
+        self.assert_matches_direct()
+
+        DailySales.objects.all().delete()
+        self.assertEqual(rebuild_rollups(chunk_days=1), len(incremental))
+        self.assertEqual(self.rollup(), incremental)
+        call_command("rebuild_sales_rollups", stdout=io.StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+
+def reference_projection(plan, today, horizon):
+    """
+    Proyección de un plan cuota por cuota: lo pagado cubre las obligaciones
+    en orden (cuota inicial y luego cada cuota); lo vencido e impago es mora
+    y lo que vence después de hoy se suma en su mes.
+    """
+    n = max(plan["count"], 1)
+    financed = max(plan["total"] - plan["down"], 0)
+    base = financed // n
+    first = plan["first_due"]
+    obligations = [(plan["start"], plan["down"])]
+    for k in range(n):
+        year, month = divmod(first.year * 12 + first.month - 1 + k, 12)
+        day = min(first.day, calendar.monthrange(year, month + 1)[1])
+        obligations.append((date(year, month + 1, day), base if k < n - 1 else financed - base * (n - 1)))
+
+    left, arrears, oldest = plan["paid"], 0, None
+    expected = [0] * horizon
+    for due_date, amount in obligations:
+        unpaid = amount - min(left, amount)
+        left -= amount - unpaid
+        if not unpaid:
+            continue
+        if due_date <= today:
+            arrears += unpaid
+            oldest = oldest or due_date
+        else:
+            offset = (due_date.year - today.year) * 12 + due_date.month - today.month
+            if offset < horizon:
+                expected[offset] += unpaid
+
+    aging = [(0, 0)] * len(AGING_BUCKETS)
+    if arrears:
+        age = (today - oldest).days
+        index = next(i for i, (limit, _) in enumerate(AGING_BUCKETS) if limit is None or age <= limit)
+        aging[index] = (1, arrears)
+    return expected, arrears, aging
+
+
+def cents(value):
+    return (Decimal(value) / 100).quantize(Decimal("0.01"))
+
+
+class CashflowProjectionTests(TestCase):
+    """project() resuelve cada plan con aritmética; debe coincidir con recorrerlo cuota por cuota."""
+
+    HORIZON = 12
+
+    def assert_matches_reference(self, plan, today):
+        columns = PlanColumns()
+        columns.append(cents(plan["total"]), cents(plan["paid"]), cents(plan["down"]), plan["count"],
+                       plan["start"], plan["first_due"])
+        result = project(columns, today, self.HORIZON)
+        expected, arrears, aging = reference_projection(plan, today, self.HORIZON)
+        context = f"{plan} hoy={today}"
+        self.assertEqual([m["expected"] for m in result["months"]], [cents(v) for v in expected], context)
+        self.assertEqual(result["arrears"], cents(arrears), context)
+        self.assertEqual([(a["count"], a["amount"]) for a in result["aging"]],
+                         [(count, cents(amount)) for count, amount in aging], context)
+        return result
+
+    def random_plan(self, rng, today):
+        total = rng.choice([rng.randint(1, 50), rng.randint(100, 10_000_000)])
+        down = rng.choice([0, 0, rng.randint(0, total)])
+        count = rng.choice([1, 1, 2, 3, 12, 36, rng.randint(1, 360)])
+        start = today + timedelta(days=rng.randint(-500, 90))
+        first_due = start + timedelta(days=rng.randint(0, 90))
+        if rng.random() < 0.3:
+            # Días 29-31: la cuota vence el último día de los meses más cortos
+            day = rng.randint(29, 31)
+            if day <= calendar.monthrange(first_due.year, first_due.month)[1] and first_due.replace(day=day) >= start:
+                first_due = first_due.replace(day=day)
+        base = (total - down) // count
+        paid = rng.choice([
+            0, down, max(down - 1, 0), down + base * rng.randint(0, count),
+            down + base * rng.randint(0, count) + rng.randint(0, max(base, 1)), rng.randint(0, total - 1),
+        ])
+        return {"total": total, "paid": min(paid, total - 1), "down": down, "count": count,
+                "start": start, "first_due": first_due}
+
+    def test_matches_per_installment_reference(self):
+        rng = random.Random(20261018)
+        for today in (date(2026, 3, 31), date(2026, 2, 28), date(2024, 2, 29), date(2026, 10, 18), date(2026, 1, 1)):
+            for _ in range(400):
+                self.assert_matches_reference(self.random_plan(rng, today), today)
+
+    def test_arrears_and_aging_buckets(self):
+        today = date(2026, 10, 18)
+        # 10 cuotas de 100 desde el 15/07: vencidas julio a octubre
+        plan = {"total": 1000, "down": 0, "count": 10, "start": date(2026, 7, 1), "first_due": date(2026, 7, 15)}
+        for paid, bucket in ((0, 3), (100, 2), (250, 1), (300, 0), (400, None)):
+            result = self.assert_matches_reference({**plan, "paid": paid}, today)
+            counts = [a["count"] for a in result["aging"]]
+            self.assertEqual(counts, [int(i == bucket) for i in range(len(AGING_BUCKETS))], paid)
+        # Cuota inicial impaga: la mora cuenta desde el inicio del plan
+        result = self.assert_matches_reference({**plan, "down": 300, "paid": 0}, today)
+        self.assertEqual(result["aging"][3]["count"], 1)
+
+    def test_single_installment(self):
+        today = date(2026, 10, 18)
+        plan = {"total": 100_000, "down": 20_000, "count": 1, "start": date(2026, 10, 1),
+                "first_due": date(2026, 12, 31), "paid": 20_000}
+        result = self.assert_matches_reference(plan, today)
+        self.assertEqual(result["months"][2]["expected"], Decimal("800.00"))
+        self.assertEqual(result["expected_total"], Decimal("800.00"))
+        result = self.assert_matches_reference({**plan, "first_due": date(2026, 10, 18)}, today)
+        self.assertEqual((result["arrears"], result["expected_total"]), (Decimal("800.00"), Decimal("0.00")))
+
+    def test_plan_without_installments_is_one_installment(self):
+        today = date(2026, 10, 18)
+        plan = {"total": 50_000, "down": 0, "count": 0, "start": date(2026, 9, 1),
+                "first_due": date(2026, 9, 30), "paid": 10_000}
+        result = self.assert_matches_reference(plan, today)
+        self.assertEqual(result["arrears"], Decimal("400.00"))
+        result = self.assert_matches_reference({**plan, "first_due": date(2026, 11, 5)}, today)
+        self.assertEqual(result["months"][1]["expected"], Decimal("400.00"))
+
+    def test_plans_are_validated(self):
+        purchase = Purchase.objects.create(client=make_client(), total_amount=Decimal("1000"))
+        start = date(2026, 10, 1)
+        for count, first_due in ((0, start), (2, start - timedelta(days=1))):
+            plan = InstallmentPlan(purchase=purchase, installment_count=count, start_date=start, first_due_date=first_due)
+            with self.assertRaises(ValidationError):
+                plan.full_clean()
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                plan.save()
+        InstallmentPlan.objects.create(purchase=purchase, installment_count=1, start_date=start, first_due_date=start)
+        self.assertEqual(portfolio_projection(today=date(2026, 10, 18))["arrears"], Decimal("1000.00"))
@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     my_purchases_list,
     purchase_detail,
+    payment_receipt,
     register_payment,
     validate_payment,
     admin_purchase_list,
@@ -10,14 +11,19 @@ from .views import (
     admin_purchase_edit,
     admin_payment_create,
     admin_payment_edit,
+    admin_payment_reconcile,
+    admin_autocomplete,
     monthly_report,
+    sales_report_form,
 )
 
 urlpatterns = [
     path('mis-compras/', my_purchases_list, name='my_purchases_list'),
     path('detalle/<int:purchase_id>/', purchase_detail, name='purchase_detail'),
     path('pago/<int:purchase_id>/', register_payment, name='register_payment'),
+    path('comprobante/<int:payment_id>/<slug:key>.<slug:kind>', payment_receipt, name='payment_receipt'),
     path('reporte-mensual/', monthly_report, name='monthly_report'),
+    path('reportes/', sales_report_form, name='sales_report_form'),
     
     # Admin Ventas
     path('admin/purchases/', admin_purchase_list, name='admin_purchase_list'),
@@ -27,4 +33,6 @@ urlpatterns = [
     path('admin/payment/create/', admin_payment_create, name='admin_payment_create'),
     path('admin/payment/edit/<int:payment_id>/', admin_payment_edit, name='admin_payment_edit'),
     path('admin/payment/validate/<int:payment_id>/', validate_payment, name='admin_payment_validate'),
+    path('admin/payment/reconcile/', admin_payment_reconcile, name='admin_payment_reconcile'),
+    path('admin/autocomplete/<slug:kind>/', admin_autocomplete, name='admin_autocomplete'),
 ]
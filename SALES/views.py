@@ -1,86 +1,42 @@
-import os
-import base64
 import logging
 from decimal import Decimal
-from io import BytesIO
 
 from django.contrib import messages
 from USERS.decorators import admin_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.views.generic.edit import CreateView
-from mailjet_rest import Client
 
-from LOTES.models import Lot
-from .models import Payment, Purchase
+from LOTES.inventory import update_lot_statuses
+from LOTES.models import Lot, Stage
+from PROJECT_INFO.jobs import enqueue
+from .autocomplete import LOOKUPS as AUTOCOMPLETE_LOOKUPS, client_label, lot_label, purchase_label
+from .cashflow import parse_plan
+from .idempotency import find_key, new_key, remember_key, request_key
+from .listing import PAYMENT_SORTS, PURCHASE_SORTS, admin_list_page, filter_payments, filter_purchases
+from .listing import filter_query, parse_list_filters, parse_sort
+from .lot_status import update_lots_status_for_purchase
+from .models import InstallmentPlan, Payment, Purchase
+from .reconciliation import match_statement, validate_payments
+from .receipts import PAYMENT_RECEIPT_TASK, RECEIPT_KINDS, ensure_receipt, receipt_data, receipt_key, receipt_name
+from .reports import FORMATS as REPORT_FORMATS, GROUPINGS as REPORT_GROUPINGS
+from .reports import ReportError, generate_report, month_range, parse_report_params, report_filename
+from .reservations import LotUnavailable, reserve_lot
 
 logger = logging.getLogger(__name__)
 
-
-def send_mailjet_email(subject, html_content, to_email, to_name='', attachments=None):
-    mailjet = Client(
-        auth=(os.environ.get('MJ_APIKEY_PUBLIC'), os.environ.get('MJ_APIKEY_PRIVATE')),
-        version='v3.1'
-    )
-    message = {
-        'From': {'Email': settings.DEFAULT_FROM_EMAIL, 'Name': 'SIGLO'},
-        'To': [{'Email': to_email, 'Name': to_name}],
-        'Subject': subject,
-        'HTMLPart': html_content,
-    }
-    if attachments:
-        message['Attachments'] = attachments
-
-    result = mailjet.send.create(data={'Messages': [message]})
-    return result
-
-
-def update_lots_status_for_purchase(purchase):
-    lots = purchase.lots.all()
-    if not lots:
-        return
-
-    payments = purchase.payment_set.filter(is_validated=True)
-    total_paid = sum((p.amount for p in payments), Decimal("0"))
-    sum_lot_prices = sum((l.price or Decimal("0") for l in lots), Decimal("0"))
-    contractual_total = purchase.total_amount or sum_lot_prices
-
-    targets = {}
-    if sum_lot_prices > Decimal("0"):
-        for l in lots:
-            price = l.price or Decimal("0")
-            targets[l.id] = (price / sum_lot_prices) * contractual_total
-    else:
-        for l in lots:
-            targets[l.id] = Decimal("0")
-
-    total_targets = sum(targets.values(), Decimal("0"))
-
-    if total_paid >= total_targets and total_targets > Decimal("0"):
-        for lot in lots:
-            lot.status = "SOLD"
-            lot.save()
-        return
-
-    if total_paid <= Decimal("0"):
-        for lot in lots:
-            lot.status = "AVAILABLE"
-            lot.save()
-        return
-
-    remaining = total_paid
-    ordered_lots = sorted(lots, key=lambda l: (targets.get(l.id, Decimal("0")), l.id), reverse=True)
-    for lot in ordered_lots:
-        target = targets.get(lot.id, Decimal("0"))
-        if remaining >= target and target > Decimal("0"):
-            lot.status = "SOLD"
-            remaining -= target
-        else:
-            lot.status = "RESERVED"
-        lot.save()
+# Las URLs de comprobantes llevan el hash del contenido: nunca cambian
+RECEIPT_MAX_AGE = 60 * 60 * 24 * 365
+# El pago chocó con una restricción pero no hay un envío previo que devolver
+# (p. ej. la clave ganadora ya venció): se vuelve al formulario
+PAYMENT_CONFLICT_ERROR = "No se pudo registrar el pago. Intenta de nuevo."
 
 
 @login_required
@@ -91,10 +47,11 @@ def buy_lot(request, lot_id):
         messages.warning(request, "Por favor, completa tu perfil (nombre, apellido y correo) antes de realizar una compra.")
         return redirect('profile')
 
-    lot = get_object_or_404(Lot, id=lot_id, status='AVAILABLE')
-    purchase = Purchase.objects.create(client=request.user, total_amount=lot.price)
-    purchase.lots.add(lot)
-    update_lots_status_for_purchase(purchase)
+    try:
+        purchase = reserve_lot(request.user, lot_id)
+    except LotUnavailable:
+        messages.warning(request, "Este lote ya no está disponible. Elige otro lote del catálogo.")
+        return redirect('lot_list')
     return redirect('purchase_detail', purchase_id=purchase.id)
 
 
@@ -110,18 +67,58 @@ def my_purchases_list(request):
 
 @login_required
 def purchase_detail(request, purchase_id):
-    purchase = get_object_or_404(Purchase, id=purchase_id, client=request.user)
-    payments = purchase.payment_set.all().order_by('-payment_date')
+    purchase = get_object_or_404(Purchase.objects.select_related('client'), id=purchase_id, client=request.user)
+    payments = list(purchase.payment_set.all().order_by('-payment_date', '-id'))
+    # Clave vigente del comprobante de cada pago (saldo acumulado en orden de registro)
+    paid = Decimal("0")
+    for payment in sorted(payments, key=lambda p: p.id):
+        paid += payment.amount
+        payment.purchase = purchase
+        payment.receipt_url_key = receipt_key(receipt_data(payment, purchase.total_amount - paid))
     return render(request, 'sales/purchase_detail.html', {'purchase': purchase, 'payments': payments})
 
 
+@login_required
+def payment_receipt(request, payment_id, key, kind):
+    """
+    Descarga del comprobante guardado. La URL incluye el hash del contenido,
+    así que la respuesta se puede cachear indefinidamente; si los datos del
+    pago cambiaron se redirige a la URL del comprobante regenerado.
+    """
+    if kind not in RECEIPT_KINDS:
+        raise Http404
+    payment = get_object_or_404(Payment.objects.select_related('purchase__client'), id=payment_id)
+    is_admin = getattr(request.user, 'role', None) in ['ADMIN', 'EXECUTIVE']
+    if payment.purchase.client_id != request.user.id and not is_admin:
+        raise Http404
+
+    current = ensure_receipt(payment)
+    if key != current:
+        return redirect('payment_receipt', payment_id=payment.id, key=current, kind=kind)
+
+    content_type, _, filename = RECEIPT_KINDS[kind]
+    response = FileResponse(
+        default_storage.open(receipt_name(current, kind), 'rb'),
+        content_type=content_type,
+        as_attachment=kind == 'pdf',
+        filename=filename.format(id=payment.id),
+    )
+    patch_cache_control(response, private=True, max_age=RECEIPT_MAX_AGE, immutable=True)
+    return response
+
+
 @login_required
 def register_payment(request, purchase_id):
     purchase = get_object_or_404(Purchase, id=purchase_id, client=request.user)
 
     if request.method == "POST":
+        key = request_key(request)
+        previous = find_key(request.user, key)
+        if previous:
+            return _replay_payment(request, previous)
+
         amount_raw = request.POST.get('amount')
-        context = {'purchase': purchase}
+        context = {'purchase': purchase, 'idempotency_key': key or new_key()}
 
         if amount_raw:
             try:
@@ -134,98 +131,36 @@ def register_payment(request, purchase_id):
                 context['error'] = "El monto debe ser mayor a 0."
                 return render(request, 'sales/register_payment.html', context)
 
-            pending = purchase.balance()
+            pending = purchase.balance
             if amount > pending:
                 context['error'] = f"El monto excede el saldo pendiente (${pending})."
                 return render(request, 'sales/register_payment.html', context)
 
-            payment = Payment.objects.create(purchase=purchase, amount=amount)
-            payment.refresh_from_db()
-            purchase.refresh_from_db()
+            redirect_url = reverse('purchase_detail', args=[purchase.id])
+            try:
+                with transaction.atomic():
+                    payment = Payment.objects.create(purchase=purchase, amount=amount)
+                    if key:
+                        remember_key(request.user, key, payment, redirect_url)
+                    if purchase.client.email:
+                        # El comprobante (QR + PDF + correo) lo genera el worker de
+                        # run_jobs; el trabajo solo existe si el pago se confirma.
+                        enqueue(PAYMENT_RECEIPT_TASK, {"payment_id": payment.id})
+            except IntegrityError:
+                # Otro envío con la misma clave terminó primero
+                previous = find_key(request.user, key)
+                if previous:
+                    return _replay_payment(request, previous)
+                context['error'] = PAYMENT_CONFLICT_ERROR
+                return render(request, 'sales/register_payment.html', context)
 
             if purchase.client.email:
-                subject = "Comprobante de pago - SIGLO"
-                payment_date_str = payment.payment_date.strftime("%d/%m/%Y") if payment.payment_date else "Hoy"
-
-                email_context = {
-                    'user_name': purchase.client.get_full_name() or purchase.client.username,
-                    'purchase_id': purchase.id,
-                    'amount': payment.amount,
-                    'payment_date': payment_date_str,
-                    'balance': purchase.balance(),
-                }
-                html_content = render_to_string('emails/payment_receipt_email.html', email_context)
-                attachments = []
-
-                # QR code
-                try:
-                    import qrcode
-                    qr_data = (
-                        f"SIGLO-COMPROBANTE\n"
-                        f"Pago: #{payment.id}\n"
-                        f"Compra: #{purchase.id}\n"
-                        f"Monto: ${payment.amount}\n"
-                        f"Fecha: {payment_date_str}"
-                    )
-                    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-                    qr.add_data(qr_data)
-                    qr.make(fit=True)
-                    img = qr.make_image(fill_color="black", back_color="white")
-                    qr_buffer = BytesIO()
-                    img.save(qr_buffer, format="PNG")
-                    qr_b64 = base64.b64encode(qr_buffer.getvalue()).decode()
-                    qr_buffer.close()
-                    attachments.append({
-                        'Filename': f'comprobante_qr_{payment.id}.png',
-                        'ContentType': 'image/png',
-                        'Base64Content': qr_b64,
-                    })
-                except Exception as e:
-                    print(f"QR error: {e}")
-
-                # PDF (Usando fpdf ya que está en requirements.txt)
-                try:
-                    from fpdf import FPDF
-                    pdf = FPDF()
-                    pdf.add_page()
-                    pdf.set_font("Arial", size=12)
-                    pdf.cell(200, 10, txt="Comprobante de pago SIGLO", ln=True, align='C')
-                    pdf.ln(10)
-                    pdf.cell(200, 10, txt=f"Compra: #{purchase.id}", ln=True)
-                    pdf.cell(200, 10, txt=f"Cliente: {purchase.client.get_full_name() or purchase.client.email}", ln=True)
-                    pdf.cell(200, 10, txt=f"Monto: ${payment.amount}", ln=True)
-                    pdf.cell(200, 10, txt=f"Fecha: {payment_date_str}", ln=True)
-                    pdf.cell(200, 10, txt=f"Saldo pendiente: ${purchase.balance()}", ln=True)
-                    
-                    pdf_buffer = BytesIO()
-                    pdf_output = pdf.output(dest='S').encode('latin-1')
-                    pdf_b64 = base64.b64encode(pdf_output).decode()
-                    attachments.append({
-                        'Filename': f'comprobante_pago_{payment.id}.pdf',
-                        'ContentType': 'application/pdf',
-                        'Base64Content': pdf_b64,
-                    })
-                except Exception as e:
-                    print(f"PDF error (fpdf): {e}")
-
-                try:
-                    result = send_mailjet_email(
-                        subject=subject,
-                        html_content=html_content,
-                        to_email=purchase.client.email,
-                        to_name=purchase.client.get_full_name() or purchase.client.username,
-                        attachments=attachments,
-                    )
-                    print("Mailjet pago response:", result.status_code, result.json())
-                    messages.add_message(
-                        request, messages.SUCCESS,
-                        "Pago registrado con éxito. Te hemos enviado el comprobante a tu correo. "
-                        "Si no lo encuentras, revisa tu carpeta de SPAM.",
-                        extra_tags='payment_success'
-                    )
-                except Exception as e:
-                    print(f"ERROR CORREO PAGO: {type(e).__name__}: {e}")
-                    messages.warning(request, "Pago registrado, pero hubo un problema al enviar el correo.")
+                messages.add_message(
+                    request, messages.SUCCESS,
+                    "Pago registrado con éxito. En unos minutos recibirás el comprobante en tu correo. "
+                    "Si no lo encuentras, revisa tu carpeta de SPAM.",
+                    extra_tags='payment_success'
+                )
             else:
                 messages.success(request, "Pago registrado con éxito.")
 
@@ -233,7 +168,13 @@ def register_payment(request, purchase_id):
 
         return redirect('purchase_detail', purchase_id=purchase.id)
 
-    return render(request, 'sales/register_payment.html', {'purchase': purchase})
+    return render(request, 'sales/register_payment.html', {'purchase': purchase, 'idempotency_key': new_key()})
+
+
+def _replay_payment(request, previous):
+    """Respuesta a un reenvío: el resultado original, sin volver a validar ni registrar nada."""
+    messages.info(request, f"El pago #{previous.payment_id} ya había sido registrado.")
+    return redirect(previous.redirect_url)
 
 
 class PaymentCreateView(CreateView):
@@ -252,80 +193,121 @@ def validate_payment(request, payment_id):
     return redirect("admin_purchase_list")
 
 
+@admin_required
+def admin_payment_reconcile(request):
+    """
+    Conciliación con el extracto bancario: al subir el CSV se muestran los
+    pagos propuestos; al confirmar se validan todos los aceptados juntos.
+    """
+    if request.method == "POST" and request.POST.get("action") == "confirm":
+        payment_ids = [int(pk) for pk in request.POST.getlist("payments") if pk.isdigit()]
+        validated = validate_payments(payment_ids)
+        messages.success(request, f"Pagos validados: {validated}.")
+        return redirect("admin_payment_list")
+
+    context = {"results": None, "error": None}
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if not upload or not upload.name.lower().endswith(".csv"):
+            context["error"] = "Selecciona el extracto en formato CSV."
+        else:
+            try:
+                results = match_statement(upload.file)
+            except ValueError as e:
+                context["error"] = str(e)
+            else:
+                context["results"] = results
+                context["matched"] = sum(1 for row in results if row["payment"])
+    return render(request, "sales/admin_payment_reconcile.html", context)
+
+
+def _admin_list_context(request, queryset, filter_rows, sorts):
+    """Filtros, orden y página actual compartidos por los listados de compras y pagos."""
+    try:
+        filters = parse_list_filters(request.GET)
+    except ValueError as e:
+        messages.warning(request, str(e))
+        filters = parse_list_filters({})
+    sort, ordering = parse_sort(request.GET.get("sort"), sorts)
+    cursor = request.GET.get("cursor")
+    rows, next_cursor = admin_list_page(filter_rows(queryset, filters), ordering, cursor)
+    return {
+        "filters": filters,
+        "sort": sort,
+        "query": filter_query(request.GET),
+        "next_cursor": next_cursor,
+        "is_first_page": not cursor,
+        "stages": Stage.objects.order_by("name"),
+    }, rows
+
+
 @admin_required
 def admin_purchase_list(request):
-    purchases = Purchase.objects.select_related("client").prefetch_related("lots").all().order_by("-created_at")
-    return render(request, "sales/admin_purchase_list.html", {"purchases": purchases})
+    queryset = Purchase.objects.select_related("client").prefetch_related("lots", "payment_set")
+    context, purchases = _admin_list_context(request, queryset, filter_purchases, PURCHASE_SORTS)
+    context["purchases"] = purchases
+    return render(request, "sales/admin_purchase_list.html", context)
 
 
 @admin_required
 def admin_payment_list(request):
-    payments = Payment.objects.select_related("purchase", "purchase__client").all().order_by("-payment_date")
-    return render(request, "sales/admin_payment_list.html", {"payments": payments})
+    queryset = Payment.objects.select_related("purchase__client")
+    context, payments = _admin_list_context(request, queryset, filter_payments, PAYMENT_SORTS)
+    context["payments"] = payments
+    return render(request, "sales/admin_payment_list.html", context)
 
 
 @admin_required
 def monthly_report(request):
-    from fpdf import FPDF
-    from django.utils import timezone
-    from django.http import HttpResponse
-    from decimal import Decimal
-
-    now = timezone.now()
-    month_name = now.strftime("%B %Y")
-    
-    # Obtener pagos validados del mes actual
-    payments = Payment.objects.filter(
-        payment_date__month=now.month,
-        payment_date__year=now.year,
-        is_validated=True
-    ).select_related('purchase', 'purchase__client')
-
-    total_amount = sum((p.amount for p in payments), Decimal("0"))
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt=f"Reporte Mensual de Ventas - {month_name}", ln=True, align='C')
-    pdf.ln(10)
-
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(40, 10, "Fecha", 1)
-    pdf.cell(80, 10, "Cliente", 1)
-    pdf.cell(40, 10, "Compra #", 1)
-    pdf.cell(30, 10, "Monto", 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", size=10)
-    for p in payments:
-        client_name = p.purchase.client.get_full_name() or p.purchase.client.email
-        pdf.cell(40, 10, p.payment_date.strftime("%d/%m/%Y"), 1)
-        pdf.cell(80, 10, str(client_name)[:40], 1)
-        pdf.cell(40, 10, f"#{p.purchase.id}", 1)
-        pdf.cell(30, 10, f"${p.amount}", 1)
-        pdf.ln()
-
-    pdf.ln(5)
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(160, 10, "TOTAL RECAUDADO:", 0)
-    pdf.cell(30, 10, f"${total_amount}", 0)
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="reporte_{now.strftime("%m_%Y")}.pdf"'
-    response.write(pdf.output(dest='S').encode('latin-1'))
+    """
+    Reporte de ventas (pagos validados) por rango de fechas. Sin parámetros
+    es el reporte del mes en curso en PDF; admite ?start, ?end, ?group
+    (payment/day/week/month/stage/client) y ?format (pdf/csv/xlsx).
+    """
+    try:
+        params = parse_report_params(request.GET)
+    except ReportError as e:
+        messages.error(request, str(e))
+        return redirect("sales_report_form")
+
+    response = HttpResponse(generate_report(params), content_type=REPORT_FORMATS[params["format"]])
+    response['Content-Disposition'] = f'attachment; filename="{report_filename(params)}"'
     return response
 
 
+@admin_required
+def sales_report_form(request):
+    today = timezone.localdate()
+    start, end = month_range(today)
+    return render(request, "sales/report_form.html", {
+        "start": start,
+        "end": end,
+        "groupings": REPORT_GROUPINGS.items(),
+        "formats": REPORT_FORMATS.keys(),
+    })
+
+
+def _save_plan(purchase, plan):
+    if plan is None:
+        InstallmentPlan.objects.filter(purchase=purchase).delete()
+    else:
+        InstallmentPlan.objects.update_or_create(purchase=purchase, defaults=plan)
+
+
 @admin_required
 def admin_purchase_create(request):
     User = get_user_model()
-    clients = User.objects.filter(role="CLIENT").order_by("email")
-    lots = Lot.objects.all().order_by("code")
 
     if request.method == "POST":
         data = request.POST
         client = get_object_or_404(User, pk=data.get("client"))
+        try:
+            plan = parse_plan(data, data.get("total_amount"))
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect("admin_purchase_create")
         purchase = Purchase.objects.create(client=client, total_amount=data.get("total_amount") or 0)
+        _save_plan(purchase, plan)
         selected_lots = data.getlist("lots")
         if selected_lots:
             purchase.lots.set(Lot.objects.filter(pk__in=selected_lots))
@@ -333,9 +315,10 @@ def admin_purchase_create(request):
         return redirect("admin_purchase_list")
 
     context = {
-        "clients": clients,
-        "lots": lots,
+        "client_choice": None,
+        "lot_choices": [],
         "form": {"client": "", "lots": [], "total_amount": ""},
+        "plan": None,
         "purchase": None,
     }
     return render(request, "sales/admin_purchase_form.html", context)
@@ -344,39 +327,45 @@ def admin_purchase_create(request):
 @admin_required
 def admin_purchase_edit(request, purchase_id):
     User = get_user_model()
-    purchase = get_object_or_404(Purchase, pk=purchase_id)
-    clients = User.objects.filter(role="CLIENT").order_by("email")
-    lots = Lot.objects.all().order_by("code")
+    purchase = get_object_or_404(Purchase.objects.select_related("client"), pk=purchase_id)
 
     if request.method == "POST":
         data = request.POST
         client = get_object_or_404(User, pk=data.get("client"))
+        try:
+            plan = parse_plan(data, data.get("total_amount"))
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect("admin_purchase_edit", purchase_id=purchase.id)
         old_lot_ids = list(purchase.lots.values_list("id", flat=True))
         purchase.client = client
         purchase.total_amount = data.get("total_amount") or 0
         purchase.save()
+        _save_plan(purchase, plan)
         selected_lots = data.getlist("lots")
         if selected_lots:
             new_lots_qs = Lot.objects.filter(pk__in=selected_lots)
             purchase.lots.set(new_lots_qs)
             removed_ids = set(old_lot_ids) - set(new_lots_qs.values_list("id", flat=True))
             if removed_ids:
-                Lot.objects.filter(id__in=removed_ids).update(status="AVAILABLE")
+                update_lot_statuses({lot_id: "AVAILABLE" for lot_id in removed_ids})
             update_lots_status_for_purchase(purchase)
         else:
             purchase.lots.clear()
             if old_lot_ids:
-                Lot.objects.filter(id__in=old_lot_ids).update(status="AVAILABLE")
+                update_lot_statuses({lot_id: "AVAILABLE" for lot_id in old_lot_ids})
         return redirect("admin_purchase_list")
 
+    lots = purchase.lots.select_related("stage").order_by("code")
     context = {
-        "clients": clients,
-        "lots": lots,
+        "client_choice": {"id": purchase.client.id, "label": client_label(purchase.client)},
+        "lot_choices": [{"id": lot.id, "label": lot_label(lot)} for lot in lots],
         "form": {
             "client": purchase.client.id if purchase.client else "",
-            "lots": [lot.id for lot in purchase.lots.all()],
+            "lots": [lot.id for lot in lots],
             "total_amount": purchase.total_amount,
         },
+        "plan": InstallmentPlan.objects.filter(purchase=purchase).first(),
         "purchase": purchase,
     }
     return render(request, "sales/admin_purchase_form.html", context)
@@ -384,50 +373,57 @@ def admin_purchase_edit(request, purchase_id):
 
 @admin_required
 def admin_payment_create(request):
-    purchases = Purchase.objects.select_related("client").all().order_by("-created_at")
-
     if request.method == "POST":
         data = request.POST
+        key = request_key(request)
+        previous = find_key(request.user, key)
+        if previous:
+            return _replay_payment(request, previous)
+
         purchase = get_object_or_404(Purchase, pk=data.get("purchase"))
+        error_context = {
+            "purchase_choice": {"id": purchase.id, "label": purchase_label(purchase)},
+            "form": {"purchase": purchase.id, "amount": data.get("amount")},
+            "payment": None,
+            "idempotency_key": key or new_key(),
+        }
         try:
             amount = Decimal(str(data.get("amount") or "0"))
         except Exception:
-            return render(request, "sales/admin_payment_form.html", {
-                "purchases": purchases,
-                "form": {"purchase": purchase.id, "amount": data.get("amount")},
-                "payment": None,
-                "error": "Monto inválido.",
-            })
+            return render(request, "sales/admin_payment_form.html", {**error_context, "error": "Monto inválido."})
         if amount <= Decimal("0"):
             return render(request, "sales/admin_payment_form.html", {
-                "purchases": purchases,
-                "form": {"purchase": purchase.id, "amount": data.get("amount")},
-                "payment": None,
-                "error": "El monto debe ser mayor a 0.",
+                **error_context, "error": "El monto debe ser mayor a 0.",
             })
-        if amount > purchase.balance():
+        if amount > purchase.balance:
             return render(request, "sales/admin_payment_form.html", {
-                "purchases": purchases,
-                "form": {"purchase": purchase.id, "amount": data.get("amount")},
-                "payment": None,
-                "error": f"El monto excede el saldo pendiente (${purchase.balance()}).",
+                **error_context, "error": f"El monto excede el saldo pendiente (${purchase.balance}).",
             })
-        Payment.objects.create(purchase=purchase, amount=amount)
+        try:
+            with transaction.atomic():
+                payment = Payment.objects.create(purchase=purchase, amount=amount)
+                if key:
+                    remember_key(request.user, key, payment, reverse("admin_payment_list"))
+        except IntegrityError:
+            previous = find_key(request.user, key)
+            if previous:
+                return _replay_payment(request, previous)
+            return render(request, "sales/admin_payment_form.html", {**error_context, "error": PAYMENT_CONFLICT_ERROR})
         update_lots_status_for_purchase(purchase)
         return redirect("admin_payment_list")
 
     context = {
-        "purchases": purchases,
+        "purchase_choice": None,
         "form": {"purchase": "", "amount": ""},
         "payment": None,
+        "idempotency_key": new_key(),
     }
     return render(request, "sales/admin_payment_form.html", context)
 
 
 @admin_required
 def admin_payment_edit(request, payment_id):
-    payment = get_object_or_404(Payment, pk=payment_id)
-    purchases = Purchase.objects.select_related("client").all().order_by("-created_at")
+    payment = get_object_or_404(Payment.objects.select_related("purchase__client"), pk=payment_id)
 
     if request.method == "POST":
         data = request.POST
@@ -436,17 +432,17 @@ def admin_payment_edit(request, payment_id):
             amount = Decimal(str(data.get("amount") or "0"))
         except Exception:
             return render(request, "sales/admin_payment_form.html", {
-                "purchases": purchases,
+                "purchase_choice": {"id": purchase.id, "label": purchase_label(purchase)},
                 "form": {"purchase": purchase.id, "amount": data.get("amount")},
                 "payment": payment,
                 "error": "Monto inválido.",
             })
         
         # Al editar, sumamos el monto actual del pago al balance para validar el nuevo monto
-        current_balance = payment.purchase.balance() + payment.amount
+        current_balance = payment.purchase.balance + payment.amount
         if amount > current_balance:
             return render(request, "sales/admin_payment_form.html", {
-                "purchases": purchases,
+                "purchase_choice": {"id": purchase.id, "label": purchase_label(purchase)},
                 "form": {"purchase": purchase.id, "amount": data.get("amount")},
                 "payment": payment,
                 "error": f"El monto excede el saldo disponible (${current_balance}).",
@@ -454,16 +450,28 @@ def admin_payment_edit(request, payment_id):
             
         payment.purchase = purchase
         payment.amount = amount
-        payment.save()
+        # receipt_key solo lo escribe ensure_receipt: guardar la copia leída al
+        # inicio pisaría un comprobante generado mientras tanto
+        payment.save(update_fields=["purchase", "amount"])
         update_lots_status_for_purchase(purchase)
         return redirect("admin_payment_list")
 
     context = {
-        "purchases": purchases,
+        "purchase_choice": {"id": payment.purchase.id, "label": purchase_label(payment.purchase)},
         "form": {
             "purchase": payment.purchase.id,
             "amount": payment.amount,
         },
         "payment": payment,
     }
-    return render(request, "sales/admin_payment_form.html", context)
\ No newline at end of file
+    return render(request, "sales/admin_payment_form.html", context)
+
+
+@admin_required
+def admin_autocomplete(request, kind):
+    """Sugerencias por prefijo para los formularios del admin: ?q=texto."""
+    lookup = AUTOCOMPLETE_LOOKUPS.get(kind)
+    if lookup is None:
+        raise Http404
+    q = (request.GET.get("q") or "").strip()[:100]
+    return JsonResponse({"results": lookup(q) if q else []})
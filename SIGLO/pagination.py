@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+# Marca de los datetime dentro del cursor (ver _CursorEncoder)
+DATETIME_TAG = "$dt"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta los datetime a milisegundos; el cursor
+    # necesita el valor exacto o la comparación repite u omite filas.
+    def default(self, o):
+        if isinstance(o, datetime):
+            return {DATETIME_TAG: o.isoformat()}
+        return super().default(o)
+
+
+def _decode_value(obj):
+    if set(obj) == {DATETIME_TAG}:
+        return datetime.fromisoformat(obj[DATETIME_TAG])
+    return obj
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode(), object_hook=_decode_value)
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Cursor inválido.") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Cursor inválido.")
+    return values
+
+
+def _row_value(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    value = row
+    for part in field.split("__"):
+        value = getattr(value, part)
+    return value
+
+
+def keyset_filter(queryset, ordering, values):
+    """
+    Filtra las filas estrictamente posteriores a `values` según `ordering`
+    (lista de campos estilo order_by, p. ej. ["-payment_date", "-id"]).
+    El último campo debe ser único para que el orden sea total.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return queryset.filter(condition)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, limit=50):
+    """
+    Paginación por cursor (keyset): nunca usa OFFSET, así que cada página
+    cuesta lo mismo sin importar qué tan profundo esté el cliente.
+    Devuelve (filas, siguiente_cursor | None).
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = keyset_filter(queryset, ordering, decode_cursor(cursor, len(ordering)))
+    rows = list(queryset[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(_row_value(last, f.lstrip("-")) for f in ordering)
+    return rows, next_cursor
@@ -193,6 +193,9 @@ CLOUDINARY_STORAGE = {
 
 MEDIA_URL = "/media/"
 
+# Hilos por proceso que generan las variantes de imágenes de lotes (0 = en línea)
+IMAGE_PIPELINE_WORKERS = int(os.environ.get("IMAGE_PIPELINE_WORKERS", 2))
+
 STORAGES = {
     "default": {
         "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
@@ -1,4 +1,7 @@
+from functools import wraps
+
 from django.contrib.auth.decorators import user_passes_test
+from django.http import JsonResponse
 
 def admin_required(view_func):
     return user_passes_test(
@@ -12,3 +15,13 @@ def client_required(view_func):
         lambda u: u.is_authenticated and getattr(u, 'role', None) == 'CLIENT',
         login_url='/login/'
     )(view_func)
+
+
+def api_login_required(view_func):
+    # Para las APIs JSON: sin sesión responde 401 en vez de redirigir al login
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Autenticación requerida."}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
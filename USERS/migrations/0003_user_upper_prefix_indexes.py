@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Índices para la búsqueda por prefijo sin distinguir mayúsculas de
+# SALES.autocomplete: Django traduce `istartswith` a UPPER(col::text) LIKE
+# UPPER('x%'), y text_pattern_ops permite usar el índice para LIKE con
+# cualquier collation. Solo PostgreSQL; en SQLite (desarrollo) no aplican.
+
+COLUMNS = ("email", "first_name", "last_name")
+
+POSTGRES_FORWARD = [
+    f"CREATE INDEX user_{column}_upper_idx ON {{table}} (UPPER({column}) text_pattern_ops)"
+    for column in COLUMNS
+]
+POSTGRES_BACKWARD = [f"DROP INDEX IF EXISTS user_{column}_upper_idx" for column in COLUMNS]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        table = schema_editor.quote_name(apps.get_model("USERS", "User")._meta.db_table)
+        for sql in statements:
+            schema_editor.execute(sql.format(table=table))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    # Reemplaza a las dos migraciones previas (índices varchar_pattern_ops y
+    # su reemplazo por los de UPPER) en bases que ya las aplicaron
+    replaces = [
+        ('USERS', '0003_user_prefix_indexes'),
+        ('USERS', '0004_user_upper_prefix_indexes'),
+    ]
+
+    dependencies = [
+        ('USERS', '0002_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
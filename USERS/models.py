@@ -3,6 +3,10 @@ from django.db import models
 # Create your models here.
 from django.contrib.auth.models import AbstractUser
 
+# Los autocompletados del admin buscan usuarios por prefijo de email, nombre
+# o apellido sin distinguir mayúsculas (UPPER(x) LIKE 'X%'). Los índices de
+# esa consulta son de expresión sobre UPPER(...), solo existen en PostgreSQL y
+# no se declaran en Meta: los crea la migración 0003_user_upper_prefix_indexes.
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('ADMIN', 'Administrador'),
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from PROJECT_INFO.versions import USERS, bump_version
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def bump_users_version(sender, instance, update_fields=None, **kwargs):
+    # Cada inicio de sesión guarda last_login; no cambia ningún indicador
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    bump_version(USERS)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def bump_users_version_on_delete(sender, instance, **kwargs):
+    bump_version(USERS)
@@ -1,4 +1,3 @@
-import os
 import logging
 
 from django.contrib import messages
@@ -13,9 +12,9 @@ from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
-from mailjet_rest import Client
 
 from django.urls import reverse
+from PROJECT_INFO.notifications import email_message, send_email, send_messages
 from .forms import EmailUserCreationForm
 from .decorators import admin_required, client_required
 
@@ -23,25 +22,6 @@ from .decorators import admin_required, client_required
 logger = logging.getLogger(__name__)
 
 
-def send_mailjet_email(subject, html_content, to_email, to_name=''):
-    mailjet = Client(
-        auth=(os.environ.get('MJ_APIKEY_PUBLIC'), os.environ.get('MJ_APIKEY_PRIVATE')),
-        version='v3.1'
-    )
-    data = {
-        'Messages': [
-            {
-                'From': {'Email': settings.DEFAULT_FROM_EMAIL, 'Name': 'SIGLO'},
-                'To': [{'Email': to_email, 'Name': to_name}],
-                'Subject': subject,
-                'HTMLPart': html_content,
-            }
-        ]
-    }
-    result = mailjet.send.create(data=data)
-    return result
-
-
 class CustomLoginView(LoginView):
     def form_invalid(self, form):
         username = self.request.POST.get('username')
@@ -83,13 +63,13 @@ def register_view(request):
         html_content = render_to_string('emails/activation_email.html', context)
 
         try:
-            result = send_mailjet_email(
+            send_email(
                 subject=subject,
                 html_content=html_content,
                 to_email=user.email,
                 to_name=user.get_full_name() or user.username,
+                category='activation',
             )
-            print("Mailjet activacion response:", result.status_code, result.json())
         except Exception as e:
             logger.error(f"ERROR CORREO ACTIVACION: {type(e).__name__}: {e}")
             print(f"ERROR CORREO ACTIVACION: {type(e).__name__}: {e}")
@@ -136,6 +116,8 @@ def custom_password_reset(request):
             User = get_user_model()
             users = User.objects.filter(email__iexact=email, is_active=True)
 
+            # Un solo envío a Mailjet para todas las cuentas con ese correo
+            outgoing = []
             for user in users:
                 uid = urlsafe_base64_encode(force_bytes(user.pk))
                 token = default_token_generator.make_token(user)
@@ -151,16 +133,18 @@ def custom_password_reset(request):
                     'domain': request.get_host(),
                 })
 
-                try:
-                    result = send_mailjet_email(
-                        subject='Restablece tu contraseña - SIGLO',
-                        html_content=html_content,
-                        to_email=user.email,
-                        to_name=user.get_full_name() or user.username,
-                    )
-                    print("Mailjet reset response:", result.status_code, result.json())
-                except Exception as e:
-                    print(f"ERROR RESET EMAIL: {type(e).__name__}: {e}")
+                outgoing.append(email_message(
+                    subject='Restablece tu contraseña - SIGLO',
+                    html_content=html_content,
+                    to_email=user.email,
+                    to_name=user.get_full_name() or user.username,
+                ))
+
+            try:
+                # send_messages ya registra cada envío fallido
+                send_messages(outgoing, category='password_reset')
+            except Exception:
+                logger.warning("No se pudo enviar el correo de restablecimiento", exc_info=True)
 
             return redirect('password_reset_done')
     else:
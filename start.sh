@@ -1,2 +1,8 @@
 #!/bin/bash
-gunicorn SIGLO.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+# Los trabajos en segundo plano (comprobantes, correos) los procesa
+# run_jobs. Con RUN_JOBS_WORKER=0 no se inicia aquí (p. ej. cuando el
+# proceso "worker" del Procfile corre aparte).
+if [ "${RUN_JOBS_WORKER:-1}" = "1" ]; then
+    python manage.py run_jobs &
+fi
+exec gunicorn SIGLO.wsgi:application --bind 0.0.0.0:$PORT